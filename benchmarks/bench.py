@@ -0,0 +1,28 @@
+"""Measure emulator speed on workloads for every control unit.
+
+Usage: python benchmarks/bench.py [RESULT.json [BASELINE.json]]
+
+Prints instructions and ram accesses per second, load time and peak
+memory for every workload. Results are saved to RESULT.json, if given,
+and compared with BASELINE.json. The same is done by `modelmachine bench`.
+"""
+
+from __future__ import annotations
+
+import sys
+
+from modelmachine.bench import load, report, run_suite, save
+
+
+def main(argv: list[str]) -> int:
+    baseline = load(argv[1]) if len(argv) > 1 else None
+    suite = run_suite()
+    for line in report(suite, baseline):
+        print(line)
+    if argv:
+        save(suite, argv[0])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
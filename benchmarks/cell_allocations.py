@@ -0,0 +1,77 @@
+"""Count Cell allocations per executed instruction.
+
+Usage: python benchmarks/cell_allocations.py [FILE.mmach ...]
+
+Without arguments all samples are measured. For every program prints:
+* calls - Cell constructor calls per instruction, it is the number of
+  allocations without flyweight cache;
+* allocs - really created Cell objects per instruction.
+"""
+
+from __future__ import annotations
+
+import sys
+import warnings
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from modelmachine.cell import Cell
+from modelmachine.cli import load_cpu
+from modelmachine.cu.status import Status
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+SAMPLES = Path(__file__).parent.parent.resolve() / "samples"
+
+
+class Counter:
+    calls = 0
+    allocs = 0
+
+
+def install() -> None:
+    new = Cell.__new__
+    make = Cell._make.__func__  # type: ignore[attr-defined]
+
+    def counting_new(cls: type[Cell], value: int, *, bits: int) -> Cell:
+        Counter.calls += 1
+        return new(cls, value, bits=bits)
+
+    def counting_make(cls: type[Cell], value: int, bits: int) -> Cell:
+        Counter.allocs += 1
+        return make(cls, value, bits)  # type: ignore[no-any-return]
+
+    Cell.__new__ = counting_new  # type: ignore[method-assign,assignment]
+    Cell._make = classmethod(counting_make)  # type: ignore[method-assign,assignment]
+
+
+def measure(filename: str) -> tuple[int, int, int]:
+    cpu = load_cpu(filename, protect_memory=False)
+    control_unit = cpu.control_unit
+    instructions = 0
+    Counter.calls = Counter.allocs = 0
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        while control_unit.status is Status.RUNNING:
+            control_unit.step()
+            instructions += 1
+    return instructions, Counter.calls, Counter.allocs
+
+
+def main(argv: Sequence[str]) -> int:
+    files = list(argv) or sorted(str(p) for p in SAMPLES.glob("*.mmach"))
+    install()
+    print(f"{'program':<32} {'instr':>8} {'calls':>8} {'allocs':>8}")
+    for filename in files:
+        instructions, calls, allocs = measure(filename)
+        n = max(instructions, 1)
+        print(
+            f"{Path(filename).name:<32} {instructions:>8}"
+            f" {calls / n:>8.2f} {allocs / n:>8.2f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
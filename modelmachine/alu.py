@@ -2,15 +2,16 @@
 
 from __future__ import annotations
 
+import operator
 from dataclasses import dataclass
 from enum import Flag
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Final
 
-from .cell import Cell, div_to_zero
+from .cell import div_to_zero
 from .memory.register import RegisterName
 
 if TYPE_CHECKING:
-    from typing import Callable, Final
+    from typing import Callable
 
     from .memory.register import RegisterMemory
 
@@ -26,6 +27,12 @@ class Flags(Flag):
 
 FLAG_BITS = 5
 
+CF: Final = Flags.CF.value
+OF: Final = Flags.OF.value
+SF: Final = Flags.SF.value
+ZF: Final = Flags.ZF.value
+HALT: Final = Flags.HALT.value
+
 LESS = -1
 EQUAL = 0
 GREATER = 1
@@ -61,6 +68,8 @@ class ArithmeticLogicUnit:
 
     _registers: Final[RegisterMemory]
     operand_bits: Final[int]
+    _mask: Final[int]
+    _sign_bit: Final[int]
     _address_bits: Final[int]
     alu_registers: Final[AluRegisters]
 
@@ -77,6 +86,8 @@ class ArithmeticLogicUnit:
         self._registers = registers
 
         self.operand_bits = operand_bits
+        self._mask = (1 << operand_bits) - 1
+        self._sign_bit = 1 << (operand_bits - 1)
         self._address_bits = address_bits
         self.alu_registers = alu_registers
 
@@ -89,112 +100,96 @@ class ArithmeticLogicUnit:
         self._registers.add_register(alu_registers.R2, bits=operand_bits)
         self._registers.add_register(RegisterName.FLAGS, bits=operand_bits)
 
+    def _signed(self, value: int) -> int:
+        """Two's complement value of unsigned operand."""
+        return (value ^ self._sign_bit) - self._sign_bit
+
     def _set_flags(self, *, signed: int, unsigned: int) -> None:
         """Set flags."""
-        flags = Flags.CLEAR
-        value = self._registers[self.alu_registers.S]
+        value = self._registers.get_int(self.alu_registers.S)
+        flags = 0
         if value == 0:
-            flags |= Flags.ZF
-        if value.is_negative:
-            flags |= Flags.SF
+            flags |= ZF
+        if value & self._sign_bit:
+            flags |= SF
 
-        if value.signed != signed:
-            flags |= Flags.OF
+        if self._signed(value) != signed:
+            flags |= OF
 
-        if value.unsigned != unsigned:
-            flags |= Flags.CF
+        if value != unsigned:
+            flags |= CF
 
-        self._registers[RegisterName.FLAGS] = Cell(
-            flags.value, bits=self.operand_bits
-        )
-
-    @property
-    def _operands(self) -> tuple[Cell, Cell]:
-        """Read and return R1 and R2."""
-        return (
-            self._registers[self.alu_registers.R1],
-            self._registers[self.alu_registers.R2],
-        )
+        self._registers.set_int(RegisterName.FLAGS, flags)
 
     def _binary_op(
         self,
         int_op: Callable[[int, int], int],
-        cell_op: Callable[[Cell, Cell], Cell],
         *,
         op_type: OperationType = OperationType.BOTH,
     ) -> None:
-        op1, op2 = self._operands
-        s = cell_op(op1, op2)
-        self._registers[self.alu_registers.S] = s
-        unsigned = int_op(op1.unsigned, op2.unsigned)
-        signed = int_op(op1.signed, op2.signed)
+        op1 = self._registers.get_int(self.alu_registers.R1)
+        op2 = self._registers.get_int(self.alu_registers.R2)
+        unsigned = int_op(op1, op2)
+        s = unsigned & self._mask
+        self._registers.set_int(self.alu_registers.S, s)
+        signed = int_op(self._signed(op1), self._signed(op2))
 
         if op_type is OperationType.BOTH:
             self._set_flags(signed=signed, unsigned=unsigned)
         elif op_type is OperationType.SIGNED:
-            self._set_flags(signed=signed, unsigned=s.unsigned)
+            self._set_flags(signed=signed, unsigned=s)
         elif op_type is OperationType.UNSIGNED:
-            self._set_flags(signed=s.signed, unsigned=unsigned)
+            self._set_flags(signed=self._signed(s), unsigned=unsigned)
         else:
             raise NotImplementedError
 
     def add(self) -> None:
         """S := R1 + R2."""
-        self._binary_op(lambda a, b: a + b, lambda a, b: a + b)
+        self._binary_op(operator.add)
 
     def sub(self) -> None:
         """S := R1 - R2."""
-        self._binary_op(lambda a, b: a - b, lambda a, b: a - b)
+        self._binary_op(operator.sub)
 
     def umul(self) -> None:
         """S := R1 * R2 (unsigned)."""
-        self._binary_op(
-            lambda a, b: a * b,
-            lambda a, b: a.umul(b),
-            op_type=OperationType.UNSIGNED,
-        )
+        self._binary_op(operator.mul, op_type=OperationType.UNSIGNED)
 
     def smul(self) -> None:
         """S := R1 * R2 (signed)."""
-        self._binary_op(
-            lambda a, b: a * b,
-            lambda a, b: a.smul(b),
-            op_type=OperationType.SIGNED,
-        )
+        self._binary_op(operator.mul, op_type=OperationType.SIGNED)
 
     def sdivmod(self) -> None:
         """S := R1 div R2, R1 := R1 % R2 (signed)."""
-        op1, op2 = self._operands
-        try:
-            div, mod = op1.sdivmod(op2)
-        except ZeroDivisionError as e:
-            msg = f"Division by zero: {op1.signed} / {op2.signed}"
-            raise AluZeroDivisionError(msg) from e
-
-        self._registers[self.alu_registers.S] = div
-        self._registers[self.alu_registers.RES] = mod
-        signed = div_to_zero(op1.signed, op2.signed)
-        self._set_flags(signed=signed, unsigned=div.unsigned)
+        op1 = self._signed(self._registers.get_int(self.alu_registers.R1))
+        op2 = self._signed(self._registers.get_int(self.alu_registers.R2))
+        if op2 == 0:
+            msg = f"Division by zero: {op1} / {op2}"
+            raise AluZeroDivisionError(msg)
+
+        div = div_to_zero(op1, op2)
+        mod = op1 - div * op2
+        self._registers.set_int(self.alu_registers.S, div & self._mask)
+        self._registers.set_int(self.alu_registers.RES, mod & self._mask)
+        self._set_flags(signed=div, unsigned=div & self._mask)
 
     def udivmod(self) -> None:
         """S := R1 div R2, R1 := R1 % R2 (unsigned)."""
-        op1, op2 = self._operands
-
-        try:
-            div, mod = op1.udivmod(op2)
-        except ZeroDivisionError as e:
-            msg = f"Division by zero: {op1.unsigned} / {op2.unsigned}"
-            raise AluZeroDivisionError(msg) from e
+        op1 = self._registers.get_int(self.alu_registers.R1)
+        op2 = self._registers.get_int(self.alu_registers.R2)
+        if op2 == 0:
+            msg = f"Division by zero: {op1} / {op2}"
+            raise AluZeroDivisionError(msg)
 
-        self._registers[self.alu_registers.S] = div
-        self._registers[self.alu_registers.RES] = mod
-        unsigned = div_to_zero(op1.unsigned, op2.unsigned)
-        self._set_flags(signed=div.signed, unsigned=unsigned)
+        div = op1 // op2
+        self._registers.set_int(self.alu_registers.S, div)
+        self._registers.set_int(self.alu_registers.RES, op1 - div * op2)
+        self._set_flags(signed=self._signed(div), unsigned=div)
 
     def jump(self) -> None:
         """PC := R1."""
-        addr = self._registers[RegisterName.ADDR]
-        self._registers[RegisterName.PC] = addr
+        addr = self._registers.get_int(RegisterName.ADDR)
+        self._registers.set_int(RegisterName.PC, addr)
 
     def cond_jump(self, *, signed: bool, comp: int, equal: bool) -> None:
         """All jumps: more, less, less_or_equal etc.
@@ -205,8 +200,8 @@ class ArithmeticLogicUnit:
 
         >>> alu.cond_jump(signed=False, comparasion=1, equal=False)  # a > b
         """
-        flags = Flags(self._registers[RegisterName.FLAGS].unsigned)
-        zf = bool(flags & Flags.ZF)
+        flags = self._registers.get_int(RegisterName.FLAGS)
+        zf = bool(flags & ZF)
 
         if zf:
             if equal:
@@ -219,26 +214,24 @@ class ArithmeticLogicUnit:
             return
 
         if signed:
-            less = bool(flags & Flags.SF) ^ bool(flags & Flags.OF)
+            less = bool(flags & SF) ^ bool(flags & OF)
             if (comp < 0) == less:
                 self.jump()
             return
 
         # signed is False
-        cf = bool(flags & Flags.CF)
+        cf = bool(flags & CF)
         if (comp < 0) == cf:
             self.jump()
 
     def halt(self) -> None:
         """Stop the machine."""
-        self._registers[RegisterName.FLAGS] = Cell(
-            Flags.HALT.value, bits=self.operand_bits
-        )
+        self._registers.set_int(RegisterName.FLAGS, HALT)
 
     def swap(self) -> None:
         """S, RES := RES, S."""
-        s = self._registers[self.alu_registers.S]
-        res = self._registers[self.alu_registers.RES]
+        s = self._registers.get_int(self.alu_registers.S)
+        res = self._registers.get_int(self.alu_registers.RES)
 
-        self._registers[self.alu_registers.S] = res
-        self._registers[self.alu_registers.RES] = s
+        self._registers.set_int(self.alu_registers.S, res)
+        self._registers.set_int(self.alu_registers.RES, s)
@@ -0,0 +1,253 @@
+"""Run many programs in a pool of warm worker processes."""
+
+from __future__ import annotations
+
+import json
+import warnings
+from contextlib import redirect_stderr
+from dataclasses import asdict, dataclass
+from io import StringIO
+from multiprocessing import Pool
+from pathlib import Path
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from .cpu.image import IMAGE_SUFFIX, load_image
+from .cpu.source import source
+from .cu.blocks import BlockEngine
+from .cu.status import Status
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from typing import TextIO
+
+    from .cpu.cpu import Cpu
+    from .cu.budget import Budget
+
+PROGRAM_SUFFIX = ".mmach"
+ENTER_SUFFIX = ".in"
+WARM_UP_SOURCE = ".cpu mm-3\n.code\n99 0000 0000 0000\n"
+
+# Last loaded program of the process, next run of it with another
+# input only restores memory: (source code, protect memory) -> cpu
+_loaded: dict[tuple[str, bool], Cpu] = {}
+
+
+@dataclass(frozen=True)
+class Task:
+    """Program with optional input file."""
+
+    program: str
+    enter: str | None = None
+
+
+@dataclass(frozen=True)
+class Result:
+    """Result of one program run, one line of batch output."""
+
+    program: str
+    status: str
+    output: str = ""
+    steps: int = 0
+    access_count: int = 0
+    seconds: float = 0.0
+    error: str | None = None
+    stderr: str = ""
+
+    def json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False)
+
+
+def collect_tasks(path: str) -> list[Task]:
+    """Read tasks from directory or manifest.
+
+    Directory gives every *.mmach and *.mmimg file in it and subdirectories,
+    input is taken from file with the same name and .in suffix, if any.
+    Manifest is a text file with a program and optional input file
+    per line, paths are relative to the manifest; '#' starts a comment.
+    """
+    root = Path(path)
+    if root.is_dir():
+        tasks = []
+        programs = [
+            program
+            for suffix in (PROGRAM_SUFFIX, IMAGE_SUFFIX)
+            for program in root.rglob(f"*{suffix}")
+        ]
+        for program in sorted(programs):
+            enter = program.with_suffix(ENTER_SUFFIX)
+            tasks.append(
+                Task(
+                    program=str(program),
+                    enter=str(enter) if enter.is_file() else None,
+                )
+            )
+        return tasks
+
+    tasks = []
+    with open(root) as fin:
+        for line in fin:
+            parts = line.split("#")[0].split()
+            if not parts:
+                continue
+            if len(parts) > 2:  # noqa: PLR2004
+                msg = f"Expected program and input file, got: {line!r}"
+                raise ValueError(msg)
+            files = [str(root.parent / part) for part in parts]
+            tasks.append(Task(*files))
+    return tasks
+
+
+@dataclass(frozen=True)
+class Runner:
+    """Run settings, the same for all tasks."""
+
+    budget: Budget
+    protect_memory: bool = False
+    engine: str = "interpreter"
+    detect_loops: bool = False
+    cache_dir: str | None = None
+
+    def __call__(self, task: Task) -> Result:
+        """Run one program and never raise."""
+        stderr = StringIO()
+        start = perf_counter()
+        try:
+            with redirect_stderr(stderr), warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                return self._run(task, stderr=stderr, start=start)
+        except Exception as exc:  # noqa: BLE001 worker should survive
+            return Result(
+                program=task.program,
+                status="error",
+                seconds=perf_counter() - start,
+                error=f"{type(exc).__name__}: {exc}",
+                stderr=stderr.getvalue(),
+            )
+
+    def _run(self, task: Task, *, stderr: StringIO, start: float) -> Result:
+        if task.program.endswith(IMAGE_SUFFIX):
+            if task.enter is None:
+                cpu = load_image(
+                    task.program, protect_memory=self.protect_memory
+                )
+            else:
+                with open(task.enter) as fin:
+                    cpu = load_image(
+                        task.program,
+                        protect_memory=self.protect_memory,
+                        enter=fin,
+                    )
+            return self._execute(task, cpu, stderr=stderr, start=start)
+
+        with open(task.program) as fin:
+            code = fin.read()
+        key = (code, self.protect_memory)
+        reuse = self.engine == "interpreter" and task.enter is not None
+        loaded = _loaded.get(key)
+        if reuse and loaded is not None:
+            assert task.enter is not None
+            with open(task.enter) as fin:
+                steps = loaded.rerun(
+                    fin, self.budget, detect_loops=self.detect_loops
+                )
+            return self._result(
+                task, loaded, steps=steps, stderr=stderr, start=start
+            )
+
+        if task.enter is None:
+            cpu = source(
+                code,
+                protect_memory=self.protect_memory,
+                cache_dir=self.cache_dir,
+            )
+        else:
+            with open(task.enter) as fin:
+                cpu = source(
+                    code,
+                    protect_memory=self.protect_memory,
+                    enter=fin,
+                    cache_dir=self.cache_dir,
+                )
+            if reuse:
+                _loaded.clear()
+                _loaded[key] = cpu
+        return self._execute(task, cpu, stderr=stderr, start=start)
+
+    def _execute(
+        self, task: Task, cpu: Cpu, *, stderr: StringIO, start: float
+    ) -> Result:
+        if self.engine == "blocks":
+            with BlockEngine(
+                control_unit=cpu.control_unit,
+                registers=cpu.registers,
+                ram=cpu.ram,
+            ) as engine:
+                steps = engine.run(self.budget, detect_loops=self.detect_loops)
+        else:
+            steps = cpu.control_unit.run(
+                self.budget, detect_loops=self.detect_loops
+            )
+        return self._result(task, cpu, steps=steps, stderr=stderr, start=start)
+
+    @staticmethod
+    def _result(
+        task: Task, cpu: Cpu, *, steps: int, stderr: StringIO, start: float
+    ) -> Result:
+        output = StringIO()
+        if cpu.control_unit.failed:
+            status = "failed"
+        elif cpu.control_unit.status is Status.STOPPED:
+            status = "stopped"
+        elif cpu.control_unit.status is Status.LOOPED:
+            status = "looped"
+        else:
+            status = "halted"
+            cpu.print_result(output)
+
+        return Result(
+            program=task.program,
+            status=status,
+            output=output.getvalue(),
+            steps=steps,
+            access_count=cpu.ram.access_count,
+            seconds=perf_counter() - start,
+            stderr=stderr.getvalue(),
+        )
+
+
+def _warm_up() -> None:
+    """Build grammar and caches once per worker.
+
+    Scanner parses correct sources; pyparsing grammar, that explains
+    errors in the rest of them, is built on import of cpu.grammar.
+    """
+    from .cpu.grammar import parse_grammar
+
+    parse_grammar(WARM_UP_SOURCE)
+    source(WARM_UP_SOURCE)
+
+
+def run_batch(
+    tasks: Iterable[Task], runner: Runner, *, jobs: int = 1
+) -> Iterator[Result]:
+    """Run tasks and yield results as soon as they are ready.
+
+    With jobs > 1 results come in order of completion.
+    """
+    if jobs <= 1:
+        yield from map(runner, tasks)
+        return
+
+    with Pool(processes=jobs, initializer=_warm_up) as pool:
+        yield from pool.imap_unordered(runner, tasks)
+
+
+def write_results(results: Iterable[Result], file: TextIO) -> dict[str, int]:
+    """Write results as json lines and return count of every status."""
+    summary: dict[str, int] = {}
+    for result in results:
+        file.write(result.json() + "\n")
+        file.flush()
+        summary[result.status] = summary.get(result.status, 0) + 1
+    return summary
@@ -0,0 +1,609 @@
+"""Benchmark suite: long-running workloads for every control unit."""
+
+from __future__ import annotations
+
+import json
+import platform
+import tracemalloc
+import warnings
+from dataclasses import asdict, dataclass
+from io import StringIO
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+from .__about__ import __version__
+from .cpu.cache import programs
+from .cpu.source import source
+from .cu.blocks import BlockEngine
+from .cu.budget import Budget
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from typing import Any, Callable, Final
+
+    from .cpu.cpu import Cpu
+
+BIG: Final = 1000003
+PEAK_STEPS: Final = 1000
+
+
+def _hex(value: int, bits: int) -> str:
+    return f"{value % (1 << bits):0{bits // 4}x}"
+
+
+def _signed(value: int, bits: int) -> int:
+    value %= 1 << bits
+    return value - (1 << bits) if value >> (bits - 1) else value
+
+
+def _array(n: int) -> list[int]:
+    return [i * 7 % 1000 for i in range(n)]
+
+
+@dataclass(frozen=True)
+class Workload:
+    """Program, generated for size n, and its expected output."""
+
+    name: str
+    operand_bits: int
+    size: int
+    program: Callable[[int], str]
+    result: Callable[[int], int]
+
+    def source(self, scale: float = 1.0) -> tuple[str, str]:
+        """Return source code and expected output."""
+        n = max(1, int(self.size * scale))
+        value = _signed(self.result(n), self.operand_bits)
+        return self.program(n), f"{value}\n"
+
+
+def _loop_sum(n: int) -> int:
+    return n * (n + 1) // 2
+
+
+def _division_sum(n: int) -> int:
+    return sum(BIG % i for i in range(1, n + 1))
+
+
+def _array_sum(n: int) -> int:
+    return sum(_array(n))
+
+
+def _mm3_loop(n: int) -> str:
+    w = 56
+    return f"""
+.cpu mm-3
+.output 0x7
+.code
+01 0007 0004 0007 ; sum := sum + i
+02 0004 0005 0004 ; i := i - 1
+82 0004 0006 0000 ; jneq i, 0, 0
+99 0000 0000 0000 ; halt
+{_hex(n, w)} ; i
+{_hex(1, w)} ; one
+{_hex(0, w)} ; zero
+{_hex(0, w)} ; sum
+"""
+
+
+def _mm3_division(n: int) -> str:
+    w = 56
+    return f"""
+.cpu mm-3
+.output 0x8
+.code
+04 0009 0005 000A ; q := big / i, r := big % i
+01 0008 000B 0008 ; sum := sum + r
+02 0005 0006 0005 ; i := i - 1
+82 0005 0007 0000 ; jneq i, 0, 0
+99 0000 0000 0000 ; halt
+{_hex(n, w)} ; i
+{_hex(1, w)} ; one
+{_hex(0, w)} ; zero
+{_hex(0, w)} ; sum
+{_hex(BIG, w)} ; big
+{_hex(0, w)} ; q
+{_hex(0, w)} ; r
+"""
+
+
+def _mm3_self_modifying(n: int) -> str:
+    w = 56
+    array = "\n".join(_hex(x, w) for x in _array(n))
+    return f"""
+.cpu mm-3
+.output 0x8
+.code
+01 0008 000A 0008 ; sum := sum + array[0], address is incremented below
+01 0000 0009 0000 ; instruction 0 := instruction 0 + step
+02 0005 0006 0005 ; i := i - 1
+82 0005 0007 0000 ; jneq i, 0, 0
+99 0000 0000 0000 ; halt
+{_hex(n, w)} ; i
+{_hex(1, w)} ; one
+{_hex(0, w)} ; zero
+{_hex(0, w)} ; sum
+{_hex(1 << 16, w)} ; step of second address
+{array}
+"""
+
+
+def _mm2_loop(n: int) -> str:
+    w = 40
+    return f"""
+.cpu mm-2
+.output 0x8
+.code
+01 0008 0005 ; sum := sum + i
+02 0005 0006 ; i := i - 1
+05 0005 0007 ; comp i, 0
+82 0000 0000 ; jneq 0
+99 0000 0000 ; halt
+{_hex(n, w)} ; i
+{_hex(1, w)} ; one
+{_hex(0, w)} ; zero
+{_hex(0, w)} ; sum
+"""
+
+
+def _mm2_division(n: int) -> str:
+    w = 40
+    return f"""
+.cpu mm-2
+.output 0xA
+.code
+00 000C 000B ; q := big
+04 000C 0007 ; q := q / i, r := q % i
+01 000A 000D ; sum := sum + r
+02 0007 0008 ; i := i - 1
+05 0007 0009 ; comp i, 0
+82 0000 0000 ; jneq 0
+99 0000 0000 ; halt
+{_hex(n, w)} ; i
+{_hex(1, w)} ; one
+{_hex(0, w)} ; zero
+{_hex(0, w)} ; sum
+{_hex(BIG, w)} ; big
+{_hex(0, w)} ; q
+{_hex(0, w)} ; r
+"""
+
+
+def _mmv_loop(n: int) -> str:
+    w = 40
+    return f"""
+.cpu mm-v
+.output 0x22
+.code
+01 0022 0013 ; sum := sum + i
+02 0013 0018 ; i := i - 1
+05 0013 001D ; comp i, 0
+82 0000 ; jneq 0
+99 ; halt
+{_hex(n, w)} ; i
+{_hex(1, w)} ; one
+{_hex(0, w)} ; zero
+{_hex(0, w)} ; sum
+"""
+
+
+def _mmv_division(n: int) -> str:
+    w = 40
+    return f"""
+.cpu mm-v
+.output 0x2C
+.code
+00 0036 0031 ; q := big
+04 0036 001D ; q := q / i, r := q % i
+01 002C 003B ; sum := sum + r
+02 001D 0022 ; i := i - 1
+05 001D 0027 ; comp i, 0
+82 0000 ; jneq 0
+99 ; halt
+{_hex(n, w)} ; i
+{_hex(1, w)} ; one
+{_hex(0, w)} ; zero
+{_hex(0, w)} ; sum
+{_hex(BIG, w)} ; big
+{_hex(0, w)} ; q
+{_hex(0, w)} ; r
+"""
+
+
+def _mm1_loop(n: int) -> str:
+    w = 24
+    return f"""
+.cpu mm-1
+.output 0xC
+.code
+00 000C ; S := sum
+01 0009 ; S := S + i
+10 000C ; sum := S
+00 0009 ; S := i
+02 000A ; S := S - 1
+10 0009 ; i := S
+05 000B ; comp S, 0
+82 0000 ; jneq 0
+99 0000 ; halt
+{_hex(n, w)} ; i
+{_hex(1, w)} ; one
+{_hex(0, w)} ; zero
+{_hex(0, w)} ; sum
+"""
+
+
+def _mm1_division(n: int) -> str:
+    w = 24
+    return f"""
+.cpu mm-1
+.output 0xE
+.code
+00 000F ; S := big
+04 000B ; S := S / i, S1 := S % i
+20 0000 ; swap S, S1
+01 000E ; S := S + sum
+10 000E ; sum := S
+00 000B ; S := i
+02 000C ; S := S - 1
+10 000B ; i := S
+05 000D ; comp S, 0
+82 0000 ; jneq 0
+99 0000 ; halt
+{_hex(n, w)} ; i
+{_hex(1, w)} ; one
+{_hex(0, w)} ; zero
+{_hex(0, w)} ; sum
+{_hex(BIG, w)} ; big
+"""
+
+
+def mm1_self_modifying(array: list[int]) -> str:
+    """Mm-1 program summing array by rewriting its own add instruction."""
+    w = 24
+    words = "\n".join(_hex(x, w) for x in array)
+    return f"""
+.cpu mm-1
+.input 0x0d count
+.output 0x0f
+.code
+00 000f ; S := sum
+01 0010 ; S := S + array[0], address is incremented below
+10 000f ; sum := S
+00 0001 ; S := instruction 1
+01 000e ; S := S + 1
+10 0001 ; instruction 1 := S
+00 000d ; S := count
+02 000e ; S := S - 1
+10 000d ; count := S
+05 000c ; comp S, 0
+86 0000 ; sjg 0
+99 0000 ; halt
+{_hex(0, w)} ; zero
+{_hex(0, w)} ; count
+{_hex(1, w)} ; one
+{_hex(0, w)} ; sum
+{words}
+.enter {len(array)}
+"""
+
+
+def _mm1_self_modifying(n: int) -> str:
+    return mm1_self_modifying(_array(n))
+
+
+def _mms_loop(n: int) -> str:
+    w = 24
+    return f"""
+.cpu mm-s
+.output 0x26
+.code
+5A 0026 ; push sum
+5A 001D ; push i
+01 ; sum + i
+5B 0026 ; pop sum
+5A 001D ; push i
+5A 0020 ; push 1
+02 ; i - 1
+5C ; dup
+5B 001D ; pop i
+5A 0023 ; push 0
+05 ; comp
+82 0000 ; jneq 0
+99 ; halt
+{_hex(n, w)} ; i
+{_hex(1, w)} ; one
+{_hex(0, w)} ; zero
+{_hex(0, w)} ; sum
+"""
+
+
+def _mms_division(n: int) -> str:
+    w = 24
+    return f"""
+.cpu mm-s
+.output 0x2D
+.code
+5A 0030 ; push big
+5A 0024 ; push i
+04 ; big / i, big % i
+5A 002D ; push sum
+01 ; q, r + sum
+5B 002D ; pop sum
+5B 0033 ; pop q
+5A 0024 ; push i
+5A 0027 ; push 1
+02 ; i - 1
+5C ; dup
+5B 0024 ; pop i
+5A 002A ; push 0
+05 ; comp
+82 0000 ; jneq 0
+99 ; halt
+{_hex(n, w)} ; i
+{_hex(1, w)} ; one
+{_hex(0, w)} ; zero
+{_hex(0, w)} ; sum
+{_hex(BIG, w)} ; big
+{_hex(0, w)} ; q
+"""
+
+
+def _mmr_loop(n: int, cpu: str = "mm-r") -> str:
+    w = 32
+    return f"""
+.cpu {cpu}
+.output 0x15
+.code
+00 2 0 000F ; load R2, i
+00 3 0 0011 ; load R3, one
+00 4 0 0013 ; load R4, zero
+22 1 1 ; rsub R1, R1
+21 1 2 ; radd R1, R2
+22 2 3 ; rsub R2, R3
+25 2 4 ; rcomp R2, R4
+82 0 0 0007 ; jneq 7
+10 1 0 0015 ; store R1, sum
+99 0 0 ; halt
+{_hex(n, w)} ; i
+{_hex(1, w)} ; one
+{_hex(0, w)} ; zero
+{_hex(0, w)} ; sum
+"""
+
+
+def _mmr_division(n: int, cpu: str = "mm-r") -> str:
+    w = 32
+    return f"""
+.cpu {cpu}
+.output 0x1B
+.code
+00 2 0 0013 ; load R2, i
+00 3 0 0015 ; load R3, one
+00 4 0 0017 ; load R4, zero
+00 5 0 0019 ; load R5, big
+22 1 1 ; rsub R1, R1
+20 6 5 ; rmove R6, R5
+24 6 2 ; rsdiv R6, R2: R6 := R6 / R2, R7 := R6 % R2
+21 1 7 ; radd R1, R7
+22 2 3 ; rsub R2, R3
+25 2 4 ; rcomp R2, R4
+82 0 0 0009 ; jneq 9
+10 1 0 001B ; store R1, sum
+99 0 0 ; halt
+{_hex(n, w)} ; i
+{_hex(1, w)} ; one
+{_hex(0, w)} ; zero
+{_hex(BIG, w)} ; big
+{_hex(0, w)} ; sum
+"""
+
+
+def _mmm_loop(n: int) -> str:
+    return _mmr_loop(n, cpu="mm-m")
+
+
+def _mmm_division(n: int) -> str:
+    return _mmr_division(n, cpu="mm-m")
+
+
+def _mmm_array_sum(n: int) -> str:
+    w = 32
+    array = "\n".join(_hex(x, w) for x in _array(n))
+    return f"""
+.cpu mm-m
+.output 0x13
+.code
+00 2 0 000F ; load R2, word size
+00 F 0 0011 ; load RF, array size
+22 1 1 ; rsub R1, R1
+22 6 6 ; rsub R6, R6
+01 1 6 0015 ; add R1, array(R6)
+21 6 2 ; radd R6, R2
+25 6 F ; rcomp R6, RF
+82 0 0 0006 ; jneq 6
+10 1 0 0013 ; store R1, sum
+99 0 0 ; halt
+{_hex(2, w)} ; word size
+{_hex(2 * n, w)} ; array size
+{_hex(0, w)} ; sum
+{array}
+"""
+
+
+WORKLOADS: Final = (
+    Workload("mm-1 loop", 24, 4000, _mm1_loop, _loop_sum),
+    Workload("mm-1 division", 24, 3000, _mm1_division, _division_sum),
+    Workload("mm-1 self-modifying", 24, 3000, _mm1_self_modifying, _array_sum),
+    Workload("mm-2 loop", 40, 8000, _mm2_loop, _loop_sum),
+    Workload("mm-2 division", 40, 5000, _mm2_division, _division_sum),
+    Workload("mm-3 loop", 56, 10000, _mm3_loop, _loop_sum),
+    Workload("mm-3 division", 56, 10000, _mm3_division, _division_sum),
+    Workload("mm-3 self-modifying", 56, 8000, _mm3_self_modifying, _array_sum),
+    Workload("mm-v loop", 40, 8000, _mmv_loop, _loop_sum),
+    Workload("mm-v division", 40, 5000, _mmv_division, _division_sum),
+    Workload("mm-s loop", 24, 3000, _mms_loop, _loop_sum),
+    Workload("mm-s division", 24, 2000, _mms_division, _division_sum),
+    Workload("mm-r loop", 32, 10000, _mmr_loop, _loop_sum),
+    Workload("mm-r division", 32, 8000, _mmr_division, _division_sum),
+    Workload("mm-m loop", 32, 10000, _mmm_loop, _loop_sum),
+    Workload("mm-m division", 32, 8000, _mmm_division, _division_sum),
+    Workload("mm-m array sum", 32, 10000, _mmm_array_sum, _array_sum),
+)
+
+
+@dataclass(frozen=True)
+class Measure:
+    """Result of one workload."""
+
+    instructions: int
+    ram_accesses: int
+    load_seconds: float
+    # Load of program, which parsing is in cache
+    cached_load_seconds: float
+    run_seconds: float
+    instructions_per_second: float
+    ram_accesses_per_second: float
+    peak_memory: int
+
+
+def _run(cpu: Cpu, engine: str, budget: Budget | None = None) -> int:
+    if engine == "blocks":
+        with BlockEngine(
+            control_unit=cpu.control_unit,
+            registers=cpu.registers,
+            ram=cpu.ram,
+        ) as block_engine:
+            return block_engine.run(budget)
+    return cpu.control_unit.run(budget)
+
+
+def measure(
+    workload: Workload,
+    *,
+    engine: str = "interpreter",
+    scale: float = 1.0,
+    repeat: int = 3,
+) -> Measure:
+    """Measure workload, times are the best of repeat runs.
+
+    Load time includes parsing: cache of parsed programs is cleared
+    before every repeat; the next load is timed as cached one.
+    Tracing is slow, so peak memory is measured by separate run
+    of load and first PEAK_STEPS instructions, when caches are filled.
+    """
+    code, expected = workload.source(scale)
+    load = cached = run = float("inf")
+    instructions = ram_accesses = 0
+    for _ in range(repeat):
+        programs.clear()
+        start = perf_counter()
+        cpu = source(code, protect_memory=False)
+        load = min(load, perf_counter() - start)
+
+        start = perf_counter()
+        source(code, protect_memory=False)
+        cached = min(cached, perf_counter() - start)
+
+        start = perf_counter()
+        instructions = _run(cpu, engine)
+        run = min(run, perf_counter() - start)
+        ram_accesses = cpu.ram.access_count
+
+        with StringIO() as fout:
+            cpu.print_result(fout)
+            output = fout.getvalue()
+        if cpu.control_unit.failed or output != expected:
+            msg = (
+                f"Workload '{workload.name}' printed {output!r},"
+                f" expected {expected!r}"
+            )
+            raise RuntimeError(msg)
+
+    tracemalloc.start()
+    try:
+        _run(
+            source(code, protect_memory=False),
+            engine,
+            Budget(steps=PEAK_STEPS),
+        )
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Measure(
+        instructions=instructions,
+        ram_accesses=ram_accesses,
+        load_seconds=load,
+        cached_load_seconds=cached,
+        run_seconds=run,
+        instructions_per_second=instructions / run,
+        ram_accesses_per_second=ram_accesses / run,
+        peak_memory=peak,
+    )
+
+
+def run_suite(
+    *,
+    engine: str = "interpreter",
+    scale: float = 1.0,
+    repeat: int = 3,
+    only: str | None = None,
+) -> dict[str, Any]:
+    """Measure all workloads, which name contains only substring."""
+    results = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for workload in WORKLOADS:
+            if only is None or only in workload.name:
+                results[workload.name] = asdict(
+                    measure(
+                        workload, engine=engine, scale=scale, repeat=repeat
+                    )
+                )
+    return {
+        "version": __version__,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "engine": engine,
+        "scale": scale,
+        "workloads": results,
+    }
+
+
+def report(
+    suite: dict[str, Any], baseline: dict[str, Any] | None = None
+) -> Iterable[str]:
+    """Lines of table with results and speedup relative to baseline."""
+    yield (
+        f"{'workload':<20} {'instr/s':>10} {'ram/s':>10}"
+        f" {'load ms':>8} {'peak KiB':>9}"
+        + (f" {'speedup':>8}" if baseline is not None else "")
+    )
+    for name, m in suite["workloads"].items():
+        line = (
+            f"{name:<20} {m['instructions_per_second']:>10.0f}"
+            f" {m['ram_accesses_per_second']:>10.0f}"
+            f" {m['load_seconds'] * 1000:>8.1f}"
+            f" {m['peak_memory'] / 1024:>9.0f}"
+        )
+        if baseline is not None:
+            base = baseline["workloads"].get(name)
+            speedup = (
+                f"{base['run_seconds'] / m['run_seconds']:>8.2f}"
+                if base is not None
+                else f"{'-':>8}"
+            )
+            line += f" {speedup}"
+        yield line
+
+
+def save(suite: dict[str, Any], filename: str) -> None:
+    with open(filename, "w") as fout:
+        json.dump(suite, fout, indent=2)
+        fout.write("\n")
+
+
+def load(filename: str) -> dict[str, Any]:
+    with open(filename) as fin:
+        result: dict[str, Any] = json.load(fin)
+        return result
@@ -30,15 +30,25 @@ def mod_to_zero(a: int, b: int) -> int:
     return a - b * div_to_zero(a, b)
 
 
+FLYWEIGHT_BITS: Final = frozenset({8, 16, 24, 32, 40, 56})
+FLYWEIGHT_VALUES: Final = 256
+
+_flyweights: dict[int, dict[int, Cell]] = {bits: {} for bits in FLYWEIGHT_BITS}
+
+
 class Cell:
     """Cell of memoty: register or ram.
 
     Represents wrapping fixed width integer.
+    Cell is immutable, so small values (from -FLYWEIGHT_VALUES
+    to FLYWEIGHT_VALUES - 1) of FLYWEIGHT_BITS widths are shared.
     """
 
-    bits: Final[int]
-    _value: Final[int]
-    _is_negative: Final[bool]
+    __slots__ = ("_is_negative", "_value", "bits")
+
+    bits: int
+    _value: int
+    _is_negative: bool
 
     @property
     def is_negative(self) -> bool:
@@ -70,12 +80,33 @@ class Cell:
     def from_hex(cls, inp: str) -> Self:
         return cls(int(inp, 16), bits=len(inp) * 4)
 
-    def __init__(self, value: int, *, bits: int) -> None:
+    def __new__(cls, value: int, *, bits: int) -> Self:
         """See help(type(x))."""
         assert bits > 0
-        self.bits = bits
-        self._value = value % (1 << bits)
-        self._is_negative = (1 << (bits - 1)) & value != 0
+        mask = (1 << bits) - 1
+        value &= mask
+        if cls is Cell and (
+            value < FLYWEIGHT_VALUES or value > mask - FLYWEIGHT_VALUES
+        ):
+            cache = _flyweights.get(bits)
+            if cache is not None:
+                cell = cache.get(value)
+                if cell is None:
+                    cell = cache[value] = cls._make(value, bits)
+                return cell  # type: ignore[return-value]
+
+        return cls._make(value, bits)
+
+    @classmethod
+    def _make(cls, value: int, bits: int) -> Self:
+        cell = object.__new__(cls)
+        cell.bits = bits
+        cell._value = value
+        cell._is_negative = value >> (bits - 1) != 0
+        return cell
+
+    def __getnewargs_ex__(self) -> tuple[tuple[int], dict[str, int]]:
+        return (self._value,), {"bits": self.bits}
 
     def __hash__(self) -> int:
         """Hash is important for indexing."""
@@ -83,6 +114,9 @@ class Cell:
 
     def _check_compatibility(self, other: Self) -> None:
         """Test compatibility of two numbers."""
+        if type(other) is type(self) and other.bits == self.bits:
+            return
+
         if not isinstance(other, type(self)):
             msg = f"expected {type(self)}, got {type(other)}"
             raise TypeError(msg)
@@ -94,13 +128,13 @@ class Cell:
     def __add__(self, other: Self) -> Self:
         """Equal to self + other."""
         self._check_compatibility(other)
-        value = self.signed + other.signed
+        value = self._value + other._value
         return type(self)(value, bits=self.bits)
 
     def __sub__(self, other: Self) -> Self:
         """Equal to self - other."""
         self._check_compatibility(other)
-        value = self.signed - other.signed
+        value = self._value - other._value
         return type(self)(value, bits=self.bits)
 
     def smul(self, other: Self) -> Self:
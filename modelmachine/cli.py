@@ -2,21 +2,25 @@ from __future__ import annotations
 
 import argparse
 import inspect
+import json
+import os
+import re
 import sys
+from contextlib import ExitStack
 from dataclasses import dataclass
+from pathlib import Path
 from typing import TYPE_CHECKING
 
-import pyparsing as pp
-from pyparsing import CaselessLiteral as Li
-from pyparsing import Group as Gr
-from pyparsing import Word as Wd
-
 from .__about__ import __version__
-from .cpu.source import source
-from .ide.debug import debug as ide_debug
+from .cpu import image
+from .cpu.cache import cache_dir
+from .cpu.source import parse, source
+from .cu.budget import Budget
+from .cu.status import Status
+from .prompt import printf
 
 if TYPE_CHECKING:
-    from typing import Callable
+    from typing import Callable, TextIO
 
     from .cpu.cpu import Cpu
 
@@ -28,26 +32,25 @@ class Param:
     help: str
 
 
-def ignore() -> list[pp.ParseResults]:
-    return []
+OPTIONAL_NUMBERS: dict[str, type[float]] = {
+    "int | None": int,
+    "float | None": float,
+}
+# Line of docstring: "name, -s -- help"
+PARAM = re.compile(
+    r"^[ \t]*([A-Za-z][A-Za-z0-9_]*)(?:[ \t]*, (-[A-Za-z]))?"
+    r"[ \t]*--[ \t]*([A-Za-z0-9][!-~ \t]*)$",
+    re.MULTILINE,
+)
 
 
-pp.ParserElement.set_default_whitespace_chars(" \t")
-SKIP_SHORT = 2
-param = (
-    Wd(pp.alphas, pp.alphanums + "_")
-    + (Li(", ").set_parse_action(ignore) + Gr("-" + pp.Char(pp.alphas)))[0, 1]
-    + Li("--").set_parse_action(ignore)
-    + Wd(pp.alphanums, pp.printables + " \t")
-).set_parse_action(
-    lambda t: [
-        Param(
-            name=t[0],
-            short="".join(t[1]) if len(t) > SKIP_SHORT else None,
-            help=t[-1],
+def params_of(docstring: str) -> dict[str, Param]:
+    return {
+        match.group(1): Param(
+            name=match.group(1), short=match.group(2), help=match.group(3)
         )
-    ]
-)
+        for match in PARAM.finditer(docstring)
+    }
 
 
 class Cli:
@@ -66,9 +69,7 @@ class Cli:
             f.__name__, help=docstring.split(".")[0]
         )
 
-        params: dict[str, Param] = {
-            p[0].name: p[0] for p in param.search_string(docstring)
-        }
+        params = params_of(docstring)
 
         for key, arg in sig.parameters.items():
             p = params.get(key)
@@ -89,9 +90,13 @@ class Cli:
                 short = [p.short] if p.short is not None else []
                 if arg.annotation == "str":
                     cmd.add_argument(
-                        *short, f"--{cli_key}", help=p.help, dest=key
+                        *short,
+                        f"--{cli_key}",
+                        default=arg.default,
+                        help=p.help,
+                        dest=key,
                     )
-                if arg.annotation == "bool":
+                elif arg.annotation == "bool":
                     if arg.default is False:
                         cmd.add_argument(
                             *short,
@@ -116,6 +121,15 @@ class Cli:
                     cmd.add_argument(
                         *short, f"--{cli_key}", help=p.help, dest=key
                     )
+                elif arg.annotation in OPTIONAL_NUMBERS:
+                    assert arg.default is None
+                    cmd.add_argument(
+                        *short,
+                        f"--{cli_key}",
+                        type=OPTIONAL_NUMBERS[arg.annotation],
+                        help=p.help,
+                        dest=key,
+                    )
                 else:
                     msg = f"{arg.annotation} is not implemented"
                     raise NotImplementedError(msg)
@@ -141,26 +155,37 @@ class Cli:
 
 cli = Cli(f"Modelmachine {__version__}")
 
+ENGINES = ("interpreter", "blocks")
+
 
 def load_cpu(
     filename: str, *, protect_memory: bool, enter: str | None = None
 ) -> Cpu:
-    if filename == "-":
-        source_code = sys.stdin.read()
-    else:
-        with open(filename) as fin:
-            source_code = fin.read()
+    with ExitStack() as stack:
+        fin: TextIO | None = None
+        if enter == "-":
+            fin = sys.stdin
+        elif enter is not None:
+            fin = stack.enter_context(open(enter))
+
+        if filename.endswith(image.IMAGE_SUFFIX):
+            return image.load_image(
+                filename, protect_memory=protect_memory, enter=fin
+            )
+
+        if filename == "-":
+            source_code = sys.stdin.read()
+        else:
+            with open(filename) as fsource:
+                source_code = fsource.read()
 
-    if enter is None:
-        return source(source_code, protect_memory=protect_memory)
-    if enter == "-":
         return source(
-            source_code, protect_memory=protect_memory, enter=sys.stdin
+            source_code,
+            protect_memory=protect_memory,
+            enter=fin,
+            cache_dir=cache_dir(),
         )
 
-    with open(enter) as fin:
-        return source(source_code, protect_memory=protect_memory, enter=fin)
-
 
 @cli
 def run(
@@ -168,47 +193,294 @@ def run(
     filename: str,
     protect_memory: bool = False,
     enter: str | None = None,
+    engine: str = "interpreter",
+    max_steps: int | None = None,
+    max_ram_accesses: int | None = None,
+    timeout: float | None = None,
+    detect_loops: bool = False,
+    profile: bool = False,
+    profile_output: str | None = None,
+    trace: str | None = None,
 ) -> int:
     """Run program.
 
-    filename -- file containing machine code, '-' for stdin
+    filename -- file containing machine code or image, '-' for stdin
     protect_memory, -m -- halt, if program tries to read dirty memory
     enter, -e -- file with input data, disables .enter, '-' for stdin
+    engine -- execution engine: interpreter or blocks (compiled)
+    max_steps -- stop after this number of executed instructions
+    max_ram_accesses -- stop after this number of ram word accesses
+    timeout, -t -- stop after this number of seconds
+    detect_loops, -l -- stop program at once, if it provably never halts
+    profile, -p -- print table of hot addresses and opcodes to stderr
+    profile_output -- save profile to json file, implies --profile
+    trace -- record every step to binary file for replay command
     """
     if enter == filename == "-":
         msg = "Run cannot set both enter and filename to stdin"
         raise ValueError(msg)
 
+    if engine not in ENGINES:
+        msg = f"Unknown engine '{engine}', expected one of {ENGINES}"
+        raise ValueError(msg)
+
+    profile = profile or profile_output is not None
+    if profile and engine != "interpreter":
+        msg = "Profiling is supported only by interpreter engine"
+        raise ValueError(msg)
+    if profile and detect_loops:
+        msg = "Profiling doesn't support loop detection"
+        raise ValueError(msg)
+    if trace is not None and (
+        profile or detect_loops or engine != "interpreter"
+    ):
+        msg = (
+            "Tracing is supported only by interpreter engine"
+            " without profiling and loop detection"
+        )
+        raise ValueError(msg)
+
+    budget = Budget(
+        steps=max_steps, ram_accesses=max_ram_accesses, seconds=timeout
+    )
     cpu = load_cpu(filename, protect_memory=protect_memory, enter=enter)
-    cpu.control_unit.run()
+    if profile:
+        from .cu.profiler import Profiler
+
+        profiler = Profiler(
+            control_unit=cpu.control_unit,
+            registers=cpu.registers,
+            ram=cpu.ram,
+        )
+        profiler.run(budget)
+        for line in profiler.report():
+            printf(line, file=sys.stderr)
+        if profile_output is not None:
+            with open(profile_output, "w") as fout:
+                json.dump(profiler.to_json(), fout, indent=2)
+    elif trace is not None:
+        from .cpu.trace import TraceRecorder
+
+        with open(trace, "wb") as fout:
+            TraceRecorder(cpu, fout).run(budget)
+    elif engine == "blocks":
+        from .cu.blocks import BlockEngine
+
+        with BlockEngine(
+            control_unit=cpu.control_unit,
+            registers=cpu.registers,
+            ram=cpu.ram,
+        ) as block_engine:
+            block_engine.run(budget, detect_loops=detect_loops)
+    else:
+        cpu.control_unit.run(budget, detect_loops=detect_loops)
     if cpu.control_unit.failed:
         return 1
+    if cpu.control_unit.status is Status.STOPPED:
+        printf("Program stopped: run budget is exhausted", file=sys.stderr)
+        return 2
+    if cpu.control_unit.status is Status.LOOPED:
+        printf("Program stopped: it never halts", file=sys.stderr)
+        return 3
 
     cpu.print_result(sys.stdout)
 
     return 0
 
 
+@cli
+def batch(
+    *,
+    path: str,
+    jobs: int | None = None,
+    protect_memory: bool = False,
+    engine: str = "interpreter",
+    max_steps: int | None = None,
+    max_ram_accesses: int | None = None,
+    timeout: float | None = None,
+    detect_loops: bool = False,
+) -> int:
+    """Run many programs, print json line with result of each one.
+
+    path -- directory with .mmach files (and .in input files) or manifest
+    jobs, -j -- number of worker processes, default is number of cpus
+    protect_memory, -m -- halt, if program tries to read dirty memory
+    engine -- execution engine: interpreter or blocks (compiled)
+    max_steps -- stop program after this number of executed instructions
+    max_ram_accesses -- stop program after this number of ram accesses
+    timeout, -t -- stop program after this number of seconds
+    detect_loops, -l -- stop program at once, if it provably never halts
+    """
+    if engine not in ENGINES:
+        msg = f"Unknown engine '{engine}', expected one of {ENGINES}"
+        raise ValueError(msg)
+
+    from .batch import Runner, collect_tasks, run_batch, write_results
+
+    runner = Runner(
+        budget=Budget(
+            steps=max_steps, ram_accesses=max_ram_accesses, seconds=timeout
+        ),
+        protect_memory=protect_memory,
+        engine=engine,
+        detect_loops=detect_loops,
+        cache_dir=cache_dir(),
+    )
+    tasks = collect_tasks(path)
+    summary = write_results(
+        run_batch(tasks, runner, jobs=jobs or os.cpu_count() or 1),
+        sys.stdout,
+    )
+    printf(
+        ", ".join(f"{k}: {v}" for k, v in sorted(summary.items())),
+        file=sys.stderr,
+    )
+    return 0
+
+
+@cli
+def bench(
+    *,
+    output: str | None = None,
+    compare: str | None = None,
+    engine: str = "interpreter",
+    scale: float | None = None,
+    repeat: int | None = None,
+    only: str | None = None,
+) -> int:
+    """Measure emulator speed on workloads for every control unit.
+
+    output, -o -- save results to json file
+    compare, -c -- json file with results of previous run to compare with
+    engine -- execution engine: interpreter or blocks (compiled)
+    scale, -s -- multiplier of workload sizes, default is 1
+    repeat, -r -- best time of this number of runs, default is 3
+    only -- measure only workloads, which name contains this string
+    """
+    if engine not in ENGINES:
+        msg = f"Unknown engine '{engine}', expected one of {ENGINES}"
+        raise ValueError(msg)
+
+    from .bench import load, report, run_suite, save
+
+    baseline = load(compare) if compare is not None else None
+    suite = run_suite(
+        engine=engine,
+        scale=1.0 if scale is None else scale,
+        repeat=3 if repeat is None else repeat,
+        only=only,
+    )
+    for line in report(suite, baseline):
+        printf(line)
+    if output is not None:
+        save(suite, output)
+    return 0
+
+
+@cli
+def pack(
+    *,
+    filename: str,
+    output: str | None = None,
+) -> int:
+    """Pack program to binary image, that is loaded without parsing.
+
+    filename -- file containing machine code, '-' for stdin
+    output, -o -- image file, default is filename with .mmimg suffix
+    """
+    if filename == "-":
+        if output is None:
+            msg = "Pack requires output, when filename is stdin"
+            raise ValueError(msg)
+        source_code = sys.stdin.read()
+    else:
+        with open(filename) as fin:
+            source_code = fin.read()
+
+    if output is None:
+        output = str(Path(filename).with_suffix(image.IMAGE_SUFFIX))
+    with open(output, "wb") as fout:
+        fout.write(image.pack(parse(source_code)))
+    return 0
+
+
 @cli
 def debug(
     *,
     filename: str,
     protect_memory: bool = False,
     enter: str | None = None,
+    max_history: int | None = None,
+    checkpoint_steps: int | None = None,
 ) -> int:
     """Debug the program.
 
-    filename -- file containing machine code
+    filename -- file containing machine code or image
     protect_memory, -m -- halt, if program tries to read dirty memory
     enter, -e -- file with input data, disables .enter, '-' for stdin
+    max_history -- megabytes of memory for reverse steps, default is 64
+    checkpoint_steps -- steps between snapshots for goto, default is 4096
     """
     if filename == "-":
         msg = "Debug doesn't support loading source from stdin"
         raise NotImplementedError(msg)
+    if checkpoint_steps is not None and checkpoint_steps < 1:
+        msg = "Debug needs at least one step between snapshots"
+        raise ValueError(msg)
 
     cpu = load_cpu(filename, protect_memory=protect_memory, enter=enter)
 
-    return ide_debug(cpu)
+    # Debugger pulls prompt_toolkit and builds its grammar
+    from .ide.debug import debug as ide_debug
+    from .ide.history import CHECKPOINT_STEPS, MAX_HISTORY_BYTES
+
+    return ide_debug(
+        cpu,
+        max_history_bytes=(
+            MAX_HISTORY_BYTES if max_history is None else max_history << 20
+        ),
+        checkpoint_steps=(
+            CHECKPOINT_STEPS if checkpoint_steps is None else checkpoint_steps
+        ),
+    )
+
+
+@cli
+def replay(
+    *,
+    filename: str,
+    max_history: int | None = None,
+    checkpoint_steps: int | None = None,
+) -> int:
+    """Open recorded trace in debugger, steps are not executed again.
+
+    filename -- trace file, recorded by run --trace
+    max_history -- megabytes of memory for reverse steps, default is 64
+    checkpoint_steps -- steps between snapshots for goto, default is 4096
+    """
+    if checkpoint_steps is not None and checkpoint_steps < 1:
+        msg = "Replay needs at least one step between snapshots"
+        raise ValueError(msg)
+
+    from .cpu.trace import load_trace
+    from .ide.debug import debug as ide_debug
+    from .ide.history import CHECKPOINT_STEPS, MAX_HISTORY_BYTES, TraceHistory
+
+    trace = load_trace(filename)
+    return ide_debug(
+        trace.cpu,
+        history=TraceHistory(
+            trace,
+            max_bytes=(
+                MAX_HISTORY_BYTES if max_history is None else max_history << 20
+            ),
+            checkpoint_steps=(
+                CHECKPOINT_STEPS
+                if checkpoint_steps is None
+                else checkpoint_steps
+            ),
+        ),
+    )
 
 
 # @cli
@@ -0,0 +1,129 @@
+"""Cache of parsed programs in memory and on disk.
+
+Key is a hash of source text and modelmachine version, so cache
+is invalidated by any change of source or by upgrade.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from contextlib import suppress
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from ..__about__ import __version__
+from .cpu import IOReq, Program
+
+if TYPE_CHECKING:
+    from typing import Any, Callable, Final
+
+CACHE_DIR_ENV = "MODELMACHINE_CACHE_DIR"
+MAX_PROGRAMS = 256
+
+
+def cache_dir() -> str | None:
+    """Directory of disk cache from environment, None if disabled."""
+    return os.environ.get(CACHE_DIR_ENV) or None
+
+
+def source_key(inp: str) -> str:
+    return hashlib.sha256(f"{__version__}\n{inp}".encode()).hexdigest()
+
+
+def dump(program: Program) -> dict[str, Any]:
+    return {
+        "version": __version__,
+        "cpu": program.cpu,
+        "input": [[r.address, r.message] for r in program.input_req],
+        "output": [[r.address, r.message] for r in program.output_req],
+        "enter": program.enter,
+        "code": [list(block) for block in program.code],
+    }
+
+
+def undump(data: dict[str, Any]) -> Program:
+    return Program(
+        cpu=data["cpu"],
+        input_req=tuple(IOReq(a, m) for a, m in data["input"]),
+        output_req=tuple(IOReq(a, m) for a, m in data["output"]),
+        enter=data["enter"],
+        code=tuple((a, c) for a, c in data["code"]),
+    )
+
+
+class ProgramCache:
+    """LRU cache of parsed programs with optional disk layer.
+
+    Disk cache is best effort: unreadable or broken files are parsed
+    again and errors of writing are ignored.
+    """
+
+    maxsize: Final[int]
+    _programs: Final[OrderedDict[str, Program]]
+
+    def __init__(self, maxsize: int = MAX_PROGRAMS):
+        """See help(type(x))."""
+        self.maxsize = maxsize
+        self._programs = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._programs)
+
+    def clear(self) -> None:
+        self._programs.clear()
+
+    def get(
+        self,
+        inp: str,
+        parse: Callable[[str], Program],
+        *,
+        directory: str | None = None,
+    ) -> Program:
+        """Return cached program or parse inp and cache result."""
+        key = source_key(inp)
+        program = self._programs.get(key)
+        if program is not None:
+            self._programs.move_to_end(key)
+            return program
+
+        path = None if directory is None else Path(directory) / f"{key}.json"
+        if path is not None:
+            program = self._read(path)
+        if program is None:
+            program = parse(inp)
+            if path is not None:
+                self._write(path, program)
+
+        self._programs[key] = program
+        if len(self._programs) > self.maxsize:
+            self._programs.popitem(last=False)
+        return program
+
+    @staticmethod
+    def _read(path: Path) -> Program | None:
+        try:
+            with path.open() as fin:
+                data = json.load(fin)
+            if data["version"] != __version__:
+                return None
+            return undump(data)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    @staticmethod
+    def _write(path: Path, program: Program) -> None:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with tmp.open("w") as fout:
+                json.dump(dump(program), fout)
+            tmp.replace(path)
+        except OSError:
+            with suppress(OSError):
+                tmp.unlink()
+
+
+programs = ProgramCache()
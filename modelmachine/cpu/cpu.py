@@ -24,14 +24,16 @@ from ..cu.control_unit_r import ControlUnitR
 from ..cu.control_unit_s import ControlUnitS
 from ..cu.control_unit_v import ControlUnitV
 from ..io import InputOutputUnit
-from ..memory.ram import RandomAccessMemory
+from ..memory.ram import RamSnapshot, RandomAccessMemory
 from ..memory.register import RegisterMemory
 
 if TYPE_CHECKING:
-    from collections.abc import Sequence
+    from collections.abc import Iterable, Sequence
     from typing import Final, TextIO
 
+    from ..cu.budget import Budget
     from ..cu.control_unit import ControlUnit
+    from ..cu.status import Status
 
 
 @dataclass(frozen=True)
@@ -40,6 +42,26 @@ class IOReq:
     message: str | None
 
 
+@dataclass(frozen=True)
+class Program:
+    """Parsed source: cpu name, io requests, default input and code."""
+
+    cpu: str
+    input_req: tuple[IOReq, ...]
+    output_req: tuple[IOReq, ...]
+    enter: str
+    code: tuple[tuple[int, str], ...]
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Whole state of cpu, made by Cpu.snapshot."""
+
+    ram: RamSnapshot
+    registers: tuple[int, ...]
+    halt_state: tuple[bool, Status | None]
+
+
 class Cpu:
     """CPU implements load_program, print_result and run_fie."""
 
@@ -51,7 +73,9 @@ class Cpu:
     _alu: Final[ArithmeticLogicUnit]
     _io_unit: Final[InputOutputUnit]
     _config: dict[str, str]
+    _input_req: Sequence[IOReq]
     _output_req: Sequence[IOReq] | None
+    _loaded: Snapshot | None
 
     def __init__(
         self,
@@ -79,6 +103,9 @@ class Cpu:
         self.control_unit = control_unit(
             registers=self.registers, ram=self.ram, alu=self._alu
         )
+        self._input_req = ()
+        self._output_req = None
+        self._loaded = None
 
     def load_program(
         self,
@@ -89,13 +116,78 @@ class Cpu:
         file: TextIO = sys.stdin,
     ) -> None:
         self._io_unit.load_source(code)
+        self._start(input_req=input_req, output_req=output_req, file=file)
+
+    def load_image(
+        self,
+        *,
+        segments: Iterable[tuple[int, memoryview]],
+        input_req: Sequence[IOReq],
+        output_req: Sequence[IOReq],
+        file: TextIO = sys.stdin,
+    ) -> None:
+        """Load program, already packed as big endian words."""
+        for address, data in segments:
+            self.ram.load(address, data)
+        self._start(input_req=input_req, output_req=output_req, file=file)
+
+    def _start(
+        self,
+        *,
+        input_req: Sequence[IOReq],
+        output_req: Sequence[IOReq],
+        file: TextIO,
+    ) -> None:
+        self._input_req = input_req
         self._output_req = output_req
+        self._loaded = self.snapshot()
+        self._enter(file)
 
-        for req in input_req:
+    def _enter(self, file: TextIO) -> None:
+        for req in self._input_req:
             self._io_unit.input(
                 address=req.address, message=req.message, file=file
             )
 
+    def snapshot(self) -> Snapshot:
+        """Copy state of ram, registers and halt status."""
+        return Snapshot(
+            ram=self.ram.snapshot(),
+            registers=self.registers.int_state,
+            halt_state=self.control_unit.halt_state,
+        )
+
+    def restore(self, snapshot: Snapshot) -> None:
+        """Return to the state of snapshot."""
+        self.ram.restore(snapshot.ram)
+        self.registers.restore(snapshot.registers)
+        self.control_unit.restore(snapshot.halt_state)
+
+    def reset(self, file: TextIO) -> None:
+        """Return to the state after load and enter other input data."""
+        assert self._loaded is not None, "load program first"
+        self.restore(self._loaded)
+        self._enter(file)
+
+    def rerun(
+        self,
+        file: TextIO,
+        budget: Budget | None = None,
+        *,
+        detect_loops: bool = False,
+    ) -> int:
+        """Run loaded program from the start with other input data.
+
+        Return number of executed instructions.
+        """
+        self.reset(file)
+        return self.control_unit.run(budget, detect_loops=detect_loops)
+
+    @property
+    def output_req(self) -> Sequence[IOReq]:
+        assert self._output_req is not None, "load program first"
+        return self._output_req
+
     def print_result(self, file: TextIO = sys.stdout) -> None:
         """Print calculation result."""
         assert self._output_req is not None
@@ -0,0 +1,109 @@
+"""Pyparsing grammar of .mmach source.
+
+It is slow to import and build, so source.parse imports this module
+only if the hand-written scanner declines the source.
+"""
+
+from __future__ import annotations
+
+import pyparsing as pp
+from pyparsing import Group as Gr
+
+from .cpu import CPU_MAP, IOReq, Program
+
+
+def remove_comment_and_empty_lines(inp: str) -> str:
+    lines = [line.split(";")[0].strip() for line in inp.split("\n")]
+    return "\n".join(filter(bool, lines)) + "\n"
+
+
+def ignore() -> list[pp.ParseResults]:
+    return []
+
+
+def kw(keyword: str) -> pp.ParserElement:
+    return pp.CaselessKeyword(keyword).set_parse_action(ignore)
+
+
+pp.ParserElement.set_default_whitespace_chars(" \t")
+
+
+string = pp.Word(pp.printables + " \t")
+hexnums = pp.nums + "abcdefABCDEF"
+nl = pp.Char("\n").set_parse_action(ignore)
+
+decinteger = pp.Word(pp.nums, "_" + pp.nums)
+hexinteger = "0x" + pp.Word(hexnums, "_" + hexnums)
+posinteger = (decinteger ^ hexinteger).set_parse_action(
+    lambda t: [int("".join(t), 0)]
+)
+
+integer = (pp.Opt("-") + decinteger ^ hexinteger).set_parse_action(
+    lambda t: int("".join(t), 0)
+)
+
+cpu_name = pp.MatchFirst([pp.CaselessKeyword(name) for name in CPU_MAP])
+cpu = (kw(".cpu") + cpu_name + nl)("cpu")
+
+inputd = Gr(
+    kw(".input") + pp.DelimitedList(posinteger, ",") + string[0, 1] + nl
+)("input")
+output = Gr(
+    kw(".output") + pp.DelimitedList(posinteger, ",") + string[0, 1] + nl
+)("output")
+enter = Gr(kw(".enter") + string + nl)("enter")
+
+code = Gr(
+    kw(".code") + Gr(posinteger[0, 1]) + nl + (pp.Word(hexnums) | nl)[1, ...]
+)("code")
+
+directive = inputd | output | enter | code
+directive_list = directive[0, ...]
+language = cpu + directive_list
+
+
+def parse_grammar(inp: str) -> Program:
+    """Parse source of program with pyparsing grammar."""
+    inp = remove_comment_and_empty_lines(inp)
+    result = language.parse_string(inp, parse_all=True)
+
+    input_req: list[IOReq] = []
+    output_req: list[IOReq] = []
+    enter_text = ""
+    source_code: list[tuple[int, str]] = []
+
+    for directive in result[1:]:
+        if directive.get_name() == "input":
+            message, msgidx = (
+                (directive[-1], -1)
+                if isinstance(directive[-1], str)
+                else (None, None)
+            )
+            input_req.extend(
+                IOReq(address, message) for address in directive[:msgidx]
+            )
+        elif directive.get_name() == "output":
+            message, msgidx = (
+                (directive[-1], -1)
+                if isinstance(directive[-1], str)
+                else (None, None)
+            )
+            output_req.extend(
+                IOReq(address, message) for address in directive[:msgidx]
+            )
+        elif directive.get_name() == "enter":
+            enter_text += f" {directive[0]}"
+        elif directive.get_name() == "code":
+            address_group = directive[0]
+            address = address_group[0] if address_group else 0
+            source_code.append((address, "".join(directive[1:])))
+        else:
+            raise NotImplementedError
+
+    return Program(
+        cpu=result[0],
+        input_req=tuple(input_req),
+        output_req=tuple(output_req),
+        enter=enter_text,
+        code=tuple(source_code),
+    )
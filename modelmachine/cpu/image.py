@@ -0,0 +1,160 @@
+"""Binary machine image: program, packed to load it without parsing.
+
+Layout of file:
+
+* prefix: magic bytes, format version (uint16) and size of header
+  (uint32), little endian;
+* header: utf-8 json with cpu name, word bits, byte order of words,
+  io requests, default input and list of (address, words) segments;
+* data of segments one after another, every word takes whole
+  number of bytes in big endian order.
+
+Loader maps file to memory and copies segments to ram as is.
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import struct
+from io import StringIO
+from typing import TYPE_CHECKING
+
+from ..io import InputOutputUnit
+from ..memory.ram import RandomAccessMemory
+from .cpu import CPU_MAP, Cpu, IOReq
+
+if TYPE_CHECKING:
+    from typing import Any, TextIO
+
+    from .cpu import Program
+
+IMAGE_SUFFIX = ".mmimg"
+MAGIC = b"MMIMG\0"
+FORMAT_VERSION = 1
+PREFIX = struct.Struct("<6sHI")
+BYTE_ORDER = "big"
+
+
+def pack(program: Program) -> bytes:
+    """Build image of parsed program."""
+    control_unit = CPU_MAP[program.cpu]
+    ram = RandomAccessMemory(
+        word_bits=control_unit.WORD_BITS,
+        address_bits=control_unit.ADDRESS_BITS,
+    )
+    InputOutputUnit(ram=ram, io_bits=control_unit.IR_BITS).load_source(
+        list(program.code)
+    )
+    intervals = list(ram.filled_intervals)
+    header = json.dumps(
+        {
+            "cpu": program.cpu,
+            "word_bits": control_unit.WORD_BITS,
+            "byte_order": BYTE_ORDER,
+            "input": [[r.address, r.message] for r in program.input_req],
+            "output": [[r.address, r.message] for r in program.output_req],
+            "enter": program.enter,
+            "segments": [[r.start, len(r)] for r in intervals],
+        }
+    ).encode()
+    return b"".join(
+        [
+            PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)),
+            header,
+            *(ram.dump(r.start, r.stop) for r in intervals),
+        ]
+    )
+
+
+def _header(view: memoryview) -> tuple[dict[str, Any], int]:
+    """Return header and offset of the first segment."""
+    if len(view) < PREFIX.size:
+        msg = "Too short file for modelmachine image"
+        raise ValueError(msg)
+    magic, version, size = PREFIX.unpack(view[: PREFIX.size])
+    if magic != MAGIC:
+        msg = "File is not a modelmachine image"
+        raise ValueError(msg)
+    if version != FORMAT_VERSION:
+        msg = (
+            f"Unsupported image format version {version},"
+            f" expected {FORMAT_VERSION}; pack program again"
+        )
+        raise ValueError(msg)
+    offset = PREFIX.size + size
+    if offset > len(view):
+        msg = f"Image size {len(view)} is less than header: {offset}"
+        raise ValueError(msg)
+    try:
+        header = json.loads(bytes(view[PREFIX.size : offset]).decode())
+    except ValueError as exc:
+        msg = f"Corrupted header of modelmachine image: {exc}"
+        raise ValueError(msg) from exc
+    if not isinstance(header, dict):
+        msg = "Corrupted header of modelmachine image: not an object"
+        raise ValueError(msg)  # noqa: TRY004 image is corrupted, not code
+    return header, offset
+
+
+def load_image(
+    filename: str,
+    *,
+    protect_memory: bool = True,
+    enter: TextIO | None = None,
+) -> Cpu:
+    """Load image file, enter overrides default input of image."""
+    segments: list[tuple[int, memoryview]] = []
+    with open(filename, "rb") as fin, mmap.mmap(
+        fin.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm, memoryview(mm) as view:
+        try:
+            header, offset = _header(view)
+            control_unit = CPU_MAP[header["cpu"]]
+            if header["word_bits"] != control_unit.WORD_BITS:
+                msg = (
+                    f"Image of {header['cpu']} has {header['word_bits']} bit"
+                    f" words, expected {control_unit.WORD_BITS}"
+                )
+                raise ValueError(msg)
+            if header["byte_order"] != BYTE_ORDER:
+                msg = f"Unsupported byte order {header['byte_order']}"
+                raise ValueError(msg)
+
+            cpu = Cpu(control_unit=control_unit, protect_memory=protect_memory)
+            word_bytes = -(-control_unit.WORD_BITS // 8)
+            # Segments are sorted and disjoint, as pack writes them
+            end = 0
+            for address, words in header["segments"]:
+                if not (
+                    end <= address
+                    and words > 0
+                    and address + words <= cpu.ram.memory_size
+                ):
+                    msg = (
+                        "Corrupted header of modelmachine image: segment"
+                        f" of {words} words at {address} is out of memory"
+                        " or overlaps previous one"
+                    )
+                    raise ValueError(msg)
+                end = address + words
+                stop = offset + words * word_bytes
+                segments.append((address, view[offset:stop]))
+                offset = stop
+            if offset != len(view):
+                msg = f"Image size {len(view)} differs from header: {offset}"
+                raise ValueError(msg)
+            cpu.load_image(
+                segments=segments,
+                input_req=[IOReq(a, m) for a, m in header["input"]],
+                output_req=[IOReq(a, m) for a, m in header["output"]],
+                file=StringIO(header["enter"]) if enter is None else enter,
+            )
+        except (KeyError, TypeError) as exc:
+            msg = f"Corrupted header of modelmachine image: {exc!r}"
+            raise ValueError(msg) from exc
+        finally:
+            # Mapping cannot be closed while there are views of it
+            for _, segment in segments:
+                segment.release()
+    return cpu
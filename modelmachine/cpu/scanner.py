@@ -0,0 +1,126 @@
+"""Hand-written scanner of .mmach source, fast path of source.parse.
+
+It reads source line by line with one regular expression per line,
+so time is linear in size of source. Scanner accepts exactly the
+programs, that the pyparsing grammar accepts, and returns the same
+tokens. Any unusual or wrong input is declined: scan returns None
+and caller falls back to pyparsing, that reports the error.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING
+
+from .cpu import CPU_MAP, IOReq, Program
+
+if TYPE_CHECKING:
+    from typing import Final
+
+# Keyword must not be followed by identifier character, as in pyparsing
+END: Final = r"(?![0-9A-Za-z_$])"
+WS: Final = r" *"
+INTEGER: Final = r"0x[0-9a-fA-F][0-9a-fA-F_]*|[0-9][0-9_]*"
+MESSAGE: Final = r"[!-~][ -~]*"
+
+CPU_LINE: Final = re.compile(
+    rf"(?i:\.cpu){END}{WS}"
+    rf"(?i:({'|'.join(re.escape(name) for name in CPU_MAP)})){END}{WS}"
+)
+IO_LINE: Final = re.compile(
+    rf"(?i:\.(input|output)){END}{WS}"
+    rf"((?:{INTEGER})(?:{WS},{WS}(?:{INTEGER}))*)"
+    rf"(?:{WS}({MESSAGE}))?"
+)
+ENTER_LINE: Final = re.compile(rf"(?i:\.enter){END}{WS}({MESSAGE})")
+CODE_LINE: Final = re.compile(rf"(?i:\.code){END}{WS}({INTEGER})?{WS}")
+DATA_LINE: Final = re.compile(r"[0-9a-fA-F]+(?: +[0-9a-fA-F]+)*")
+INTEGERS: Final = re.compile(INTEGER)
+
+
+def _integer(text: str) -> int | None:
+    try:
+        return int(text, 0)
+    except ValueError:
+        return None
+
+
+def scan(inp: str) -> Program | None:
+    """Parse source or return None to fall back to pyparsing."""
+    lines = []
+    for raw in inp.split("\n"):
+        line = raw.split(";")[0].strip()
+        if line:
+            if not line.isascii():
+                return None
+            # Pyparsing expands tabs before parsing
+            lines.append(line.expandtabs())
+
+    if not lines:
+        return None
+    match = CPU_LINE.fullmatch(lines[0])
+    if match is None:
+        return None
+    cpu = match.group(1).lower()
+
+    input_req: list[IOReq] = []
+    output_req: list[IOReq] = []
+    enter = ""
+    blocks: list[tuple[int, list[str]]] = []
+    # Hex words of current .code directive, None outside of it
+    data: list[str] | None = None
+
+    for line in lines[1:]:
+        if line[0] != ".":
+            if data is None:
+                return None
+            if DATA_LINE.fullmatch(line) is None:
+                return None
+            data.append(line.replace(" ", ""))
+            continue
+        if data is not None and not data:
+            return None
+
+        lower = line[:7].lower()
+        if lower.startswith((".input", ".output")):
+            match = IO_LINE.fullmatch(line)
+            if match is None:
+                return None
+            kind, integers, message = match.groups()
+            requests = input_req if kind.lower() == "input" else output_req
+            for text in INTEGERS.findall(integers):
+                address = _integer(text)
+                if address is None:
+                    return None
+                requests.append(IOReq(address, message))
+            data = None
+        elif lower.startswith(".enter"):
+            match = ENTER_LINE.fullmatch(line)
+            if match is None:
+                return None
+            enter += f" {match.group(1)}"
+            data = None
+        elif lower.startswith(".code"):
+            match = CODE_LINE.fullmatch(line)
+            if match is None:
+                return None
+            address = 0
+            if match.group(1) is not None:
+                parsed = _integer(match.group(1))
+                if parsed is None:
+                    return None
+                address = parsed
+            data = []
+            blocks.append((address, data))
+        else:
+            return None
+
+    if data is not None and not data:
+        return None
+    return Program(
+        cpu=cpu,
+        input_req=tuple(input_req),
+        output_req=tuple(output_req),
+        enter=enter,
+        code=tuple((address, "".join(words)) for address, words in blocks),
+    )
@@ -0,0 +1,357 @@
+"""Binary trace of execution: every step of run, recorded for replay.
+
+Layout of file:
+
+* prefix: magic bytes, format version (uint16) and size of header
+  (uint32), little endian;
+* header: utf-8 json with cpu name, word bits, output requests,
+  registers, ram access count and list of (address, words) segments
+  of filled memory before the first step;
+* data of segments, as in image;
+* records of steps;
+* trailer: number of steps, final pc (uint64) and status (uint8).
+
+Record of step consists of opcode byte and unsigned varints, signed
+values are zigzag encoded: pc before step as difference with pc of
+previous step, ram accesses, count of changed registers
+(doubled, plus 1 if step failed), pairs of register and difference
+of its value, count of written words and pairs of address difference
+with previous written word and difference of word value. Pc after
+step is pc of the next record or final pc of trailer.
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+from array import array
+from io import StringIO
+from typing import TYPE_CHECKING
+
+from ..cu.budget import Budget, Watchdog
+from ..cu.status import Status
+from ..memory.register import RegisterName
+from .cpu import CPU_MAP, Cpu, IOReq
+
+if TYPE_CHECKING:
+    from typing import BinaryIO, Final
+
+TRACE_SUFFIX = ".mmtrace"
+MAGIC = b"MMTRC\0"
+FORMAT_VERSION = 1
+PREFIX = struct.Struct("<6sHI")
+TRAILER = struct.Struct("<QQB")
+# Opcode of step, that cannot be decoded
+INVALID_OPCODE = 0xFF
+FLUSH_BYTES = 1 << 16
+# Varint keeps 7 bits per byte, high bit means continuation
+VARINT_BITS = 7
+VARINT_MORE = 1 << VARINT_BITS
+VARINT_MASK = VARINT_MORE - 1
+
+PC = RegisterName.PC
+REGISTERS = {int(name): name for name in RegisterName}
+
+
+def _zigzag(value: int) -> int:
+    return value << 1 if value >= 0 else ~(value << 1)
+
+
+def _put(out: bytearray, values: list[int]) -> None:
+    """Append unsigned varints."""
+    append = out.append
+    for value in values:
+        rest = value
+        while rest >= VARINT_MORE:
+            append(rest & VARINT_MASK | VARINT_MORE)
+            rest >>= VARINT_BITS
+        append(rest)
+
+
+def _get(data: bytes, pos: int) -> tuple[int, int]:
+    """Read unsigned varint, return it and position after it."""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & VARINT_MASK) << shift
+        if byte < VARINT_MORE:
+            return value, pos
+        shift += VARINT_BITS
+
+
+def _get_signed(data: bytes, pos: int) -> tuple[int, int]:
+    value, pos = _get(data, pos)
+    return (value >> 1) ^ -(value & 1), pos
+
+
+class TraceRecorder:
+    """Run program step by step and write trace of every step.
+
+    Changes are taken from write_log of registers and ram; trailer
+    is written, when run is finished or interrupted.
+    """
+
+    cpu: Final[Cpu]
+    _file: Final[BinaryIO]
+    _buffer: Final[bytearray]
+    steps: int
+    _pc: int
+    _address: int
+
+    def __init__(self, cpu: Cpu, file: BinaryIO):
+        """Write header with current state of cpu, see help(type(x))."""
+        self.cpu = cpu
+        self._file = file
+        self._buffer = bytearray()
+        self.steps = 0
+        self._pc = cpu.registers.get_int(PC)
+        self._address = 0
+
+        ram = cpu.ram
+        intervals = list(ram.filled_intervals)
+        header = json.dumps(
+            {
+                "cpu": cpu.name,
+                "word_bits": ram.word_bits,
+                "protect_memory": ram.is_protected,
+                "output": [[r.address, r.message] for r in cpu.output_req],
+                "registers": list(cpu.registers.int_state),
+                "access_count": ram.access_count,
+                "segments": [[r.start, len(r)] for r in intervals],
+            }
+        ).encode()
+        file.write(PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+        file.write(header)
+        for r in intervals:
+            file.write(ram.dump(r.start, r.stop))
+
+    def step(self) -> None:
+        """Execute and record one instruction."""
+        cpu = self.cpu
+        registers = cpu.registers
+        ram = cpu.ram
+        control_unit = cpu.control_unit
+        out = self._buffer
+
+        pc = registers.get_int(PC)
+        instruction = control_unit.instruction_at(pc)
+        accesses = ram.access_count
+        failed = control_unit.failed
+        registers.write_log = [{}]
+        ram.write_log = [{}]
+        try:
+            control_unit.step()
+            changed = registers.write_log[0]
+            written = ram.write_log[0]
+        finally:
+            registers.write_log = None
+            ram.write_log = None
+
+        out.append(
+            INVALID_OPCODE if instruction is None else instruction.opcode
+        )
+        changed.pop(PC, None)
+        values = [
+            _zigzag(pc - self._pc),
+            ram.access_count - accesses,
+            len(changed) << 1 | (control_unit.failed and not failed),
+        ]
+        self._pc = pc
+        for name, (old, new) in changed.items():
+            values.append(name)
+            values.append(_zigzag(new - old))
+        values.append(len(written))
+        for address, (_, old, new) in written.items():
+            values.append(_zigzag(address - self._address))
+            values.append(_zigzag(new - old))
+            self._address = address
+        _put(out, values)
+
+        self.steps += 1
+        if len(out) >= FLUSH_BYTES:
+            self._file.write(out)
+            out.clear()
+
+    def run(self, budget: Budget | None = None) -> int:
+        """Execute program like ControlUnit.run and record it."""
+        control_unit = self.cpu.control_unit
+        control_unit.resume()
+        watchdog = Watchdog(budget or Budget(), ram=self.cpu.ram)
+        try:
+            while control_unit.status is Status.RUNNING:
+                allowance = watchdog.allowance()
+                if allowance == 0:
+                    control_unit.stop()
+                    break
+                steps = 0
+                while (
+                    steps < allowance and control_unit.status is Status.RUNNING
+                ):
+                    self.step()
+                    steps += 1
+                watchdog.spend(steps)
+        finally:
+            self.finish()
+        return watchdog.spent
+
+    def finish(self) -> None:
+        """Write buffered records and trailer."""
+        status = self.cpu.control_unit.status
+        if status is Status.RUNNING:
+            status = Status.STOPPED
+        self._file.write(self._buffer)
+        self._buffer.clear()
+        self._file.write(
+            TRAILER.pack(
+                self.steps, self.cpu.registers.get_int(PC), int(status)
+            )
+        )
+        self._file.flush()
+
+
+class Trace:
+    """Recorded steps, that are applied to cpu instead of execution.
+
+    Records are found one after another, so offsets of steps are
+    remembered, when they are applied first time.
+    """
+
+    cpu: Final[Cpu]
+    steps: Final[int]
+    status: Final[Status]
+    _data: Final[bytes]
+    _final_pc: Final[int]
+    _offsets: Final[array[int]]
+    _address: Final[array[int]]
+
+    def __init__(self, data: bytes):
+        """Parse header and create cpu in state before the first step."""
+        if len(data) < PREFIX.size + TRAILER.size:
+            msg = "Too short file for modelmachine trace"
+            raise ValueError(msg)
+        magic, version, size = PREFIX.unpack(data[: PREFIX.size])
+        if magic != MAGIC:
+            msg = "File is not a modelmachine trace"
+            raise ValueError(msg)
+        if version != FORMAT_VERSION:
+            msg = (
+                f"Unsupported trace format version {version},"
+                f" expected {FORMAT_VERSION}; record program again"
+            )
+            raise ValueError(msg)
+        offset = PREFIX.size + size
+        header = json.loads(data[PREFIX.size : offset].decode())
+
+        control_unit = CPU_MAP[header["cpu"]]
+        if header["word_bits"] != control_unit.WORD_BITS:
+            msg = (
+                f"Trace of {header['cpu']} has {header['word_bits']} bit"
+                f" words, expected {control_unit.WORD_BITS}"
+            )
+            raise ValueError(msg)
+        cpu = Cpu(
+            control_unit=control_unit,
+            protect_memory=header["protect_memory"],
+        )
+        word_bytes = -(-control_unit.WORD_BITS // 8)
+        segments = []
+        view = memoryview(data)
+        for address, words in header["segments"]:
+            stop = offset + words * word_bytes
+            segments.append((address, view[offset:stop]))
+            offset = stop
+        cpu.load_image(
+            segments=segments,
+            input_req=[],
+            output_req=[IOReq(a, m) for a, m in header["output"]],
+            file=StringIO(),
+        )
+        cpu.registers.restore(tuple(header["registers"]))
+        cpu.ram.access_count = header["access_count"]
+
+        if offset > len(data) - TRAILER.size:
+            msg = f"Trace size {len(data)} is less than header: {offset}"
+            raise ValueError(msg)
+        steps, final_pc, status = TRAILER.unpack(data[-TRAILER.size :])
+        self.cpu = cpu
+        self.steps = steps
+        self.status = Status(status)
+        self._data = data
+        self._final_pc = final_pc
+        self._offsets = array("Q", [offset])
+        # Address of the last written word before record
+        self._address = array("Q", [0])
+        if steps == 0:
+            self._finish()
+
+    def _finish(self) -> None:
+        if self.status is not Status.HALTED:
+            self.cpu.control_unit.stop(self.status)
+
+    def _skip(self) -> None:
+        """Find offset of the next record after known ones."""
+        data = self._data
+        pos = self._offsets[-1]
+        address = self._address[-1]
+        _, pos = _get(data, pos + 1)
+        _, pos = _get(data, pos)
+        count, pos = _get(data, pos)
+        for _ in range(count >> 1):
+            _, pos = _get(data, pos + 1)
+        count, pos = _get(data, pos)
+        for _ in range(count):
+            delta, pos = _get_signed(data, pos)
+            address += delta
+            _, pos = _get(data, pos)
+        self._offsets.append(pos)
+        self._address.append(address)
+
+    def apply(self, step: int) -> None:
+        """Change cpu as step did; cpu should be in state before it."""
+        assert 0 <= step < self.steps
+        offsets = self._offsets
+        while len(offsets) <= step:
+            self._skip()
+        data = self._data
+        cpu = self.cpu
+        registers = cpu.registers
+        ram = cpu.ram
+        address = self._address[step]
+
+        # Opcode and pc are known from state of cpu
+        _, pos = _get(data, offsets[step] + 1)
+        accesses, pos = _get(data, pos)
+        ram.access_count += accesses
+        count, pos = _get(data, pos)
+        for _ in range(count >> 1):
+            name = REGISTERS[data[pos]]
+            delta, pos = _get_signed(data, pos + 1)
+            registers.set_int(name, registers.get_int(name) + delta)
+        writes, pos = _get(data, pos)
+        for _ in range(writes):
+            delta, pos = _get_signed(data, pos)
+            address += delta
+            delta, pos = _get_signed(data, pos)
+            old = int.from_bytes(ram.dump(address, address + 1), "big")
+            ram.write_raw(address, 1, old + delta)
+        if len(offsets) == step + 1:
+            offsets.append(pos)
+            self._address.append(address)
+
+        if step + 1 < self.steps:
+            delta, _ = _get_signed(data, pos + 1)
+            pc = registers.get_int(PC) + delta
+        else:
+            pc = self._final_pc
+        registers.set_int(PC, pc)
+        if count & 1:
+            cpu.control_unit.restore((True, None))
+        if step + 1 == self.steps:
+            self._finish()
+
+
+def load_trace(filename: str) -> Trace:
+    with open(filename, "rb") as fin:
+        return Trace(fin.read())
@@ -0,0 +1,865 @@
+"""Basic block compiler: alternative execution engine.
+
+Straight-line code from PC up to the first jump or halt is translated
+into python function, that operates on raw integers.
+Every instruction checks its preconditions first: dirty memory,
+access over memory bound and division by zero are left to the
+interpreter, so errors and warnings are identical to ControlUnit.run.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from ..alu import CF, EQUAL, HALT, LESS, OF, SF, ZF
+from ..cell import div_to_zero
+from ..memory.register import RegisterName
+from .budget import Budget, Watchdog
+from .control_unit import COND_JUMP_PARAMS, ControlUnit
+from .control_unit_1 import ControlUnit1
+from .control_unit_2 import ControlUnit2
+from .control_unit_3 import ControlUnit3
+from .control_unit_m import ControlUnitM
+from .control_unit_r import REG_NO_BITS, ControlUnitR
+from .control_unit_s import ControlUnitS
+from .control_unit_v import ControlUnitV
+from .loop_detector import LoopDetector
+from .opcode import JUMP_OPCODES, Opcode
+from .status import Status
+
+if TYPE_CHECKING:
+    from types import TracebackType
+    from typing import Any, Callable, Final
+
+    from typing_extensions import Self
+
+    from ..memory.ram import RandomAccessMemory
+    from ..memory.register import RegisterMemory
+    from .control_unit import DecodedInstruction
+
+    BlockFunction = Callable[
+        [RegisterMemory, RandomAccessMemory, "dict[int, Block]", int], int
+    ]
+    Generator = Callable[["BlockBuilder"], None]
+    OperandGenerator = Callable[["BlockBuilder"], str]
+
+MAX_BLOCK_INSTRUCTIONS = 128
+MAX_BLOCK_STEPS = 1 << 16
+LOOP_CHECK_STEPS = 1 << 10
+# Start address, whose block was dropped so many times by writes into
+# it, is left to interpreter: it is modified faster than compiled
+MAX_INVALIDATIONS = 4
+INDENT = " " * 8
+
+
+class NotCompilableError(Exception):
+    """Instruction should be executed by interpreter."""
+
+
+_HANDLERS: dict[tuple[type[ControlUnit], str], Generator] = {}
+_OPERANDS: dict[tuple[type[ControlUnit], str], OperandGenerator] = {}
+
+
+def _owner(cu: type[ControlUnit], name: str) -> type[ControlUnit]:
+    """Class, that defines attribute name for cu."""
+    for klass in cu.__mro__:
+        if name in vars(klass):
+            assert issubclass(klass, ControlUnit)
+            return klass
+    raise AttributeError(name)
+
+
+def _handler_generator(
+    cu: type[ControlUnit], f: Callable[[ControlUnit], None]
+) -> Generator:
+    name = f.__name__
+    owner = _owner(cu, name)
+    generator = _HANDLERS.get((owner, name))
+    if generator is None or vars(owner)[name] is not f:
+        raise NotCompilableError(name)
+    return generator
+
+
+def handler(
+    cu: type[ControlUnit], *names: str
+) -> Callable[[Generator], Generator]:
+    """Register code generator for handlers of control unit."""
+
+    def register(f: Generator) -> Generator:
+        for name in names:
+            _HANDLERS[cu, name] = f
+        return f
+
+    return register
+
+
+def operand(
+    cu: type[ControlUnit], *names: str
+) -> Callable[[OperandGenerator], OperandGenerator]:
+    """Register code generator for operand properties of control unit."""
+
+    def register(f: OperandGenerator) -> OperandGenerator:
+        for name in names:
+            _OPERANDS[cu, name] = f
+        return f
+
+    return register
+
+
+class BlockBuilder:
+    """Generate source code of one basic block.
+
+    Every instruction is translated in two parts: computations with
+    guards, that break execution before the instruction, and effects:
+    register and memory updates.
+    """
+
+    cu: Final[type[ControlUnit]]
+    start: Final[int]
+    address_bits: Final[int]
+    address_mask: Final[int]
+    operand_bits: Final[int]
+    operand_mask: Final[int]
+    sign_bit: Final[int]
+    operand_words: Final[int]
+    memory_size: Final[int]
+    instruction: DecodedInstruction
+    instructions: int
+    _ends_with_jump: bool
+
+    _lines: list[str]
+    _registers: frozenset[RegisterName]
+    _used: set[RegisterName]
+    _written: set[RegisterName]
+    _pending: dict[RegisterName, str]
+    _effects: list[str]
+    _accesses: int
+    _tmp: int
+
+    def __init__(
+        self,
+        *,
+        cu: type[ControlUnit],
+        start: int,
+        registers: RegisterMemory,
+        ram: RandomAccessMemory,
+    ):
+        self.cu = cu
+        self.start = start
+        self.address_bits = ram.address_bits
+        self.address_mask = (1 << ram.address_bits) - 1
+        self.operand_bits = cu.IR_BITS
+        self.operand_mask = (1 << cu.IR_BITS) - 1
+        self.sign_bit = 1 << (cu.IR_BITS - 1)
+        self.operand_words = cu.IR_BITS // ram.word_bits
+        self.memory_size = ram.memory_size
+        self._registers = frozenset(registers)
+        self._lines = []
+        self._used = set()
+        self._written = set()
+        self._tmp = 0
+        self.instructions = 0
+        self._ends_with_jump = False
+
+    def alu_reg(self, name: str) -> RegisterName:
+        reg: RegisterName = getattr(self.cu.ALU_REGISTERS, name)
+        return reg
+
+    def emit(self, line: str) -> None:
+        self._lines.append(INDENT + line)
+
+    def tmp(self, expr: str) -> str:
+        self._tmp += 1
+        name = f"t{self._tmp}"
+        self.emit(f"{name} = {expr}")
+        return name
+
+    def guard(self, cond: str) -> None:
+        """Leave block before current instruction if cond is true."""
+        self.emit(f"if {cond}:")
+        self.emit("    break")
+
+    def reg(self, name: RegisterName) -> str:
+        if name not in self._registers:
+            raise NotCompilableError(name)
+        self._used.add(name)
+        return self._pending.get(name, f"r_{name.name}")
+
+    def set_reg(self, name: RegisterName, expr: str) -> None:
+        if name not in self._registers:
+            raise NotCompilableError(name)
+        if not (expr.isdigit() or expr.startswith("t")):
+            expr = self.tmp(expr)
+        self._used.add(name)
+        self._pending[name] = expr
+
+    def field(self, i: int) -> int:
+        return self.instruction.fields[i].unsigned
+
+    def operand(self, name: str) -> str:
+        generator = _OPERANDS.get((_owner(self.cu, name), name))
+        if generator is None:
+            raise NotCompilableError(name)
+        return generator(self)
+
+    def signed(self, x: str) -> str:
+        return f"(({x} ^ {self.sign_bit}) - {self.sign_bit})"
+
+    def load(self, address: str, words: int | None = None) -> str:
+        """Read operand from memory."""
+        if words is None:
+            words = self.operand_words
+        if address.isdigit() and int(address) + words > self.memory_size:
+            raise NotCompilableError(address)
+        value = self.tmp(f"read({address}, {words})")
+        self.guard(f"{value} is None")
+        self._accesses += words
+        return value
+
+    def store(
+        self, address: str, value: str, words: int | None = None
+    ) -> None:
+        """Write operand to memory."""
+        if words is None:
+            words = self.operand_words
+        if address.isdigit():
+            if int(address) + words > self.memory_size:
+                raise NotCompilableError(address)
+        else:
+            self.guard(f"{address} + {words} > {self.memory_size}")
+        self._effects.append(f"write({address}, {words}, {value})")
+        self._accesses += words
+
+    def add_instruction(
+        self, address: int, instruction: DecodedInstruction
+    ) -> None:
+        """Generate code for instruction or raise NotCompilableError."""
+        lines = len(self._lines)
+        used = set(self._used)
+        self.instruction = instruction
+        self._pending = {}
+        self._effects = []
+        self._accesses = instruction.words
+
+        self.emit(f"# 0x{address:x}: {instruction.opcode.name}")
+        try:
+            self.set_reg(
+                RegisterName.PC,
+                str((address + instruction.words) & self.address_mask),
+            )
+            self.set_reg(RegisterName.IR, str(instruction.ir.unsigned))
+            for f in self.cu.DISPATCH[instruction.opcode]:
+                _handler_generator(self.cu, f)(self)
+        except NotCompilableError:
+            del self._lines[lines:]
+            self._used = used
+            raise
+
+        for reg, expr in self._pending.items():
+            self.emit(f"r_{reg.name} = {expr}")
+            self._written.add(reg)
+        self.emit(f"acc += {self._accesses}")
+        self.emit("done += 1")
+        for effect in self._effects:
+            self.emit(effect)
+        if self._effects:
+            self.guard(f"{self.start} not in blocks")
+        self.instructions += 1
+        self._ends_with_jump = instruction.opcode in JUMP_OPCODES
+
+    def source(self) -> str:
+        """Source code of function, that executes block.
+
+        Block, that ends with jump to its start, is a loop:
+        it repeats until exit or next pass can exceed limit instructions.
+        """
+        if self._ends_with_jump:
+            self.guard(
+                f"r_PC != {self.start} or done + {self.instructions} > limit"
+            )
+        else:
+            self.emit("break")
+        prologue = [
+            f"    r_{reg.name} = regs.get_int(RegisterName.{reg.name})"
+            for reg in sorted(self._used)
+        ]
+        epilogue = [
+            f"    regs.set_int(RegisterName.{reg.name}, r_{reg.name})"
+            for reg in sorted(self._written)
+        ]
+        return "\n".join(
+            [
+                f"def block_{self.start:x}(regs, ram, blocks, limit):",
+                "    read = ram.read_raw",
+                "    write = ram.write_raw",
+                *prologue,
+                "    acc = 0",
+                "    done = 0",
+                "    while True:",
+                *self._lines,
+                "    ram.access_count += acc",
+                *epilogue,
+                "    return done",
+                "",
+            ]
+        )
+
+
+def flags(
+    b: BlockBuilder, s: str, *, signed: str | None, unsigned: str | None
+) -> str:
+    """Expression for FLAGS register after operation with result s."""
+    parts = [
+        f"({s} == 0) * {ZF}",
+        f"({s} >> {b.operand_bits - 1}) * {SF}",
+    ]
+    if signed is not None:
+        parts.append(f"({b.signed(s)} != {signed}) * {OF}")
+    if unsigned is not None:
+        parts.append(f"({s} != {unsigned}) * {CF}")
+    return b.tmp(" | ".join(parts))
+
+
+def binary_op(
+    b: BlockBuilder, op: str, *, signed: bool, unsigned: bool
+) -> None:
+    a = b.reg(b.alu_reg("R1"))
+    c = b.reg(b.alu_reg("R2"))
+    full = f"{a} {op} {c}"
+    s = b.tmp(f"({full}) & {b.operand_mask}")
+    f = flags(
+        b,
+        s,
+        signed=f"{b.signed(a)} {op} {b.signed(c)}" if signed else None,
+        unsigned=full if unsigned else None,
+    )
+    b.set_reg(b.alu_reg("S"), s)
+    b.set_reg(RegisterName.FLAGS, f)
+
+
+@handler(ControlUnit, "_exec_add")
+def exec_add(b: BlockBuilder) -> None:
+    binary_op(b, "+", signed=True, unsigned=True)
+
+
+@handler(ControlUnit, "_exec_sub")
+def exec_sub(b: BlockBuilder) -> None:
+    binary_op(b, "-", signed=True, unsigned=True)
+
+
+@handler(ControlUnit, "_exec_umul")
+def exec_umul(b: BlockBuilder) -> None:
+    binary_op(b, "*", signed=False, unsigned=True)
+
+
+@handler(ControlUnit, "_exec_smul")
+def exec_smul(b: BlockBuilder) -> None:
+    binary_op(b, "*", signed=True, unsigned=False)
+
+
+@handler(ControlUnit, "_exec_sdivmod")
+def exec_sdivmod(b: BlockBuilder) -> None:
+    a = b.tmp(b.signed(b.reg(b.alu_reg("R1"))))
+    c = b.tmp(b.signed(b.reg(b.alu_reg("R2"))))
+    b.guard(f"{c} == 0")
+    div = b.tmp(f"div_to_zero({a}, {c})")
+    s = b.tmp(f"{div} & {b.operand_mask}")
+    res = b.tmp(f"({a} - {div} * {c}) & {b.operand_mask}")
+    f = flags(b, s, signed=div, unsigned=None)
+    b.set_reg(b.alu_reg("S"), s)
+    b.set_reg(b.alu_reg("RES"), res)
+    b.set_reg(RegisterName.FLAGS, f)
+
+
+@handler(ControlUnit, "_exec_udivmod")
+def exec_udivmod(b: BlockBuilder) -> None:
+    a = b.reg(b.alu_reg("R1"))
+    c = b.reg(b.alu_reg("R2"))
+    b.guard(f"{c} == 0")
+    s = b.tmp(f"{a} // {c}")
+    res = b.tmp(f"{a} - {s} * {c}")
+    f = flags(b, s, signed=None, unsigned=None)
+    b.set_reg(b.alu_reg("S"), s)
+    b.set_reg(b.alu_reg("RES"), res)
+    b.set_reg(RegisterName.FLAGS, f)
+
+
+@handler(ControlUnit, "_exec_halt")
+def exec_halt(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.FLAGS, str(HALT))
+
+
+@handler(ControlUnit, "_exec_swap")
+def exec_swap(b: BlockBuilder) -> None:
+    s = b.reg(b.alu_reg("S"))
+    res = b.reg(b.alu_reg("RES"))
+    b.set_reg(b.alu_reg("S"), res)
+    b.set_reg(b.alu_reg("RES"), s)
+
+
+@handler(ControlUnit, "_exec_jump")
+def exec_jump(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.PC, b.reg(RegisterName.ADDR))
+
+
+@handler(ControlUnit, "_exec_cond_jump")
+def exec_cond_jump(b: BlockBuilder) -> None:
+    signed, comp, equal = COND_JUMP_PARAMS[b.instruction.opcode]
+    f = b.reg(RegisterName.FLAGS)
+    zf = f"({f} & {ZF})"
+    if comp == EQUAL:
+        cond = zf if equal else f"not {zf}"
+    else:
+        if signed:
+            less = f"(({f} & {SF}) > 0) != (({f} & {OF}) > 0)"
+        else:
+            less = f"({f} & {CF})"
+        cond = f"({less})" if comp == LESS else f"not ({less})"
+        cond = f"{zf} or {cond}" if equal else f"not {zf} and {cond}"
+
+    addr = b.reg(RegisterName.ADDR)
+    pc = b.reg(RegisterName.PC)
+    b.set_reg(RegisterName.PC, f"{addr} if {cond} else {pc}")
+
+
+# mm-1
+
+
+@operand(ControlUnit1, "_address")
+@operand(ControlUnitS, "_address")
+@operand(ControlUnit2, "_address1")
+@operand(ControlUnitV, "_address1")
+@operand(ControlUnit3, "_address1")
+def field_0(b: BlockBuilder) -> str:
+    return str(b.field(0))
+
+
+@operand(ControlUnit2, "_address2")
+@operand(ControlUnitV, "_address2")
+@operand(ControlUnit3, "_address2")
+def field_1(b: BlockBuilder) -> str:
+    return str(b.field(1))
+
+
+@operand(ControlUnit3, "_address3")
+@operand(ControlUnitR, "_address")
+def field_2(b: BlockBuilder) -> str:
+    return str(b.field(2))
+
+
+@handler(ControlUnit1, "_load_r")
+def cu1_load_r(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.R, b.load(b.operand("_address")))
+
+
+@handler(ControlUnit1, "_load_s")
+def cu1_load_s(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.S, b.load(b.operand("_address")))
+
+
+@handler(ControlUnit1, "_load_addr")
+@handler(ControlUnitS, "_load_addr")
+@handler(ControlUnitR, "_load_addr")
+def load_addr(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.ADDR, b.operand("_address"))
+
+
+@handler(ControlUnit1, "_exec_comp")
+def cu1_exec_comp(b: BlockBuilder) -> None:
+    saved_s = b.tmp(b.reg(RegisterName.S))
+    exec_sub(b)
+    b.set_reg(RegisterName.S, saved_s)
+
+
+@handler(ControlUnit1, "_write_s")
+def cu1_write_s(b: BlockBuilder) -> None:
+    b.store(b.operand("_address"), b.reg(RegisterName.S))
+
+
+# mm-2, mm-v, mm-3
+
+
+@handler(ControlUnit2, "_load_move")
+@handler(ControlUnitV, "_load_move")
+def cu2_load_move(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.R1, b.load(b.operand("_address2")))
+
+
+@handler(ControlUnit2, "_load_r1r2")
+@handler(ControlUnitV, "_load_r1r2")
+@handler(ControlUnit3, "_load_r1r2")
+def load_r1r2(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.R1, b.load(b.operand("_address1")))
+    b.set_reg(RegisterName.R2, b.load(b.operand("_address2")))
+
+
+@handler(ControlUnit2, "_load_addr")
+def cu2_load_addr(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.ADDR, b.operand("_address2"))
+
+
+@handler(ControlUnitV, "_load_addr")
+def cuv_load_addr(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.ADDR, b.operand("_address1"))
+
+
+def next_operand(b: BlockBuilder, address: str) -> str:
+    return str((int(address) + b.operand_words) & b.address_mask)
+
+
+@handler(ControlUnit2, "_write_r1")
+@handler(ControlUnitV, "_write_r1")
+def cu2_write_r1(b: BlockBuilder) -> None:
+    b.store(b.operand("_address1"), b.reg(RegisterName.R1))
+
+
+@handler(ControlUnit2, "_write_r2")
+@handler(ControlUnitV, "_write_r2")
+def cu2_write_r2(b: BlockBuilder) -> None:
+    address = next_operand(b, b.operand("_address1"))
+    b.store(address, b.reg(RegisterName.R2))
+
+
+@handler(ControlUnit3, "_load_move")
+def cu3_load_move(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.S, b.load(b.operand("_address1")))
+
+
+@handler(ControlUnit3, "_load_addr")
+def cu3_load_addr(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.ADDR, b.operand("_address3"))
+
+
+@handler(ControlUnit3, "_exec_comp_jump")
+def cu3_exec_comp_jump(b: BlockBuilder) -> None:
+    exec_sub(b)
+    exec_cond_jump(b)
+
+
+@handler(ControlUnit3, "_write_s")
+def cu3_write_s(b: BlockBuilder) -> None:
+    b.store(b.operand("_address3"), b.reg(RegisterName.S))
+
+
+@handler(ControlUnit3, "_write_r1")
+def cu3_write_r1(b: BlockBuilder) -> None:
+    address = next_operand(b, b.operand("_address3"))
+    b.store(address, b.reg(RegisterName.R1))
+
+
+# mm-s
+
+
+def stack_offset(b: BlockBuilder, offset: int) -> str:
+    sp = b.reg(RegisterName.SP)
+    return b.tmp(f"({sp} + {offset}) & {b.address_mask}")
+
+
+@handler(ControlUnitS, "_load_push")
+def cus_load_push(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.R1, b.load(b.operand("_address")))
+
+
+@handler(ControlUnitS, "_load_r1")
+def cus_load_r1(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.R1, b.load(b.reg(RegisterName.SP)))
+
+
+@handler(ControlUnitS, "_load_r1r2")
+def cus_load_r1r2(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.R1, b.load(stack_offset(b, b.operand_words)))
+    b.set_reg(RegisterName.R2, b.load(b.reg(RegisterName.SP)))
+
+
+@handler(ControlUnitS, "_sp_plus_two")
+def cus_sp_plus_two(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.SP, stack_offset(b, 2 * b.operand_words))
+
+
+@handler(ControlUnitS, "_sp_plus")
+def cus_sp_plus(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.SP, stack_offset(b, b.operand_words))
+
+
+@handler(ControlUnitS, "_sp_minus")
+def cus_sp_minus(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.SP, stack_offset(b, -b.operand_words))
+
+
+@handler(ControlUnitS, "_write_pop")
+def cus_write_pop(b: BlockBuilder) -> None:
+    b.store(b.operand("_address"), b.reg(RegisterName.R1))
+
+
+@handler(ControlUnitS, "_write_r1")
+def cus_write_r1(b: BlockBuilder) -> None:
+    b.store(b.reg(RegisterName.SP), b.reg(RegisterName.R1))
+
+
+@handler(ControlUnitS, "_write_dword")
+def cus_write_dword(b: BlockBuilder) -> None:
+    b.store(stack_offset(b, b.operand_words), b.reg(RegisterName.R1))
+    b.store(b.reg(RegisterName.SP), b.reg(RegisterName.R2))
+
+
+# mm-r, mm-m
+
+
+def register_field(
+    b: BlockBuilder, field: int, offset: int = 0
+) -> RegisterName:
+    reg_no = (b.field(field) + offset) % (1 << REG_NO_BITS)
+    return RegisterName(RegisterName.R0 + reg_no)
+
+
+@operand(ControlUnitM, "_address")
+def cum_address(b: BlockBuilder) -> str:
+    ry = register_field(b, 1)
+    if ry is RegisterName.R0:
+        return str(b.field(2))
+    modifier = f"({b.reg(ry)} & {b.address_mask})"
+    return b.tmp(f"({b.field(2)} + {modifier}) & {b.address_mask}")
+
+
+@handler(ControlUnitR, "_load_s1_from_memory")
+def cur_load_s1_from_memory(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.S1, b.load(b.operand("_address")))
+
+
+@handler(ControlUnitR, "_load_s1_from_ry")
+def cur_load_s1_from_ry(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.S1, b.reg(register_field(b, 1)))
+
+
+@handler(ControlUnitR, "_load_s")
+def cur_load_s(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.S, b.reg(register_field(b, 0)))
+
+
+@handler(ControlUnitM, "_load_address")
+def cum_load_address(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.S, b.operand("_address"))
+
+
+@handler(ControlUnitR, "_exec_move")
+def cur_exec_move(b: BlockBuilder) -> None:
+    b.set_reg(RegisterName.S, b.reg(RegisterName.S1))
+
+
+@handler(ControlUnitR, "_write_rx")
+def cur_write_rx(b: BlockBuilder) -> None:
+    b.set_reg(register_field(b, 0), b.reg(RegisterName.S))
+
+
+@handler(ControlUnitR, "_write_r_next")
+def cur_write_r_next(b: BlockBuilder) -> None:
+    b.set_reg(register_field(b, 0, 1), b.reg(RegisterName.S1))
+
+
+@handler(ControlUnitR, "_write_s")
+def cur_write_s(b: BlockBuilder) -> None:
+    b.store(b.operand("_address"), b.reg(RegisterName.S))
+
+
+def translate(
+    builder: BlockBuilder, control_unit: ControlUnit, ram: RandomAccessMemory
+) -> int:
+    """Add instructions from builder.start up to the end of block.
+
+    Return address after the last added instruction.
+    """
+    address = builder.start
+    while (
+        builder.instructions < MAX_BLOCK_INSTRUCTIONS
+        and address < ram.memory_size
+    ):
+        instruction = control_unit.instruction_at(address)
+        if instruction is None or instruction.warnings:
+            break
+        try:
+            builder.add_instruction(address, instruction)
+        except NotCompilableError:
+            break
+        address += instruction.words
+        if instruction.opcode in JUMP_OPCODES | {Opcode.halt}:
+            break
+    return address
+
+
+@dataclass(frozen=True)
+class Block:
+    """Compiled instructions from start to stop (exclusive)."""
+
+    start: int
+    stop: int
+    instructions: int
+    source: str
+    function: BlockFunction | None
+
+
+class BlockEngine:
+    """Run program by compiled basic blocks.
+
+    Block is compiled on first visit of its start address and dropped
+    on any write into its instructions, so self-modifying code works.
+    After MAX_INVALIDATIONS drops the start address is interpreted.
+    Instructions, that cannot be compiled, are executed by control unit.
+
+    Engine listens to writes of ram until close(); it can be used as
+    context manager.
+    """
+
+    _control_unit: Final[ControlUnit]
+    _registers: Final[RegisterMemory]
+    _ram: Final[RandomAccessMemory]
+    _max_instruction_words: Final[int]
+    blocks: Final[dict[int, Block]]
+    _owners: Final[dict[int, set[int]]]
+    # Number of dropped blocks by start address
+    _invalidations: Final[dict[int, int]]
+
+    def __init__(
+        self,
+        *,
+        control_unit: ControlUnit,
+        registers: RegisterMemory,
+        ram: RandomAccessMemory,
+    ):
+        """See help(type(x))."""
+        self._control_unit = control_unit
+        self._registers = registers
+        self._ram = ram
+        self._max_instruction_words = -(-control_unit.IR_BITS // ram.word_bits)
+        self.blocks = {}
+        self._owners = {}
+        self._invalidations = {}
+        ram.write_listeners.append(self._invalidate)
+
+    def close(self) -> None:
+        """Stop watching ram writes."""
+        self._ram.write_listeners.remove(self._invalidate)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def _invalidate(self, start: int, stop: int) -> None:
+        invalidations = self._invalidations
+        for address in range(start, stop):
+            for block_start in self._owners.pop(address, ()):
+                if self.blocks.pop(block_start, None) is not None:
+                    invalidations[block_start] = (
+                        invalidations.get(block_start, 0) + 1
+                    )
+
+    def compile(self, start: int) -> Block:
+        """Compile and cache block from start address.
+
+        Block of often modified start address is empty, so it is
+        executed by control unit.
+        """
+        if self._invalidations.get(start, 0) >= MAX_INVALIDATIONS:
+            block = Block(
+                start=start,
+                stop=start,
+                instructions=0,
+                source="",
+                function=None,
+            )
+            self.blocks[start] = block
+            return block
+
+        builder = BlockBuilder(
+            cu=type(self._control_unit),
+            start=start,
+            registers=self._registers,
+            ram=self._ram,
+        )
+        address = translate(builder, self._control_unit, self._ram)
+        count = builder.instructions
+        source = builder.source()
+        function = None
+        if count != 0:
+            namespace: dict[str, Any] = {
+                "RegisterName": RegisterName,
+                "div_to_zero": div_to_zero,
+            }
+            code = compile(source, f"<block 0x{start:x}>", "exec")
+            exec(code, namespace)  # noqa: S102 generated by BlockBuilder
+            function = namespace[f"block_{start:x}"]
+
+        block = Block(
+            start=start,
+            stop=address,
+            instructions=count,
+            source=source,
+            function=function,
+        )
+        self.blocks[start] = block
+        stop = max(address, start + self._max_instruction_words)
+        for i in range(start, min(stop, self._ram.memory_size)):
+            self._owners.setdefault(i, set()).add(start)
+        return block
+
+    def run(
+        self, budget: Budget | None = None, *, detect_loops: bool = False
+    ) -> int:
+        """Execute program until halt or budget exhaustion.
+
+        Loops are detected, like in ControlUnit.run, between blocks,
+        so a looping block returns after LOOP_CHECK_STEPS instructions.
+        Return number of executed instructions.
+        """
+        control_unit = self._control_unit
+        registers = self._registers
+        ram = self._ram
+        blocks = self.blocks
+        control_unit.resume()
+        watchdog = Watchdog(budget or Budget(), ram=ram, batch=MAX_BLOCK_STEPS)
+        detector = (
+            LoopDetector(registers=registers, ram=ram)
+            if detect_loops
+            else None
+        )
+        try:
+            while control_unit.status is Status.RUNNING:
+                allowance = watchdog.allowance()
+                if allowance == 0:
+                    control_unit.stop()
+                    break
+                steps = 0
+                while (
+                    steps < allowance and control_unit.status is Status.RUNNING
+                ):
+                    pc = registers.get_int(RegisterName.PC)
+                    block = blocks.get(pc)
+                    if block is None:
+                        block = self.compile(pc)
+                    done = 0
+                    limit = allowance - steps
+                    if detector is not None:
+                        limit = min(limit, LOOP_CHECK_STEPS)
+                    if (
+                        block.function is not None
+                        and block.instructions <= limit
+                    ):
+                        done = block.function(registers, ram, blocks, limit)
+                    if done == 0:
+                        control_unit.step()
+                        done = 1
+                    steps += done
+                    if detector is not None and detector.check():
+                        control_unit.stop(Status.LOOPED)
+                watchdog.spend(steps)
+        finally:
+            if detector is not None:
+                detector.close()
+        return watchdog.spent
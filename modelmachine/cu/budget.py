@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from time import monotonic
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Final
+
+    from ..memory.ram import RandomAccessMemory
+
+CHECK_STEPS = 1 << 10
+
+
+@dataclass(frozen=True)
+class Budget:
+    """Limits for one run; None means unlimited.
+
+    steps -- executed instructions
+    ram_accesses -- reads and writes of ram words
+    seconds -- wall-clock time
+    """
+
+    steps: int | None = None
+    ram_accesses: int | None = None
+    seconds: float | None = None
+
+
+class Watchdog:
+    """Track spending of budget, that is checked in batches of steps.
+
+    Instructions are counted exactly, ram accesses and time are checked
+    only between batches, so they can be overspent by one batch.
+    """
+
+    _ram: Final[RandomAccessMemory]
+    _batch: Final[int]
+    _steps_left: int | None
+    spent: int
+    _access_limit: Final[int | None]
+    _deadline: Final[float | None]
+
+    def __init__(
+        self,
+        budget: Budget,
+        *,
+        ram: RandomAccessMemory,
+        batch: int = CHECK_STEPS,
+    ):
+        """See help(type(x))."""
+        self._ram = ram
+        self._batch = batch
+        self._steps_left = budget.steps
+        self.spent = 0
+        self._access_limit = (
+            None
+            if budget.ram_accesses is None
+            else ram.access_count + budget.ram_accesses
+        )
+        self._deadline = (
+            None if budget.seconds is None else monotonic() + budget.seconds
+        )
+
+    def allowance(self) -> int:
+        """Steps, that can be done before next check; 0 if exhausted."""
+        if (
+            self._access_limit is not None
+            and self._ram.access_count >= self._access_limit
+        ):
+            return 0
+        if self._deadline is not None and monotonic() >= self._deadline:
+            return 0
+        if self._steps_left is None:
+            return self._batch
+        return min(self._batch, self._steps_left)
+
+    def spend(self, steps: int) -> None:
+        """Take into account executed steps."""
+        self.spent += steps
+        if self._steps_left is not None:
+            self._steps_left -= steps
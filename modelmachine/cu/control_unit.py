@@ -1,30 +1,75 @@
 from __future__ import annotations
 
+from dataclasses import dataclass, replace
 from traceback import print_exc
 from typing import TYPE_CHECKING
 from warnings import warn
 
-from ..alu import EQUAL, GREATER, LESS, AluZeroDivisionError, Flags
+from ..alu import EQUAL, GREATER, HALT, LESS, AluZeroDivisionError
 from ..cell import Cell
 from ..memory.ram import RamAccessError
 from ..memory.register import RegisterName
-from .opcode import OPCODE_BITS, Opcode
+from .budget import Budget, Watchdog
+from .loop_detector import LoopDetector
+from .opcode import CONDJUMP_OPCODES, OPCODE_BITS, Opcode
 from .status import Status
 
 if TYPE_CHECKING:
-    from typing import ClassVar, Final
+    from typing import Callable, ClassVar, Final, Tuple
 
     from ..alu import AluRegisters, ArithmeticLogicUnit
     from ..memory.ram import RandomAccessMemory
     from ..memory.register import RegisterMemory
 
+    Rule = Tuple[frozenset[Opcode], "str | None"]
+    Rules = Tuple[Rule, ...]
+    Handler = Callable[["ControlUnit"], None]
+
 
 class WrongOpcodeError(ValueError):
     pass
 
 
+@dataclass(frozen=True)
+class DecodedInstruction:
+    """Instruction after fetch and decode stages.
+
+    ir - instruction register value
+    words - instruction length in ram words
+    fields - operand fields of instruction, specific for control unit
+    warnings - messages, produced by decode stage
+    """
+
+    opcode: Opcode
+    ir: Cell
+    words: int
+    fields: tuple[Cell, ...]
+    warnings: tuple[str, ...] = ()
+
+
+COND_JUMP_PARAMS: Final = {
+    Opcode.jeq: (False, EQUAL, True),
+    Opcode.jneq: (False, EQUAL, False),
+    Opcode.sjl: (True, LESS, False),
+    Opcode.sjgeq: (True, GREATER, True),
+    Opcode.sjleq: (True, LESS, True),
+    Opcode.sjg: (True, GREATER, False),
+    Opcode.ujl: (False, LESS, False),
+    Opcode.ujgeq: (False, GREATER, True),
+    Opcode.ujleq: (False, LESS, True),
+    Opcode.ujg: (False, GREATER, False),
+}
+
+
 class ControlUnit:
-    """Abstract control unit allow to execute two methods: step and run."""
+    """Abstract control unit allow to execute two methods: step and run.
+
+    Instruction execution is described by LOAD_RULES, EXECUTE_RULES
+    and WRITE_BACK_RULES: pairs of opcode set and handler method name.
+    All matched load and write back handlers are called in order;
+    for execute the last matched rule wins, None means nothing to do.
+    Rules are compiled into DISPATCH table on class creation.
+    """
 
     NAME: ClassVar[str]
     KNOWN_OPCODES: ClassVar[frozenset[Opcode]]
@@ -34,12 +79,49 @@ class ControlUnit:
     ALU_REGISTERS: ClassVar[AluRegisters]
     PAGE_SIZE: ClassVar[int] = 16
 
+    LOAD_RULES: ClassVar[Rules] = ()
+    WRITE_BACK_RULES: ClassVar[Rules] = ()
+    DISPATCH: ClassVar[dict[Opcode, tuple[Handler, ...]]]
+
     _registers: Final[RegisterMemory]
     _ram: Final[RandomAccessMemory]
     _alu: Final[ArithmeticLogicUnit]
     _operand_words: Final[Cell]
+    _max_instruction_words: Final[int]
+    _address_mask: Final[int]
 
     _failed: bool
+    _stop_status: Status | None
+    _decoded: dict[int, DecodedInstruction]
+    _instruction: DecodedInstruction | None
+    _decode_warnings: list[str]
+
+    @classmethod
+    def _build_dispatch(cls) -> dict[Opcode, tuple[Handler, ...]]:
+        def matched(rules: Rules, opcode: Opcode) -> list[str | None]:
+            return [name for opcodes, name in rules if opcode in opcodes]
+
+        dispatch = {}
+        for opcode in cls.KNOWN_OPCODES:
+            execute = matched(cls.EXECUTE_RULES, opcode)
+            if not execute:
+                msg = f"No execute rule for {opcode} in {cls.NAME}"
+                raise NotImplementedError(msg)
+
+            names = [
+                *matched(cls.LOAD_RULES, opcode),
+                execute[-1],
+                *matched(cls.WRITE_BACK_RULES, opcode),
+            ]
+            dispatch[opcode] = tuple(
+                getattr(cls, name) for name in names if name is not None
+            )
+        return dispatch
+
+    def __init_subclass__(cls) -> None:
+        super().__init_subclass__()
+        if "KNOWN_OPCODES" in cls.__dict__:
+            cls.DISPATCH = cls._build_dispatch()
 
     @property
     def failed(self) -> bool:
@@ -47,17 +129,18 @@ class ControlUnit:
 
     @property
     def _ir(self) -> Cell:
-        return self._registers[RegisterName.IR]
+        assert self._instruction is not None
+        return self._instruction.ir
 
     @property
     def _opcode(self) -> Opcode:
-        res = self._ir[-OPCODE_BITS:].unsigned
-        try:
-            return Opcode(res)
-        except ValueError as e:
-            self._wrong_opcode(res, e)
+        assert self._instruction is not None
+        return self._instruction.opcode
 
-        raise NotImplementedError
+    @property
+    def _fields(self) -> tuple[Cell, ...]:
+        assert self._instruction is not None
+        return self._instruction.fields
 
     def _wrong_opcode(
         self, opcode: int | Opcode, e: Exception | None = None
@@ -74,11 +157,10 @@ class ControlUnit:
 
         part = ir_operands[start_bit:end_bit]
         if part != 0:
-            warn(
+            self._decode_warnings.append(
                 f"Expected zero bits at {start_bit}:{end_bit} bits for"
                 f" {self._opcode}, got {part}; these bits will be ignored;"
-                f" whole instruction: {self._ir}",
-                stacklevel=2,
+                f" whole instruction: {self._ir}"
             )
 
     def __init__(
@@ -101,6 +183,13 @@ class ControlUnit:
         assert alu.alu_registers is self.ALU_REGISTERS
 
         self._failed = False
+        self._stop_status = None
+        self._max_instruction_words = -(-self.IR_BITS // ram.word_bits)
+        self._address_mask = (1 << ram.address_bits) - 1
+        self._decoded = {}
+        self._instruction = None
+        self._decode_warnings = []
+        self._ram.write_listeners.append(self._invalidate)
 
         self._registers.add_register(
             RegisterName.PC, bits=self._ram.address_bits
@@ -114,10 +203,8 @@ class ControlUnit:
         """Execution of one instruction."""
         try:
             self._fetch()
-            self._decode()
-            self._load()
-            self._execute()
-            self._write_back()
+            for handler in self.DISPATCH[self._opcode]:
+                handler(self)
         except (WrongOpcodeError, RamAccessError, AluZeroDivisionError):
             print_exc()
             warn("Because of previous exception cpu halted", stacklevel=1)
@@ -127,25 +214,154 @@ class ControlUnit:
     @property
     def status(self) -> Status:
         """Show, can we or not execute another one instruction."""
-        if Flags(self._registers[RegisterName.FLAGS].unsigned) & Flags.HALT:
+        if self._registers.get_int(RegisterName.FLAGS) & HALT:
             return Status.HALTED
+        if self._stop_status is not None:
+            return self._stop_status
 
         return Status.RUNNING
 
-    def run(self) -> None:
-        """Execute instruction one-by-one until we met HALT command."""
-        while self.status == Status.RUNNING:
-            self.step()
+    def stop(self, status: Status = Status.STOPPED) -> None:
+        """Stop execution before halt: budget is exhausted or loop found."""
+        self._stop_status = status
+
+    def resume(self) -> None:
+        """Allow execution after stop."""
+        self._stop_status = None
+
+    @property
+    def halt_state(self) -> tuple[bool, Status | None]:
+        """Failure and stop status, that are not kept in registers."""
+        return self._failed, self._stop_status
+
+    def restore(self, halt_state: tuple[bool, Status | None]) -> None:
+        """Set failure and stop status from halt_state."""
+        self._failed, self._stop_status = halt_state
+
+    def run(
+        self, budget: Budget | None = None, *, detect_loops: bool = False
+    ) -> int:
+        """Execute instruction one-by-one until we met HALT command.
+
+        If budget is exhausted before halt, status becomes STOPPED.
+        If detect_loops and program provably never halts,
+        status becomes LOOPED.
+        Return number of executed instructions.
+        """
+        self.resume()
+        watchdog = Watchdog(budget or Budget(), ram=self._ram)
+        detector = (
+            LoopDetector(registers=self._registers, ram=self._ram)
+            if detect_loops
+            else None
+        )
+        try:
+            while self.status is Status.RUNNING:
+                allowance = watchdog.allowance()
+                if allowance == 0:
+                    self.stop()
+                    break
+                steps = 0
+                if detector is None:
+                    while steps < allowance and self.status is Status.RUNNING:
+                        self.step()
+                        steps += 1
+                else:
+                    while steps < allowance and self.status is Status.RUNNING:
+                        self.step()
+                        steps += 1
+                        if detector.check():
+                            self.stop(Status.LOOPED)
+                watchdog.spend(steps)
+        finally:
+            if detector is not None:
+                detector.close()
+        return watchdog.spent
 
     def instruction_bits(self, opcode: Opcode) -> int:
         assert opcode in self.KNOWN_OPCODES
         return self.IR_BITS
 
+    def _invalidate(self, start: int, stop: int) -> None:
+        """Drop decoded instructions, that overlap written words."""
+        if not self._decoded:
+            return
+        start -= self._max_instruction_words - 1
+        if stop - start > len(self._decoded):
+            self._decoded = {
+                address: instruction
+                for address, instruction in self._decoded.items()
+                if not start <= address < stop
+            }
+            return
+        for address in range(start, stop):
+            self._decoded.pop(address, None)
+
     def _fetch(self) -> None:
-        """Read instruction and fetch opcode."""
-        instruction_address = self._registers[RegisterName.PC]
+        """Fetch and decode instruction or take it from cache."""
+        pc = self._registers.get_int(RegisterName.PC)
+        instruction = self._decoded.get(pc)
+        if instruction is None:
+            instruction_address = Cell(pc, bits=self._ram.address_bits)
+            # Instruction fetch is not a data read, as for cached ones
+            read_log = self._ram.read_log
+            self._ram.read_log = None
+            try:
+                instruction = self._read_instruction(
+                    instruction_address, from_cpu=True
+                )
+            finally:
+                self._ram.read_log = read_log
+            if self._ram.is_fill_range(pc, pc + instruction.words):
+                self._decoded[pc] = instruction
+        else:
+            self._ram.access_count += instruction.words
+
+        self._instruction = instruction
+        self._registers.set_int(RegisterName.IR, instruction.ir.unsigned)
+        for message in instruction.warnings:
+            warn(message, stacklevel=3)
+
+        self._registers.set_int(
+            RegisterName.PC, (pc + instruction.words) & self._address_mask
+        )
+
+    def instruction_at(self, address: int) -> DecodedInstruction | None:
+        """Decode instruction without changing machine state.
+
+        Return None for dirty memory or invalid instruction.
+        """
+        instruction = self._decoded.get(address)
+        if instruction is not None:
+            return instruction
+
+        instruction_address = Cell(address, bits=self._ram.address_bits)
+        try:
+            instruction = self._read_instruction(
+                instruction_address, from_cpu=False
+            )
+        except (WrongOpcodeError, RamAccessError):
+            return None
+
+        if not self._ram.is_fill_range(address, address + instruction.words):
+            return None
+
+        self._decoded[address] = instruction
+        return instruction
+
+    def _decode_fields(self, ir: Cell) -> tuple[Cell, ...]:
+        """Split instruction register into operand fields."""
+        assert ir.bits == self.IR_BITS
+        return ()
+
+    def _read_instruction(
+        self, instruction_address: Cell, *, from_cpu: bool
+    ) -> DecodedInstruction:
+        """Read instruction from memory and validate it."""
         opcode_word = self._ram.fetch(
-            address=instruction_address, bits=self._ram.word_bits
+            address=instruction_address,
+            bits=self._ram.word_bits,
+            from_cpu=from_cpu,
         )
         opcode_data = opcode_word[-OPCODE_BITS:].unsigned
 
@@ -161,90 +377,100 @@ class ControlUnit:
         additional_bits = instruction_bits - opcode_word.bits
         assert additional_bits >= 0
         if additional_bits == 0:
-            instruction = opcode_word
+            data = opcode_word
         else:
             operands = self._ram.fetch(
                 address=instruction_address
                 + Cell(1, bits=self._ram.address_bits),
                 bits=additional_bits,
+                from_cpu=from_cpu,
             )
-            instruction = Cell(
+            data = Cell(
                 (opcode_word.unsigned << additional_bits) | operands.unsigned,
                 bits=instruction_bits,
             )
 
-        self._registers[RegisterName.IR] = Cell(
-            instruction.unsigned << (self.IR_BITS - instruction_bits),
+        ir = Cell(
+            data.unsigned << (self.IR_BITS - instruction_bits),
             bits=self.IR_BITS,
         )
-        instruction_address += Cell(
-            instruction_bits // self._ram.word_bits,
-            bits=self._ram.address_bits,
+        instruction = DecodedInstruction(
+            opcode=opcode,
+            ir=ir,
+            words=instruction_bits // self._ram.word_bits,
+            fields=self._decode_fields(ir),
         )
-        self._registers[RegisterName.PC] = instruction_address
+
+        current = self._instruction
+        self._instruction = instruction
+        self._decode_warnings = []
+        try:
+            self._decode()
+        finally:
+            self._instruction = current
+
+        if self._decode_warnings:
+            instruction = replace(
+                instruction, warnings=tuple(self._decode_warnings)
+            )
+        return instruction
 
     def _decode(self) -> None:
         """Verify that opcode is correct."""
 
-    def _load(self) -> None:
-        """Load data from memory to operation registers."""
-        raise NotImplementedError
-
-    _CU_ABS_EXEC_NOP: Final = frozenset(
-        {
-            Opcode.move,
-            Opcode.load,
-            Opcode.store,
-            Opcode.addr,
-            Opcode.push,
-            Opcode.pop,
-            Opcode.dup,
-        }
+    EXECUTE_RULES: ClassVar[Rules] = (
+        (
+            frozenset(
+                {
+                    Opcode.move,
+                    Opcode.load,
+                    Opcode.store,
+                    Opcode.addr,
+                    Opcode.push,
+                    Opcode.pop,
+                    Opcode.dup,
+                }
+            ),
+            None,
+        ),
+        (frozenset({Opcode.halt}), "_exec_halt"),
+        (frozenset({Opcode.add}), "_exec_add"),
+        (frozenset({Opcode.sub}), "_exec_sub"),
+        (frozenset({Opcode.smul}), "_exec_smul"),
+        (frozenset({Opcode.umul}), "_exec_umul"),
+        (frozenset({Opcode.sdiv}), "_exec_sdivmod"),
+        (frozenset({Opcode.udiv}), "_exec_udivmod"),
+        (frozenset({Opcode.jump}), "_exec_jump"),
+        (CONDJUMP_OPCODES, "_exec_cond_jump"),
     )
 
-    def _execute(self) -> None:
-        """Run arithmetic instructions."""
-        if self._opcode in self._CU_ABS_EXEC_NOP:
-            pass
-        elif self._opcode is Opcode.halt:
-            self._alu.halt()
-        elif self._opcode is Opcode.add:
-            self._alu.add()
-        elif self._opcode is Opcode.sub:
-            self._alu.sub()
-        elif self._opcode is Opcode.smul:
-            self._alu.smul()
-        elif self._opcode is Opcode.umul:
-            self._alu.umul()
-        elif self._opcode is Opcode.sdiv:
-            self._alu.sdivmod()
-        elif self._opcode is Opcode.udiv:
-            self._alu.udivmod()
-        elif self._opcode is Opcode.jump:
-            self._alu.jump()
-        elif self._opcode is Opcode.jeq:
-            self._alu.cond_jump(signed=False, comp=EQUAL, equal=True)
-        elif self._opcode is Opcode.jneq:
-            self._alu.cond_jump(signed=False, comp=EQUAL, equal=False)
-        elif self._opcode is Opcode.sjl:
-            self._alu.cond_jump(signed=True, comp=LESS, equal=False)
-        elif self._opcode is Opcode.sjgeq:
-            self._alu.cond_jump(signed=True, comp=GREATER, equal=True)
-        elif self._opcode is Opcode.sjleq:
-            self._alu.cond_jump(signed=True, comp=LESS, equal=True)
-        elif self._opcode is Opcode.sjg:
-            self._alu.cond_jump(signed=True, comp=GREATER, equal=False)
-        elif self._opcode is Opcode.ujl:
-            self._alu.cond_jump(signed=False, comp=LESS, equal=False)
-        elif self._opcode is Opcode.ujgeq:
-            self._alu.cond_jump(signed=False, comp=GREATER, equal=True)
-        elif self._opcode is Opcode.ujleq:
-            self._alu.cond_jump(signed=False, comp=LESS, equal=True)
-        elif self._opcode is Opcode.ujg:
-            self._alu.cond_jump(signed=False, comp=GREATER, equal=False)
-        else:
-            self._wrong_opcode(self._opcode)
+    def _exec_halt(self) -> None:
+        self._alu.halt()
+
+    def _exec_add(self) -> None:
+        self._alu.add()
+
+    def _exec_sub(self) -> None:
+        self._alu.sub()
+
+    def _exec_smul(self) -> None:
+        self._alu.smul()
+
+    def _exec_umul(self) -> None:
+        self._alu.umul()
+
+    def _exec_sdivmod(self) -> None:
+        self._alu.sdivmod()
+
+    def _exec_udivmod(self) -> None:
+        self._alu.udivmod()
+
+    def _exec_swap(self) -> None:
+        self._alu.swap()
+
+    def _exec_jump(self) -> None:
+        self._alu.jump()
 
-    def _write_back(self) -> None:
-        """Save result of calculation to memory."""
-        raise NotImplementedError
+    def _exec_cond_jump(self) -> None:
+        signed, comp, equal = COND_JUMP_PARAMS[self._opcode]
+        self._alu.cond_jump(signed=signed, comp=comp, equal=equal)
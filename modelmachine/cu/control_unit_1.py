@@ -43,9 +43,12 @@ class ControlUnit1(ControlUnit):
     )
     PAGE_SIZE = 8
 
+    def _decode_fields(self, ir: Cell) -> tuple[Cell, ...]:
+        return (ir[: self._ram.address_bits],)
+
     @property
     def _address(self) -> Cell:
-        return self._ir[: self._ram.address_bits]
+        return self._fields[0]
 
     _EXPECT_ZERO_ADDR: Final = frozenset({Opcode.swap, Opcode.halt})
 
@@ -55,35 +58,40 @@ class ControlUnit1(ControlUnit):
 
     _LOAD_R: Final = ARITHMETIC_OPCODES | {Opcode.comp}
 
-    def _load(self) -> None:
-        """Load registers R and S."""
-        if self._opcode in self._LOAD_R:
-            self._registers[RegisterName.R] = self._ram.fetch(
-                address=self._address, bits=self._alu.operand_bits
-            )
-
-        if self._opcode is Opcode.load:
-            self._registers[RegisterName.S] = self._ram.fetch(
-                address=self._address, bits=self._alu.operand_bits
-            )
-
-        if self._opcode in JUMP_OPCODES:
-            self._registers[RegisterName.ADDR] = self._address
-
-    def _execute(self) -> None:
-        """Add specific commands: conditional jumps and cmp."""
-        if self._opcode is Opcode.comp:
-            saved_s = self._registers[RegisterName.S]
-            self._alu.sub()
-            self._registers[RegisterName.S] = saved_s
-        elif self._opcode is Opcode.swap:
-            self._alu.swap()
-        else:
-            super()._execute()
-
-    def _write_back(self) -> None:
-        """Write result back."""
-        if self._opcode is Opcode.store:
-            self._ram.put(
-                address=self._address, value=self._registers[RegisterName.S]
-            )
+    LOAD_RULES = (
+        (_LOAD_R, "_load_r"),
+        (frozenset({Opcode.load}), "_load_s"),
+        (JUMP_OPCODES, "_load_addr"),
+    )
+
+    def _load_r(self) -> None:
+        self._registers[RegisterName.R] = self._ram.fetch(
+            address=self._address, bits=self._alu.operand_bits
+        )
+
+    def _load_s(self) -> None:
+        self._registers[RegisterName.S] = self._ram.fetch(
+            address=self._address, bits=self._alu.operand_bits
+        )
+
+    def _load_addr(self) -> None:
+        self._registers[RegisterName.ADDR] = self._address
+
+    EXECUTE_RULES = (
+        *ControlUnit.EXECUTE_RULES,
+        (frozenset({Opcode.comp}), "_exec_comp"),
+        (frozenset({Opcode.swap}), "_exec_swap"),
+    )
+
+    def _exec_comp(self) -> None:
+        """Compare S and R, S is saved."""
+        saved_s = self._registers.get_int(RegisterName.S)
+        self._alu.sub()
+        self._registers.set_int(RegisterName.S, saved_s)
+
+    WRITE_BACK_RULES = ((frozenset({Opcode.store}), "_write_s"),)
+
+    def _write_s(self) -> None:
+        self._ram.put(
+            address=self._address, value=self._registers[RegisterName.S]
+        )
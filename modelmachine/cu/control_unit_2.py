@@ -38,13 +38,19 @@ class ControlUnit2(ControlUnit):
     )
     PAGE_SIZE = 8
 
+    def _decode_fields(self, ir: Cell) -> tuple[Cell, ...]:
+        return (
+            ir[self._ram.address_bits : 2 * self._ram.address_bits],
+            ir[: self._ram.address_bits],
+        )
+
     @property
     def _address1(self) -> Cell:
-        return self._ir[self._ram.address_bits : 2 * self._ram.address_bits]
+        return self._fields[0]
 
     @property
     def _address2(self) -> Cell:
-        return self._ir[: self._ram.address_bits]
+        return self._fields[1]
 
     def _decode(self) -> None:
         if self._opcode in JUMP_OPCODES:
@@ -55,43 +61,48 @@ class ControlUnit2(ControlUnit):
 
     _LOAD_R1R2: Final = ARITHMETIC_OPCODES | {Opcode.comp}
 
-    def _load(self) -> None:
-        """Load registers R1 and R2."""
-        if self._opcode is Opcode.move:
-            self._registers[RegisterName.R1] = self._ram.fetch(
-                address=self._address2, bits=self._alu.operand_bits
-            )
+    LOAD_RULES = (
+        (frozenset({Opcode.move}), "_load_move"),
+        (_LOAD_R1R2, "_load_r1r2"),
+        (JUMP_OPCODES, "_load_addr"),
+    )
+
+    def _load_move(self) -> None:
+        self._registers[RegisterName.R1] = self._ram.fetch(
+            address=self._address2, bits=self._alu.operand_bits
+        )
 
-        if self._opcode in self._LOAD_R1R2:
-            self._registers[RegisterName.R1] = self._ram.fetch(
-                address=self._address1, bits=self._alu.operand_bits
-            )
+    def _load_r1r2(self) -> None:
+        self._registers[RegisterName.R1] = self._ram.fetch(
+            address=self._address1, bits=self._alu.operand_bits
+        )
 
-            self._registers[RegisterName.R2] = self._ram.fetch(
-                address=self._address2, bits=self._alu.operand_bits
-            )
+        self._registers[RegisterName.R2] = self._ram.fetch(
+            address=self._address2, bits=self._alu.operand_bits
+        )
 
-        if self._opcode in JUMP_OPCODES:
-            self._registers[RegisterName.ADDR] = self._address2
+    def _load_addr(self) -> None:
+        self._registers[RegisterName.ADDR] = self._address2
 
-    def _execute(self) -> None:
-        """Add specific commands: conditional jumps and cmp."""
-        if self._opcode is Opcode.comp:
-            self._alu.sub()
-        else:
-            super()._execute()
+    EXECUTE_RULES = (
+        *ControlUnit.EXECUTE_RULES,
+        (frozenset({Opcode.comp}), "_exec_sub"),
+    )
 
     _WB_R1: Final = ARITHMETIC_OPCODES | {Opcode.move}
 
-    def _write_back(self) -> None:
-        """Write result back."""
-        if self._opcode in self._WB_R1:
-            self._ram.put(
-                address=self._address1, value=self._registers[RegisterName.R1]
-            )
-
-        if self._opcode in DWORD_WRITE_BACK:
-            self._ram.put(
-                address=self._address1 + self._operand_words,
-                value=self._registers[RegisterName.R2],
-            )
+    WRITE_BACK_RULES = (
+        (_WB_R1, "_write_r1"),
+        (DWORD_WRITE_BACK, "_write_r2"),
+    )
+
+    def _write_r1(self) -> None:
+        self._ram.put(
+            address=self._address1, value=self._registers[RegisterName.R1]
+        )
+
+    def _write_r2(self) -> None:
+        self._ram.put(
+            address=self._address1 + self._operand_words,
+            value=self._registers[RegisterName.R2],
+        )
@@ -37,19 +37,24 @@ class ControlUnit3(ControlUnit):
     )
     PAGE_SIZE = 4
 
+    def _decode_fields(self, ir: Cell) -> tuple[Cell, ...]:
+        return (
+            ir[2 * self._ram.address_bits : 3 * self._ram.address_bits],
+            ir[self._ram.address_bits : 2 * self._ram.address_bits],
+            ir[: self._ram.address_bits],
+        )
+
     @property
     def _address1(self) -> Cell:
-        return self._ir[
-            2 * self._ram.address_bits : 3 * self._ram.address_bits
-        ]
+        return self._fields[0]
 
     @property
     def _address2(self) -> Cell:
-        return self._ir[self._ram.address_bits : 2 * self._ram.address_bits]
+        return self._fields[1]
 
     @property
     def _address3(self) -> Cell:
-        return self._ir[: self._ram.address_bits]
+        return self._fields[2]
 
     def _decode(self) -> None:
         if self._opcode is Opcode.jump:
@@ -65,43 +70,52 @@ class ControlUnit3(ControlUnit):
 
     _LOAD_R1R2: Final = ARITHMETIC_OPCODES | CONDJUMP_OPCODES
 
-    def _load(self) -> None:
-        """Load registers R1 and R2."""
-
-        if self._opcode is Opcode.move:
-            self._registers[RegisterName.S] = self._ram.fetch(
-                address=self._address1, bits=self._alu.operand_bits
-            )
-
-        if self._opcode in self._LOAD_R1R2:
-            self._registers[RegisterName.R1] = self._ram.fetch(
-                address=self._address1, bits=self._alu.operand_bits
-            )
-            self._registers[RegisterName.R2] = self._ram.fetch(
-                address=self._address2, bits=self._alu.operand_bits
-            )
-
-        if self._opcode in JUMP_OPCODES:
-            self._registers[RegisterName.ADDR] = self._address3
+    LOAD_RULES = (
+        (frozenset({Opcode.move}), "_load_move"),
+        (_LOAD_R1R2, "_load_r1r2"),
+        (JUMP_OPCODES, "_load_addr"),
+    )
 
-    def _execute(self) -> None:
-        """Add specific commands: conditional jumps."""
-        if self._opcode in CONDJUMP_OPCODES:
-            self._alu.sub()
+    def _load_move(self) -> None:
+        self._registers[RegisterName.S] = self._ram.fetch(
+            address=self._address1, bits=self._alu.operand_bits
+        )
+
+    def _load_r1r2(self) -> None:
+        self._registers[RegisterName.R1] = self._ram.fetch(
+            address=self._address1, bits=self._alu.operand_bits
+        )
+        self._registers[RegisterName.R2] = self._ram.fetch(
+            address=self._address2, bits=self._alu.operand_bits
+        )
+
+    def _load_addr(self) -> None:
+        self._registers[RegisterName.ADDR] = self._address3
+
+    EXECUTE_RULES = (
+        *ControlUnit.EXECUTE_RULES,
+        (CONDJUMP_OPCODES, "_exec_comp_jump"),
+    )
 
-        super()._execute()
+    def _exec_comp_jump(self) -> None:
+        """Conditional jumps compare operands first."""
+        self._alu.sub()
+        self._exec_cond_jump()
 
     _WB_OPCODES: Final = ARITHMETIC_OPCODES | {Opcode.move}
 
-    def _write_back(self) -> None:
-        """Write result back."""
-        if self._opcode in self._WB_OPCODES:
-            self._ram.put(
-                address=self._address3, value=self._registers[RegisterName.S]
-            )
+    WRITE_BACK_RULES = (
+        (_WB_OPCODES, "_write_s"),
+        (DWORD_WRITE_BACK, "_write_r1"),
+    )
 
-        if self._opcode in DWORD_WRITE_BACK:
-            self._ram.put(
-                address=self._address3 + self._operand_words,
-                value=self._registers[RegisterName.R1],
-            )
+    def _write_s(self) -> None:
+        self._ram.put(
+            address=self._address3, value=self._registers[RegisterName.S]
+        )
+
+    def _write_r1(self) -> None:
+        self._ram.put(
+            address=self._address3 + self._operand_words,
+            value=self._registers[RegisterName.R1],
+        )
@@ -2,7 +2,12 @@ from __future__ import annotations
 
 from ..cell import Cell
 from ..memory.register import RegisterName
-from .control_unit_r import REG_NO_BITS, ControlUnitR
+from .control_unit_r import (
+    REG_NO_BITS,
+    WRITE_R_NEXT_RULE,
+    WRITE_S_RULE,
+    ControlUnitR,
+)
 from .opcode import JUMP_OPCODES, Opcode
 
 
@@ -14,7 +19,7 @@ class ControlUnitM(ControlUnitR):
 
     @property
     def _address(self) -> Cell:
-        address = self._ir[: self._ram.address_bits]
+        address = self._fields[2]
         if self._ry == RegisterName.R0:
             modifier = Cell(0, bits=self._ram.address_bits)
         else:
@@ -28,13 +33,20 @@ class ControlUnitM(ControlUnitR):
         if self._opcode is Opcode.halt:
             self._expect_zero()
 
-    def _load(self) -> None:
-        """Load registers S and S1."""
-        if self._opcode is Opcode.addr:
-            self._registers[RegisterName.S] = Cell(
-                self._address.unsigned, bits=self._alu.operand_bits
-            )
-        else:
-            super()._load()
+    LOAD_RULES = (
+        (frozenset({Opcode.addr}), "_load_address"),
+        *ControlUnitR.LOAD_RULES,
+    )
+
+    def _load_address(self) -> None:
+        self._registers[RegisterName.S] = Cell(
+            self._address.unsigned, bits=self._alu.operand_bits
+        )
 
     WB_R1 = ControlUnitR.WB_R1 | {Opcode.addr}
+
+    WRITE_BACK_RULES = (
+        (WB_R1, "_write_rx"),
+        WRITE_R_NEXT_RULE,
+        WRITE_S_RULE,
+    )
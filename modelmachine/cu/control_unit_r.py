@@ -21,9 +21,17 @@ if TYPE_CHECKING:
     from ..alu import ArithmeticLogicUnit
     from ..memory.ram import RandomAccessMemory
     from ..memory.register import RegisterMemory
+    from .control_unit import Rule, Rules
 
 REG_NO_BITS = 4
 
+# Write-back rules, that mm-m inherits
+WRITE_R_NEXT_RULE: Final[Rule] = (
+    frozenset({Opcode.udiv, Opcode.sdiv, Opcode.rudiv, Opcode.rsdiv}),
+    "_write_r_next",
+)
+WRITE_S_RULE: Final[Rule] = (frozenset({Opcode.store}), "_write_s")
+
 
 class ControlUnitR(ControlUnit):
     """Control unit for register model machine."""
@@ -49,35 +57,32 @@ class ControlUnitR(ControlUnit):
         R2=RegisterName.S1,
     )
 
+    def _decode_fields(self, ir: Cell) -> tuple[Cell, ...]:
+        return (
+            ir[
+                self._ram.address_bits + REG_NO_BITS : self._ram.address_bits
+                + 2 * REG_NO_BITS
+            ],
+            ir[self._ram.address_bits : self._ram.address_bits + REG_NO_BITS],
+            ir[: self._ram.address_bits],
+        )
+
     @property
     def _rx(self) -> RegisterName:
-        reg_no = self._ir[
-            self._ram.address_bits + REG_NO_BITS : self._ram.address_bits
-            + 2 * REG_NO_BITS
-        ].unsigned
-        return RegisterName(RegisterName.R0 + reg_no)
+        return RegisterName(RegisterName.R0 + self._fields[0].unsigned)
 
     @property
     def _r_next(self) -> RegisterName:
-        reg_no = (
-            self._ir[
-                self._ram.address_bits + REG_NO_BITS : self._ram.address_bits
-                + 2 * REG_NO_BITS
-            ]
-            + Cell(1, bits=REG_NO_BITS)
-        ).unsigned
+        reg_no = (self._fields[0] + Cell(1, bits=REG_NO_BITS)).unsigned
         return RegisterName(RegisterName.R0 + reg_no)
 
     @property
     def _ry(self) -> RegisterName:
-        reg_no = self._ir[
-            self._ram.address_bits : self._ram.address_bits + REG_NO_BITS
-        ].unsigned
-        return RegisterName(RegisterName.R0 + reg_no)
+        return RegisterName(RegisterName.R0 + self._fields[1].unsigned)
 
     @property
     def _address(self) -> Cell:
-        return self._ir[: self._ram.address_bits]
+        return self._fields[2]
 
     def __init__(
         self,
@@ -134,69 +139,74 @@ class ControlUnitR(ControlUnit):
         | {Opcode.comp, Opcode.store}
     )
 
-    def _load(self) -> None:
-        """Load registers S and S1."""
-        if self._opcode in self._LOAD_FROM_MEMORY:
-            self._registers[RegisterName.S1] = self._ram.fetch(
-                address=self._address, bits=self._alu.operand_bits
-            )
+    LOAD_RULES: ClassVar[Rules] = (
+        (_LOAD_FROM_MEMORY, "_load_s1_from_memory"),
+        (REGISTER_OPCODES, "_load_s1_from_ry"),
+        (_LOAD_S, "_load_s"),
+        (JUMP_OPCODES, "_load_addr"),
+    )
 
-        if self._opcode in REGISTER_OPCODES:
-            self._registers[RegisterName.S1] = self._registers[self._ry]
+    def _load_s1_from_memory(self) -> None:
+        self._registers[RegisterName.S1] = self._ram.fetch(
+            address=self._address, bits=self._alu.operand_bits
+        )
 
-        if self._opcode in self._LOAD_S:
-            self._registers[RegisterName.S] = self._registers[self._rx]
+    def _load_s1_from_ry(self) -> None:
+        self._registers.set_int(
+            RegisterName.S1, self._registers.get_int(self._ry)
+        )
 
-        if self._opcode in JUMP_OPCODES:
-            self._registers[RegisterName.ADDR] = self._address
+    def _load_s(self) -> None:
+        self._registers.set_int(
+            RegisterName.S, self._registers.get_int(self._rx)
+        )
+
+    def _load_addr(self) -> None:
+        self._registers[RegisterName.ADDR] = self._address
 
     _EXEC_SUB: Final = frozenset(
         {Opcode.comp, Opcode.rcomp, Opcode.sub, Opcode.rsub}
     )
     _EXEC_MOV: Final = frozenset({Opcode.load, Opcode.rmove})
 
-    def _execute(self) -> None:
-        """Execute the command."""
-        if self._opcode in self._EXEC_SUB:
-            self._alu.sub()
-        elif self._opcode in self._EXEC_MOV:
-            self._registers[RegisterName.S] = self._registers[RegisterName.S1]
-        elif self._opcode is Opcode.radd:
-            self._alu.add()
-        elif self._opcode is Opcode.rumul:
-            self._alu.umul()
-        elif self._opcode is Opcode.rudiv:
-            self._alu.udivmod()
-        elif self._opcode is Opcode.rsmul:
-            self._alu.smul()
-        elif self._opcode is Opcode.rsdiv:
-            self._alu.sdivmod()
-        else:
-            super()._execute()
+    EXECUTE_RULES = (
+        *ControlUnit.EXECUTE_RULES,
+        (_EXEC_SUB, "_exec_sub"),
+        (_EXEC_MOV, "_exec_move"),
+        (frozenset({Opcode.radd}), "_exec_add"),
+        (frozenset({Opcode.rumul}), "_exec_umul"),
+        (frozenset({Opcode.rudiv}), "_exec_udivmod"),
+        (frozenset({Opcode.rsmul}), "_exec_smul"),
+        (frozenset({Opcode.rsdiv}), "_exec_sdivmod"),
+    )
+
+    def _exec_move(self) -> None:
+        self._registers.set_int(
+            RegisterName.S, self._registers.get_int(RegisterName.S1)
+        )
 
     WB_R1: ClassVar = (
         ARITHMETIC_OPCODES
         | REGISTER_ARITH_OPCODES
         | {Opcode.load, Opcode.rmove}
     )
-    _WB_R_NEXT: Final = frozenset(
-        {
-            Opcode.udiv,
-            Opcode.sdiv,
-            Opcode.rudiv,
-            Opcode.rsdiv,
-        }
+    WRITE_BACK_RULES: ClassVar[Rules] = (
+        (WB_R1, "_write_rx"),
+        WRITE_R_NEXT_RULE,
+        WRITE_S_RULE,
     )
 
-    def _write_back(self) -> None:
-        """Write result back."""
-        if self._opcode in self.WB_R1:
-            self._registers[self._rx] = self._registers[RegisterName.S]
+    def _write_rx(self) -> None:
+        self._registers.set_int(
+            self._rx, self._registers.get_int(RegisterName.S)
+        )
 
-        if self._opcode in self._WB_R_NEXT:
-            self._registers[self._r_next] = self._registers[RegisterName.S1]
+    def _write_r_next(self) -> None:
+        self._registers.set_int(
+            self._r_next, self._registers.get_int(RegisterName.S1)
+        )
 
-        if self._opcode is Opcode.store:
-            self._ram.put(
-                address=self._address, value=self._registers[RegisterName.S]
-            )
+    def _write_s(self) -> None:
+        self._ram.put(
+            address=self._address, value=self._registers[RegisterName.S]
+        )
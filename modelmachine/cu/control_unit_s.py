@@ -46,9 +46,12 @@ class ControlUnitS(ControlUnit):
         R2=RegisterName.R2,
     )
 
+    def _decode_fields(self, ir: Cell) -> tuple[Cell, ...]:
+        return (ir[: self._ram.address_bits],)
+
     @property
     def _address(self) -> Cell:
-        return self._ir[: self._ram.address_bits]
+        return self._fields[0]
 
     @property
     def _stack_pointer(self) -> Cell:
@@ -96,31 +99,41 @@ class ControlUnitS(ControlUnit):
     _LOAD_R1R2: Final = ARITHMETIC_OPCODES | {Opcode.comp, Opcode.sswap}
     _LOAD_R1: Final = frozenset({Opcode.pop, Opcode.dup})
 
-    def _load(self) -> None:
-        """Load registers R1 and R2."""
-        if self._opcode is Opcode.push:
-            self._registers[RegisterName.R1] = self._ram.fetch(
-                address=self._address, bits=self._alu.operand_bits
-            )
+    LOAD_RULES = (
+        (frozenset({Opcode.push}), "_load_push"),
+        (_LOAD_R1, "_load_r1"),
+        (_LOAD_R1R2, "_load_r1r2"),
+        (JUMP_OPCODES, "_load_addr"),
+    )
 
-        if self._opcode in self._LOAD_R1:
-            self._registers[RegisterName.R1] = self._ram.fetch(
-                address=self._stack_pointer, bits=self._alu.operand_bits
-            )
+    def _load_push(self) -> None:
+        self._registers[RegisterName.R1] = self._ram.fetch(
+            address=self._address, bits=self._alu.operand_bits
+        )
 
-        if self._opcode in self._LOAD_R1R2:
-            self._registers[RegisterName.R1] = self._ram.fetch(
-                address=self._stack_pointer
-                + Cell(3, bits=self._ram.address_bits),
-                bits=self._alu.operand_bits,
-            )
+    def _load_r1(self) -> None:
+        self._registers[RegisterName.R1] = self._ram.fetch(
+            address=self._stack_pointer, bits=self._alu.operand_bits
+        )
 
-            self._registers[RegisterName.R2] = self._ram.fetch(
-                address=self._stack_pointer, bits=self._alu.operand_bits
-            )
+    def _load_r1r2(self) -> None:
+        self._registers[RegisterName.R1] = self._ram.fetch(
+            address=self._stack_pointer + Cell(3, bits=self._ram.address_bits),
+            bits=self._alu.operand_bits,
+        )
 
-        if self._opcode in JUMP_OPCODES:
-            self._registers[RegisterName.ADDR] = self._address
+        self._registers[RegisterName.R2] = self._ram.fetch(
+            address=self._stack_pointer, bits=self._alu.operand_bits
+        )
+
+    def _load_addr(self) -> None:
+        self._registers[RegisterName.ADDR] = self._address
+
+    EXECUTE_RULES = (
+        *ControlUnit.EXECUTE_RULES,
+        (frozenset({Opcode.comp}), "_exec_sub"),
+        (frozenset({Opcode.sswap}), "_exec_swap"),
+    )
 
     _SP_PLUS: Final = frozenset(
         {
@@ -133,22 +146,6 @@ class ControlUnitS(ControlUnit):
     )
     _SP_MINUS: Final = frozenset({Opcode.push, Opcode.dup})
 
-    def _execute(self) -> None:
-        """Add specific commands."""
-        if self._opcode is Opcode.comp:
-            self._alu.sub()
-        elif self._opcode is Opcode.sswap:
-            self._alu.swap()
-        else:
-            super()._execute()
-
-        if self._opcode is Opcode.comp:
-            self._stack_pointer += Cell(6, bits=self._ram.address_bits)
-        elif self._opcode in self._SP_PLUS:
-            self._stack_pointer += Cell(3, bits=self._ram.address_bits)
-        elif self._opcode in self._SP_MINUS:
-            self._stack_pointer -= Cell(3, bits=self._ram.address_bits)
-
     _WB_R1: Final = frozenset(
         {
             Opcode.add,
@@ -168,26 +165,41 @@ class ControlUnitS(ControlUnit):
         }
     )
 
-    def _write_back(self) -> None:
-        """Write result back."""
-        if self._opcode is Opcode.pop:
-            self._ram.put(
-                address=self._address, value=self._registers[RegisterName.R1]
-            )
-
-        if self._opcode in self._WB_R1:
-            self._ram.put(
-                address=self._stack_pointer,
-                value=self._registers[RegisterName.R1],
-            )
-
-        if self._opcode in self._WB_DWORD:
-            self._ram.put(
-                address=self._stack_pointer
-                + Cell(3, bits=self._ram.address_bits),
-                value=self._registers[RegisterName.R1],
-            )
-            self._ram.put(
-                address=self._stack_pointer,
-                value=self._registers[RegisterName.R2],
-            )
+    WRITE_BACK_RULES = (
+        (frozenset({Opcode.comp}), "_sp_plus_two"),
+        (_SP_PLUS, "_sp_plus"),
+        (_SP_MINUS, "_sp_minus"),
+        (frozenset({Opcode.pop}), "_write_pop"),
+        (_WB_R1, "_write_r1"),
+        (_WB_DWORD, "_write_dword"),
+    )
+
+    def _sp_plus_two(self) -> None:
+        self._stack_pointer += Cell(6, bits=self._ram.address_bits)
+
+    def _sp_plus(self) -> None:
+        self._stack_pointer += Cell(3, bits=self._ram.address_bits)
+
+    def _sp_minus(self) -> None:
+        self._stack_pointer -= Cell(3, bits=self._ram.address_bits)
+
+    def _write_pop(self) -> None:
+        self._ram.put(
+            address=self._address, value=self._registers[RegisterName.R1]
+        )
+
+    def _write_r1(self) -> None:
+        self._ram.put(
+            address=self._stack_pointer,
+            value=self._registers[RegisterName.R1],
+        )
+
+    def _write_dword(self) -> None:
+        self._ram.put(
+            address=self._stack_pointer + Cell(3, bits=self._ram.address_bits),
+            value=self._registers[RegisterName.R1],
+        )
+        self._ram.put(
+            address=self._stack_pointer,
+            value=self._registers[RegisterName.R2],
+        )
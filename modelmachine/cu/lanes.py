@@ -0,0 +1,635 @@
+"""Lockstep engine: one program, many inputs.
+
+Lanes are copies of cpu, that run the same program with different
+input data. Registers and memory of all lanes are NumPy arrays,
+basic blocks are compiled, like in blocks module, into functions,
+that execute every instruction for a group of lanes at once.
+Lanes, that come to different addresses, are split into groups
+and are merged again, when they meet at the same address.
+
+Lane, that meets anything unusual: dirty memory, access over memory
+bound, division by zero, instruction, that cannot be compiled, or code,
+that differs from code of other lanes, leaves lockstep and is finished
+by ControlUnit.run, so results are identical to Cpu.rerun.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from time import monotonic
+from typing import TYPE_CHECKING
+
+try:
+    import numpy as np
+except ImportError as exc:  # pragma: no cover
+    msg = "Lockstep engine requires numpy: pip install modelmachine[lanes]"
+    raise ImportError(msg) from exc
+
+from ..alu import CF, EQUAL, HALT, LESS, OF, SF, ZF
+from ..cell import Endianess
+from ..cpu.cpu import Snapshot
+from ..memory.interval_set import IntervalSet
+from ..memory.ram import RamSnapshot
+from ..memory.register import RegisterName
+from .blocks import (
+    MAX_BLOCK_STEPS,
+    BlockBuilder,
+    NotCompilableError,
+    _handler_generator,
+    _owner,
+    exec_sub,
+    flags,
+    translate,
+)
+from .budget import Budget
+from .control_unit import COND_JUMP_PARAMS, ControlUnit
+from .control_unit_3 import ControlUnit3
+from .opcode import JUMP_OPCODES
+from .status import Status
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+    from typing import Any, Callable, Final, TextIO
+
+    from numpy.typing import NDArray
+
+    from ..cpu.cpu import Cpu
+    from .blocks import Generator
+    from .control_unit import DecodedInstruction
+
+    Array = NDArray[Any]
+    LaneFunction = Callable[["Lanes", Array, int], "tuple[int, int, Any]"]
+
+# Registers are int64, if product of two operands fits into it,
+# otherwise python integers in arrays of objects
+INT64_BITS = 63
+
+
+_LANE_HANDLERS: dict[tuple[type[ControlUnit], str], Generator] = {}
+
+
+def _lane_generator(
+    cu: type[ControlUnit], f: Callable[[ControlUnit], None]
+) -> Generator:
+    name = f.__name__
+    owner = _owner(cu, name)
+    generator = _LANE_HANDLERS.get((owner, name))
+    if generator is None or vars(owner)[name] is not f:
+        return _handler_generator(cu, f)
+    return generator
+
+
+def lane_handler(
+    cu: type[ControlUnit], *names: str
+) -> Callable[[Generator], Generator]:
+    """Register code generator, that replaces one from blocks module."""
+
+    def register(f: Generator) -> Generator:
+        for name in names:
+            _LANE_HANDLERS[cu, name] = f
+        return f
+
+    return register
+
+
+def div_to_zero(a: Any, b: Any) -> Any:
+    """Vectorized cell.div_to_zero."""
+    div = abs(a) // abs(b)
+    return np.where((a < 0) != (b < 0), -div, div)
+
+
+class LaneBuilder(BlockBuilder):
+    """Generate source code of block, that runs on group of lanes.
+
+    Every variable is an array with value per lane or a constant.
+    Guard doesn't leave block at once, but marks bad lanes:
+    the block stops before instruction, where some lane is bad.
+    """
+
+    _guarded: bool
+
+    def guard(self, cond: str) -> None:
+        self.emit(f"bad = bad | ({cond})")
+        self._guarded = True
+
+    def load(self, address: str, words: int | None = None) -> str:
+        if words is None:
+            words = self.operand_words
+        if address.isdigit() and int(address) + words > self.memory_size:
+            raise NotCompilableError(address)
+        self.guard(f"missing(idx, {address}, {words})")
+        value = self.tmp(f"read(idx, {address}, {words})")
+        self._accesses += words
+        return value
+
+    def store(
+        self, address: str, value: str, words: int | None = None
+    ) -> None:
+        if words is None:
+            words = self.operand_words
+        if address.isdigit():
+            if int(address) + words > self.memory_size:
+                raise NotCompilableError(address)
+        else:
+            self.guard(f"{address} + {words} > {self.memory_size}")
+        self._effects.append(
+            f"modified |= write(idx, {address}, {words}, {value})"
+        )
+        self._accesses += words
+
+    def add_instruction(
+        self, address: int, instruction: DecodedInstruction
+    ) -> None:
+        lines = len(self._lines)
+        used = set(self._used)
+        self.instruction = instruction
+        self._pending = {}
+        self._effects = []
+        self._accesses = instruction.words
+        self._guarded = False
+
+        self.emit(f"# 0x{address:x}: {instruction.opcode.name}")
+        self.emit("if done == limit:")
+        self.emit("    break")
+        try:
+            self.set_reg(
+                RegisterName.PC,
+                str((address + instruction.words) & self.address_mask),
+            )
+            self.set_reg(RegisterName.IR, str(instruction.ir.unsigned))
+            for f in self.cu.DISPATCH[instruction.opcode]:
+                _lane_generator(self.cu, f)(self)
+        except NotCompilableError:
+            del self._lines[lines:]
+            self._used = used
+            raise
+
+        if self._guarded:
+            self.emit("if np.any(bad):")
+            self.emit("    break")
+        for reg, expr in self._pending.items():
+            self.emit(f"r_{reg.name} = {expr}")
+            self._written.add(reg)
+        self.emit(f"acc += {self._accesses}")
+        self.emit("done += 1")
+        for effect in self._effects:
+            self.emit(effect)
+        if self._effects:
+            self.emit("if modified:")
+            self.emit("    break")
+        self.instructions += 1
+        self._ends_with_jump = instruction.opcode in JUMP_OPCODES
+
+    def source(self) -> str:
+        """Source code of function, that executes block for lanes idx.
+
+        Block, that ends with jump to its start, repeats while all
+        lanes jump to the start. Function returns executed instructions,
+        ram accesses per lane and mask of lanes, that cannot execute
+        the next instruction.
+        """
+        if self._ends_with_jump:
+            self.emit(f"if np.any(r_PC != {self.start}):")
+            self.emit("    break")
+        else:
+            self.emit("break")
+        prologue = [
+            f"    r_{reg.name} = regs[idx, {int(reg)}]"
+            for reg in sorted(self._used)
+        ]
+        epilogue = [
+            f"    regs[idx, {int(reg)}] = r_{reg.name}"
+            for reg in sorted(self._written)
+        ]
+        return "\n".join(
+            [
+                f"def lanes_{self.start:x}(lanes, idx, limit):",
+                "    regs = lanes.regs",
+                "    read = lanes.read",
+                "    missing = lanes.missing",
+                "    write = lanes.write",
+                *prologue,
+                "    acc = 0",
+                "    done = 0",
+                "    bad = False",
+                "    modified = False",
+                "    while True:",
+                *self._lines,
+                *epilogue,
+                "    return done, acc, bad",
+                "",
+            ]
+        )
+
+
+@lane_handler(ControlUnit, "_exec_sdivmod")
+def exec_sdivmod(b: BlockBuilder) -> None:
+    a = b.tmp(b.signed(b.reg(b.alu_reg("R1"))))
+    c = b.tmp(b.signed(b.reg(b.alu_reg("R2"))))
+    b.guard(f"{c} == 0")
+    c = b.tmp(f"np.where({c} == 0, 1, {c})")
+    div = b.tmp(f"div_to_zero({a}, {c})")
+    s = b.tmp(f"{div} & {b.operand_mask}")
+    res = b.tmp(f"({a} - {div} * {c}) & {b.operand_mask}")
+    f = flags(b, s, signed=div, unsigned=None)
+    b.set_reg(b.alu_reg("S"), s)
+    b.set_reg(b.alu_reg("RES"), res)
+    b.set_reg(RegisterName.FLAGS, f)
+
+
+@lane_handler(ControlUnit, "_exec_udivmod")
+def exec_udivmod(b: BlockBuilder) -> None:
+    a = b.reg(b.alu_reg("R1"))
+    c = b.reg(b.alu_reg("R2"))
+    b.guard(f"{c} == 0")
+    c = b.tmp(f"np.where({c} == 0, 1, {c})")
+    s = b.tmp(f"{a} // {c}")
+    res = b.tmp(f"{a} - {s} * {c}")
+    f = flags(b, s, signed=None, unsigned=None)
+    b.set_reg(b.alu_reg("S"), s)
+    b.set_reg(b.alu_reg("RES"), res)
+    b.set_reg(RegisterName.FLAGS, f)
+
+
+@lane_handler(ControlUnit, "_exec_cond_jump")
+def exec_cond_jump(b: BlockBuilder) -> None:
+    signed, comp, equal = COND_JUMP_PARAMS[b.instruction.opcode]
+    f = b.reg(RegisterName.FLAGS)
+
+    def bit(flag: int) -> str:
+        return f"(np.bitwise_and({f}, {flag}) != 0)"
+
+    zf = bit(ZF)
+    if comp == EQUAL:
+        cond = zf if equal else f"~{zf}"
+    else:
+        less = f"({bit(SF)} != {bit(OF)})" if signed else bit(CF)
+        cond = less if comp == LESS else f"~{less}"
+        cond = f"{zf} | {cond}" if equal else f"~{zf} & {cond}"
+
+    addr = b.reg(RegisterName.ADDR)
+    pc = b.reg(RegisterName.PC)
+    b.set_reg(RegisterName.PC, f"np.where({cond}, {addr}, {pc})")
+
+
+@lane_handler(ControlUnit3, "_exec_comp_jump")
+def cu3_exec_comp_jump(b: BlockBuilder) -> None:
+    exec_sub(b)
+    exec_cond_jump(b)
+
+
+class Lanes:
+    """Registers, memory and counters of all lanes of one run.
+
+    Array of registers has a column for every RegisterName,
+    memory is an array of words and fill map for every lane.
+    Methods are used by compiled blocks.
+    """
+
+    regs: Final[Array]
+    mem: Final[Array]
+    fill: Final[Array]
+    access: Final[Array]
+    start_access: Final[Array]
+    steps: Final[Array]
+    code: Final[Array]
+    results: Final[list[LaneResult | None]]
+    budget: Final[Budget]
+    deadline: Final[float | None]
+    dtype: Final[Any]
+    word_bits: Final[int]
+    word_mask: Final[int]
+    memory_size: Final[int]
+
+    def __init__(
+        self,
+        *,
+        regs: Array,
+        mem: Array,
+        fill: Array,
+        access: Array,
+        word_bits: int,
+        budget: Budget,
+    ):
+        """See help(type(x))."""
+        self.regs = regs
+        self.mem = mem
+        self.fill = fill
+        self.access = access
+        self.start_access = access.copy()
+        self.steps = np.zeros(len(regs), dtype=np.int64)
+        self.memory_size = mem.shape[1]
+        self.code = np.zeros(self.memory_size, dtype=bool)
+        self.results = [None] * len(regs)
+        self.budget = budget
+        self.deadline = (
+            None if budget.seconds is None else monotonic() + budget.seconds
+        )
+        self.dtype = regs.dtype
+        self.word_bits = word_bits
+        self.word_mask = (1 << word_bits) - 1
+
+    def read(self, idx: Array, address: Any, words: int) -> Any:
+        """Operand by address for every lane; missing words are zero."""
+        address = np.minimum(
+            np.asarray(address, dtype=np.int64), self.memory_size - words
+        )
+        value = self.mem[idx, address]
+        for k in range(1, words):
+            value = (value << self.word_bits) | self.mem[idx, address + k]
+        return value.astype(self.dtype)
+
+    def missing(self, idx: Array, address: Any, words: int) -> Array:
+        """Mask of lanes, where operand is dirty or out of memory."""
+        address = np.asarray(address, dtype=np.int64)
+        bad: Array = address + words > self.memory_size
+        address = np.minimum(address, self.memory_size - words)
+        for k in range(words):
+            bad = bad | ~self.fill[idx, address + k]
+        return bad
+
+    def write(self, idx: Array, address: Any, words: int, value: Any) -> bool:
+        """Write operand; return True if compiled code was written."""
+        address = np.asarray(address, dtype=np.int64)
+        modified = False
+        for k in range(words):
+            shift = self.word_bits * (words - 1 - k)
+            self.mem[idx, address + k] = (value >> shift) & self.word_mask
+            self.fill[idx, address + k] = True
+            modified = modified or bool(self.code[address + k].any())
+        return modified
+
+    def exhausted(self, idx: Array) -> Array:
+        """Mask of lanes, that spent steps or ram accesses of budget."""
+        mask = np.zeros(len(idx), dtype=bool)
+        if self.budget.steps is not None:
+            mask |= self.steps[idx] >= self.budget.steps
+        if self.budget.ram_accesses is not None:
+            spent = self.access[idx] - self.start_access[idx]
+            mask |= spent >= self.budget.ram_accesses
+        return mask
+
+
+@dataclass(frozen=True)
+class LaneResult:
+    """State of lane after run, the same as of cpu after Cpu.rerun."""
+
+    status: Status
+    failed: bool
+    steps: int
+    snapshot: Snapshot
+
+
+@dataclass(frozen=True)
+class LaneBlock:
+    """Compiled instructions from start to stop (exclusive) and their code."""
+
+    start: int
+    stop: int
+    instructions: int
+    code: Array
+    source: str
+    function: LaneFunction | None
+
+
+class LockstepEngine:
+    """Run loaded program of cpu for many inputs in lockstep.
+
+    Cpu is a template: lanes are made by Cpu.reset and lanes,
+    that leave lockstep, are finished on it, so its state after run
+    is undefined; use Cpu.restore with snapshot of LaneResult.
+    """
+
+    _cpu: Final[Cpu]
+    _dtype: Final[Any]
+    _word_bytes: Final[int]
+    blocks: Final[dict[int, LaneBlock]]
+
+    def __init__(self, cpu: Cpu):
+        """See help(type(x))."""
+        assert cpu.ram.endianess is Endianess.BIG
+        self._cpu = cpu
+        self._dtype = (
+            np.int64 if 2 * cpu.control_unit.IR_BITS < INT64_BITS else object
+        )
+        self._word_bytes = -(-cpu.ram.word_bits // 8)
+        self.blocks = {}
+
+    def _lanes(self, files: Sequence[TextIO], budget: Budget) -> Lanes:
+        cpu = self._cpu
+        snapshots = []
+        for file in files:
+            cpu.reset(file)
+            snapshots.append(cpu.snapshot())
+
+        wb = self._word_bytes
+        count = len(snapshots)
+        memory = np.frombuffer(
+            b"".join(s.ram.memory for s in snapshots), dtype=np.uint8
+        ).reshape(count, -1, wb)
+        words = np.zeros((*memory.shape[:2], 8), dtype=np.uint8)
+        words[..., 8 - wb :] = memory
+        fill = np.frombuffer(
+            b"".join(s.ram.fill for s in snapshots), dtype=np.uint8
+        ).reshape(count, -1)
+        lanes = Lanes(
+            regs=np.array([s.registers for s in snapshots], dtype=self._dtype),
+            mem=words.view(">u8")[..., 0].astype(np.int64),
+            fill=fill != 0,
+            access=np.array(
+                [s.ram.access_count for s in snapshots], dtype=np.int64
+            ),
+            word_bits=cpu.ram.word_bits,
+            budget=budget,
+        )
+        for block in self.blocks.values():
+            lanes.code[block.start : block.stop] = True
+        return lanes
+
+    def _snapshot(
+        self, lanes: Lanes, lane: int, stop: Status | None
+    ) -> Snapshot:
+        fill = lanes.fill[lane]
+        edges = np.flatnonzero(
+            np.diff(fill.astype(np.int8), prepend=0, append=0)
+        )
+        filled = IntervalSet()
+        for start, end in zip(edges[::2], edges[1::2]):
+            filled.add(int(start), int(end))
+        words = lanes.mem[lane].astype(">u8").view(np.uint8).reshape(-1, 8)
+        return Snapshot(
+            ram=RamSnapshot(
+                memory=words[:, 8 - self._word_bytes :].tobytes(),
+                fill=fill.astype(np.uint8).tobytes(),
+                filled=filled,
+                access_count=int(lanes.access[lane]),
+            ),
+            registers=tuple(int(x) for x in lanes.regs[lane]),
+            halt_state=(False, stop),
+        )
+
+    def _finish(self, lanes: Lanes, idx: Array, stop: Status | None) -> None:
+        status = Status.HALTED if stop is None else stop
+        for lane in idx:
+            lanes.results[lane] = LaneResult(
+                status=status,
+                failed=False,
+                steps=int(lanes.steps[lane]),
+                snapshot=self._snapshot(lanes, lane, stop),
+            )
+
+    def _eject(self, lanes: Lanes, idx: Array) -> None:
+        """Finish lanes by interpreter with the rest of budget."""
+        cpu = self._cpu
+        budget = lanes.budget
+        for lane in idx:
+            cpu.restore(self._snapshot(lanes, lane, None))
+            steps = int(lanes.steps[lane])
+            spent = int(lanes.access[lane] - lanes.start_access[lane])
+            done = cpu.control_unit.run(
+                Budget(
+                    steps=None
+                    if budget.steps is None
+                    else budget.steps - steps,
+                    ram_accesses=(
+                        None
+                        if budget.ram_accesses is None
+                        else budget.ram_accesses - spent
+                    ),
+                    seconds=(
+                        None
+                        if lanes.deadline is None
+                        else max(lanes.deadline - monotonic(), 0.0)
+                    ),
+                )
+            )
+            lanes.results[lane] = LaneResult(
+                status=cpu.control_unit.status,
+                failed=cpu.control_unit.failed,
+                steps=steps + done,
+                snapshot=cpu.snapshot(),
+            )
+
+    def _compile(self, lanes: Lanes, start: int, lane: int) -> LaneBlock:
+        """Compile block from start by code of lane."""
+        cpu = self._cpu
+        cpu.restore(self._snapshot(lanes, lane, None))
+        builder = LaneBuilder(
+            cu=type(cpu.control_unit),
+            start=start,
+            registers=cpu.registers,
+            ram=cpu.ram,
+        )
+        stop = translate(builder, cpu.control_unit, cpu.ram)
+        source = builder.source()
+        function = None
+        if builder.instructions != 0:
+            namespace: dict[str, Any] = {
+                "np": np,
+                "div_to_zero": div_to_zero,
+            }
+            code = compile(source, f"<lanes 0x{start:x}>", "exec")
+            exec(code, namespace)  # noqa: S102 generated by LaneBuilder
+            function = namespace[f"lanes_{start:x}"]
+
+        block = LaneBlock(
+            start=start,
+            stop=stop,
+            instructions=builder.instructions,
+            code=lanes.mem[lane, start:stop].copy(),
+            source=source,
+            function=function,
+        )
+        self.blocks[start] = block
+        lanes.code[start:stop] = True
+        return block
+
+    def _same_code(self, lanes: Lanes, block: LaneBlock, idx: Array) -> Array:
+        code = lanes.mem[idx, block.start : block.stop]
+        fill = lanes.fill[idx, block.start : block.stop]
+        same: Array = (code == block.code).all(axis=1) & fill.all(axis=1)
+        return same
+
+    def _block(
+        self, lanes: Lanes, start: int, idx: Array
+    ) -> tuple[LaneBlock, Array]:
+        """Block from start and lanes, that have the same code."""
+        block = self.blocks.get(start)
+        if block is not None:
+            same = self._same_code(lanes, block, idx)
+            if not same.any():
+                block = None
+        if block is None:
+            block = self._compile(lanes, start, int(idx[0]))
+            same = self._same_code(lanes, block, idx)
+        self._eject(lanes, idx[~same])
+        return block, idx[same]
+
+    def _regroup(
+        self, lanes: Lanes, idx: Array, groups: dict[int, list[Array]]
+    ) -> None:
+        """Finish halted and exhausted lanes, group others by PC."""
+        flags = lanes.regs[idx, int(RegisterName.FLAGS)]
+        halted = np.bitwise_and(flags, HALT) != 0
+        stopped = ~halted & lanes.exhausted(idx)
+        self._finish(lanes, idx[halted], None)
+        self._finish(lanes, idx[stopped], Status.STOPPED)
+        idx = idx[~(halted | stopped)]
+        pcs = lanes.regs[idx, int(RegisterName.PC)].astype(np.int64)
+        for pc in np.unique(pcs):
+            groups.setdefault(int(pc), []).append(idx[pcs == pc])
+
+    def run(
+        self, files: Sequence[TextIO], budget: Budget | None = None
+    ) -> list[LaneResult]:
+        """Run program for every input file, like Cpu.rerun.
+
+        Steps are counted exactly, ram accesses and time are checked
+        between blocks. Return results in order of files.
+        """
+        if not files:
+            return []
+        lanes = self._lanes(files, budget or Budget())
+        groups: dict[int, list[Array]] = {}
+        self._regroup(lanes, np.arange(len(files)), groups)
+        while groups:
+            if lanes.deadline is not None and monotonic() >= lanes.deadline:
+                for group in groups.values():
+                    for idx in group:
+                        self._finish(lanes, idx, Status.STOPPED)
+                break
+
+            # The least advanced group goes first, so lanes, that took
+            # the longer path, can be caught up and merged
+            start = min(
+                groups,
+                key=lambda pc: min(
+                    int(lanes.steps[i].min()) for i in groups[pc]
+                ),
+            )
+            block, idx = self._block(
+                lanes, start, np.concatenate(groups.pop(start))
+            )
+            if block.function is None:
+                self._eject(lanes, idx)
+                continue
+            if len(idx) == 0:
+                continue
+
+            limit = MAX_BLOCK_STEPS
+            if lanes.budget.steps is not None:
+                limit = min(
+                    limit, lanes.budget.steps - int(lanes.steps[idx].max())
+                )
+            done, acc, bad = block.function(lanes, idx, limit)
+            lanes.steps[idx] += done
+            lanes.access[idx] += acc
+            bad = np.broadcast_to(bad, idx.shape)
+            self._eject(lanes, idx[bad])
+            self._regroup(lanes, idx[~bad], groups)
+
+        results = []
+        for result in lanes.results:
+            assert result is not None
+            results.append(result)
+        return results
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from typing import Final
+
+    from ..memory.ram import RandomAccessMemory
+    from ..memory.register import RegisterMemory
+
+
+class LoopDetector:
+    """Find program, that provably never halts.
+
+    Machine is deterministic and ram changes only by writes, so if
+    registers repeat their state without ram write in between,
+    the program repeats the same cycle forever.
+
+    Cycle is searched by Brent's algorithm: state is saved at steps
+    1, 2, 4, 8, ... after last ram write and compared with every next
+    state, so memory is constant and a cycle of length L is found
+    in at most 2 * L + tail steps. Ram is never scanned: any write
+    just restarts the search.
+    """
+
+    _registers: Final[RegisterMemory]
+    _ram: Final[RandomAccessMemory]
+    _saved: tuple[int, ...] | None
+    _power: int
+    _distance: int
+
+    def __init__(self, *, registers: RegisterMemory, ram: RandomAccessMemory):
+        """See help(type(x))."""
+        self._registers = registers
+        self._ram = ram
+        self._saved = None
+        self._power = 1
+        self._distance = 0
+        ram.write_listeners.append(self._written)
+
+    def _written(self, start: int, stop: int) -> None:
+        del start, stop
+        self._saved = None
+
+    def close(self) -> None:
+        """Stop watching ram writes."""
+        self._ram.write_listeners.remove(self._written)
+
+    def check(self) -> bool:
+        """Take state after step, return True if cycle is found."""
+        state = self._registers.int_state
+        if self._saved is None:
+            self._saved = state
+            self._power = 1
+            self._distance = 0
+            return False
+        if state == self._saved:
+            return True
+        self._distance += 1
+        if self._distance == self._power:
+            self._saved = state
+            self._power *= 2
+            self._distance = 0
+        return False
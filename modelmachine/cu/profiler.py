@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING
+
+from ..memory.register import RegisterName
+from .budget import Budget, Watchdog
+from .status import Status
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from typing import Any, Final
+
+    from ..memory.ram import RandomAccessMemory
+    from ..memory.register import RegisterMemory
+    from .control_unit import ControlUnit
+
+INVALID = "invalid"
+
+
+@dataclass
+class Hotspot:
+    """Statistics of instruction, executed at address."""
+
+    address: int
+    opcode: str
+    count: int = 0
+    reads: int = 0
+    writes: int = 0
+
+
+class Profiler:
+    """Run program step by step and count instructions and ram accesses.
+
+    Ram reads and writes, including instruction fetch, are attributed
+    to the executed instruction. Control unit itself is not changed,
+    so run without profiler costs nothing extra.
+    """
+
+    _control_unit: Final[ControlUnit]
+    _registers: Final[RegisterMemory]
+    _ram: Final[RandomAccessMemory]
+    hotspots: Final[dict[tuple[int, str], Hotspot]]
+    _writes: int
+
+    def __init__(
+        self,
+        *,
+        control_unit: ControlUnit,
+        registers: RegisterMemory,
+        ram: RandomAccessMemory,
+    ):
+        """See help(type(x))."""
+        self._control_unit = control_unit
+        self._registers = registers
+        self._ram = ram
+        self.hotspots = {}
+        self._writes = 0
+
+    def _count_writes(self, start: int, stop: int) -> None:
+        self._writes += stop - start
+
+    def step(self) -> None:
+        """Execute and profile one instruction."""
+        pc = self._registers.get_int(RegisterName.PC)
+        instruction = self._control_unit.instruction_at(pc)
+        opcode = INVALID if instruction is None else instruction.opcode.name
+        accesses = self._ram.access_count
+        self._writes = 0
+
+        self._control_unit.step()
+
+        hotspot = self.hotspots.get((pc, opcode))
+        if hotspot is None:
+            hotspot = self.hotspots[pc, opcode] = Hotspot(pc, opcode)
+        hotspot.count += 1
+        hotspot.writes += self._writes
+        hotspot.reads += self._ram.access_count - accesses - self._writes
+
+    def run(self, budget: Budget | None = None) -> int:
+        """Execute program like ControlUnit.run, but with profiling."""
+        control_unit = self._control_unit
+        control_unit.resume()
+        watchdog = Watchdog(budget or Budget(), ram=self._ram)
+        self._ram.write_listeners.append(self._count_writes)
+        try:
+            while control_unit.status is Status.RUNNING:
+                allowance = watchdog.allowance()
+                if allowance == 0:
+                    control_unit.stop()
+                    break
+                steps = 0
+                while (
+                    steps < allowance and control_unit.status is Status.RUNNING
+                ):
+                    self.step()
+                    steps += 1
+                watchdog.spend(steps)
+        finally:
+            self._ram.write_listeners.remove(self._count_writes)
+        return watchdog.spent
+
+    @property
+    def instructions(self) -> int:
+        return sum(h.count for h in self.hotspots.values())
+
+    def opcodes(self) -> dict[str, Hotspot]:
+        """Statistics, summed by opcode; address is the hottest one."""
+        result: dict[str, Hotspot] = {}
+        for h in sorted(self.hotspots.values(), key=lambda h: -h.count):
+            total = result.setdefault(h.opcode, Hotspot(h.address, h.opcode))
+            total.count += h.count
+            total.reads += h.reads
+            total.writes += h.writes
+        return result
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "instructions": self.instructions,
+            "opcodes": {
+                name: {"count": h.count, "reads": h.reads, "writes": h.writes}
+                for name, h in self.opcodes().items()
+            },
+            "addresses": [
+                asdict(h)
+                for h in sorted(
+                    self.hotspots.values(), key=lambda h: (-h.count, h.address)
+                )
+            ],
+        }
+
+    def report(self, top: int = 20) -> Iterable[str]:
+        """Lines of tables of hottest addresses and opcodes."""
+        total = max(self.instructions, 1)
+        header = f"{'count':>10} {'%':>6} {'reads':>10} {'writes':>10}"
+
+        yield f"{'address':<8} {'opcode':<8} {header}"
+        hottest = sorted(
+            self.hotspots.values(), key=lambda h: (-h.count, h.address)
+        )
+        for h in hottest[:top]:
+            yield (
+                f"0x{h.address:04x}   {h.opcode:<8} {h.count:>10}"
+                f" {100 * h.count / total:>6.2f} {h.reads:>10} {h.writes:>10}"
+            )
+
+        yield ""
+        yield f"{'opcode':<17} {header}"
+        for name, h in self.opcodes().items():
+            yield (
+                f"{name:<17} {h.count:>10}"
+                f" {100 * h.count / total:>6.2f} {h.reads:>10} {h.writes:>10}"
+            )
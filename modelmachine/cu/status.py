@@ -4,6 +4,8 @@ from enum import IntEnum
 class Status(IntEnum):
     RUNNING = 0
     HALTED = 1
+    STOPPED = 2
+    LOOPED = 3
 
     def __str__(self) -> str:
         return f"Status.{self.name}"
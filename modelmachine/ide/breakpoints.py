@@ -0,0 +1,253 @@
+"""Breakpoints, watchpoints and conditions of debugger."""
+
+from __future__ import annotations
+
+import re
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+from ..cell import Cell
+from ..memory.register import RegisterName
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from typing import Callable, Final, Iterator
+
+    from ..cpu.cpu import Cpu
+    from ..memory.ram import RandomAccessMemory
+    from ..memory.register import RegisterMemory
+
+CONDITION = re.compile(r"\s*(-?\w+)\s*(==|!=|<=|>=|<|>)\s*(-?\w+)\s*")
+
+
+@dataclass(frozen=True)
+class Condition:
+    """Comparison of registers and integers, compiled into predicate.
+
+    Registers are compared as signed integers.
+    """
+
+    text: str
+    predicate: Callable[[RegisterMemory], bool]
+
+
+def _operand(token: str, registers: RegisterMemory) -> str:
+    try:
+        return str(int(token, 0))
+    except ValueError:
+        pass
+
+    name = RegisterName.__members__.get(token.upper())
+    if name is None or name not in registers:
+        msg = f"Unknown register '{token}'"
+        raise ValueError(msg)
+    sign = 1 << (registers[name].bits - 1)
+    return f"((regs.get_int(RegisterName.{name.name}) ^ {sign}) - {sign})"
+
+
+def compile_condition(text: str, registers: RegisterMemory) -> Condition:
+    """Parse condition like 'R5 > 10' and compile it once."""
+    match = CONDITION.fullmatch(text)
+    if match is None:
+        msg = f"Expected condition like 'R5 > 10', got '{text.strip()}'"
+        raise ValueError(msg)
+
+    left, op, right = match.groups()
+    expr = f"{_operand(left, registers)} {op} {_operand(right, registers)}"
+    predicate = eval(  # noqa: S307 built from checked tokens
+        f"lambda regs: {expr}", {"RegisterName": RegisterName}
+    )
+    return Condition(text=f"{left} {op} {right}", predicate=predicate)
+
+
+class Breakpoints:
+    """Breakpoints and watchpoints, indexed by address.
+
+    Breakpoint at address pauses, when the next instruction covers it
+    or when the last instruction wrote it; conditional breakpoint pauses
+    only at the instruction and if condition is true. Watchpoints pause
+    after read or write of address, conditions - after any step,
+    where they are true.
+    """
+
+    code: Final[dict[int, Condition | None]]
+    reads: Final[set[int]]
+    writes: Final[set[int]]
+    conditions: Final[dict[str, Condition]]
+    _registers: Final[RegisterMemory]
+    _ram: Final[RandomAccessMemory]
+    _address_bits: Final[int]
+    _max_words: Final[int]
+    # Addresses of instructions, that can cover some breakpoint
+    _near: Final[dict[int, int]]
+    # Some watched address was written since the last could_hit()
+    # or start_chunk()
+    _written: bool
+
+    def __init__(self, cpu: Cpu):
+        """See help(type(x))."""
+        control_unit = cpu.control_unit
+        self.code = {}
+        self.reads = set()
+        self.writes = set()
+        self.conditions = {}
+        self._registers = cpu.registers
+        self._ram = cpu.ram
+        self._address_bits = cpu.ram.address_bits
+        self._max_words = max(
+            control_unit.instruction_bits(opcode) // cpu.ram.word_bits
+            for opcode in control_unit.KNOWN_OPCODES
+        )
+        self._near = {}
+        self._written = False
+
+    def __bool__(self) -> bool:
+        return bool(self.code or self.reads or self.writes or self.conditions)
+
+    def __contains__(self, address: int) -> bool:
+        return (
+            address in self.code
+            or address in self.reads
+            or (address in self.writes)
+        )
+
+    def _cell(self, address: int) -> Cell:
+        return Cell(address, bits=self._address_bits)
+
+    def _index(self, address: int, delta: int) -> None:
+        for start in range(max(0, address - self._max_words + 1), address + 1):
+            count = self._near.get(start, 0) + delta
+            if count == 0:
+                del self._near[start]
+            else:
+                self._near[start] = count
+
+    def set_code(self, address: int, condition: Condition | None) -> None:
+        if address not in self.code:
+            self._index(address, 1)
+        self.code[address] = condition
+
+    def remove_code(self, address: int) -> None:
+        del self.code[address]
+        self._index(address, -1)
+
+    def condition(self, text: str) -> Condition:
+        return compile_condition(text, self._registers)
+
+    def clear(self) -> None:
+        self.code.clear()
+        self.reads.clear()
+        self.writes.clear()
+        self.conditions.clear()
+        self._near.clear()
+
+    def describe(self) -> list[str]:
+        """Human readable list of all breakpoints."""
+        lines = []
+        for address, condition in sorted(self.code.items()):
+            line = f"breakpoint at {self._cell(address)}"
+            if condition is not None:
+                line += f" if {condition.text}"
+            lines.append(line)
+        lines.extend(
+            f"read watchpoint at {self._cell(a)}" for a in sorted(self.reads)
+        )
+        lines.extend(
+            f"write watchpoint at {self._cell(a)}" for a in sorted(self.writes)
+        )
+        lines.extend(f"condition {text}" for text in self.conditions)
+        return lines
+
+    def _on_write(self, start: int, stop: int) -> None:
+        for address in range(start, stop):
+            if address in self.writes or (
+                address in self.code and self.code[address] is None
+            ):
+                self._written = True
+
+    @contextmanager
+    def tracking_writes(self) -> Iterator[None]:
+        """Watch writes for could_hit(), while cpu runs without log."""
+        self._written = False
+        self._ram.write_listeners.append(self._on_write)
+        try:
+            yield
+        finally:
+            self._ram.write_listeners.remove(self._on_write)
+
+    def start_chunk(self) -> None:
+        """Forget writes before the next chunk of steps without log.
+
+        Restore and replay of the previous chunk notify about writes,
+        that have already been checked.
+        """
+        self._written = False
+
+    def could_hit(self, pc: int) -> bool:
+        """Check without logs after step inside tracking_writes().
+
+        If False, hit() is None unless read watchpoints are set.
+        """
+        if self._written:
+            self._written = False
+            return True
+        if pc in self._near:
+            return True
+        return any(
+            condition.predicate(self._registers)
+            for condition in self.conditions.values()
+        )
+
+    def hit(
+        self,
+        *,
+        pc: int,
+        current_cmd: Callable[[], range],
+        reads: Iterable[tuple[int, int]],
+        writes: Iterable[int],
+    ) -> str | None:
+        """Reason to pause before instruction at pc or None.
+
+        reads and writes are made by the last step; current_cmd
+        is called only if some breakpoint is near pc.
+        """
+        if pc in self._near:
+            for address in current_cmd():
+                if address not in self.code:
+                    continue
+                condition = self.code[address]
+                if condition is None:
+                    return (
+                        "pause at breakpoint: "
+                        f"operation at {self._cell(address)}"
+                    )
+                if condition.predicate(self._registers):
+                    return (
+                        "pause at breakpoint: "
+                        f"operation at {self._cell(address)} "
+                        f"if {condition.text}"
+                    )
+
+        for address in writes:
+            if address in self.writes or (
+                address in self.code and self.code[address] is None
+            ):
+                return (
+                    f"pause at data breakpoint: write to {self._cell(address)}"
+                )
+
+        if self.reads:
+            for start, words in reads:
+                for address in range(start, start + words):
+                    if address in self.reads:
+                        return (
+                            "pause at data breakpoint: "
+                            f"read from {self._cell(address)}"
+                        )
+
+        for condition in self.conditions.values():
+            if condition.predicate(self._registers):
+                return f"pause at condition: {condition.text}"
+
+        return None
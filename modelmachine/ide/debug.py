@@ -14,7 +14,7 @@ from prompt_toolkit import PromptSession
 from pyparsing import Group as Gr
 
 from ..cell import Cell
-from ..cpu.source import kw, posinteger
+from ..cpu.grammar import kw, posinteger
 from ..cu.opcode import OPCODE_BITS, Opcode
 from ..cu.status import Status
 from ..memory.register import RegisterName
@@ -28,6 +28,8 @@ from ..prompt import (
     printf,
     prompt,
 )
+from .breakpoints import Breakpoints
+from .history import CHECKPOINT_STEPS, MAX_HISTORY_BYTES, History
 
 if TYPE_CHECKING:
     from types import FrameType
@@ -40,9 +42,15 @@ INSTRUCTION = (
     f"  {RED}s{DEF}tep [count=1]        make count of steps\n"
     f"  {RED}c{DEF}ontinue              continue until breakpoint or halt\n"
     f"  {RED}b{DEF}reakpoint [addr]     set/unset breakpoint at addr\n"
+    f"  {RED}b{DEF}reakpoint [addr] if <reg> <op> <value>\n"
+    f"                        set conditional breakpoint or condition, like 'if R5 > 10'\n"
+    f"  {RED}w{DEF}atch <addr>          set/unset watchpoint on write to addr\n"
+    f"  {RED}rw{DEF}atch <addr>         set/unset watchpoint on read from addr\n"
+    f"  {RED}clear{DEF}                 remove all breakpoints and watchpoints\n"
     f"  {RED}m{DEF}emory <begin> <end>  view random access memory\n"
     f"  {RED}rs{DEF}tep [count=1]       make count of steps in reverse direction\n"
-    f"  {RED}rc{DEF}ontinue             continue until breakpoint or cycle=0 in reverse direction\n"
+    f"  {RED}rc{DEF}ontinue             continue until breakpoint or start of history in reverse direction\n"
+    f"  {RED}g{DEF}oto <cycle>          go to cycle in any direction, ignoring breakpoints\n"
     f"  {RED}q{DEF}uit\n"
 )
 
@@ -54,12 +62,30 @@ continuec = Gr(kw("continue") | kw("c"))("continue")
 rcontinuec = Gr(kw("reverse-continue") | kw("rcontinue") | kw("rc"))(
     "reverse_continue"
 )
-breakc = Gr((kw("breakpoint") | kw("break") | kw("b")) + posinteger[0, 1])(
-    "breakpoint"
-)
+breakc = Gr(
+    (kw("breakpoint") | kw("break") | kw("b"))
+    + posinteger[0, 1]
+    + (kw("if") + pp.Regex(r"\S.*"))[0, 1]
+)("breakpoint")
+watchc = Gr((kw("watch") | kw("w")) + posinteger)("watch")
+rwatchc = Gr((kw("rwatch") | kw("rw")) + posinteger)("rwatch")
+clearc = Gr(kw("clear"))("clear")
+gotoc = Gr((kw("goto") | kw("g")) + posinteger)("goto")
 memoryc = Gr((kw("memory") | kw("m")) + posinteger[2][0, 1])("memory")
 quitc = Gr(kw("quit") | kw("q"))("quit")
-debug_cmd = stepc | rstepc | continuec | rcontinuec | memoryc | quitc | breakc
+debug_cmd = (
+    stepc
+    | rstepc
+    | continuec
+    | rcontinuec
+    | memoryc
+    | quitc
+    | breakc
+    | watchc
+    | rwatchc
+    | clearc
+    | gotoc
+)
 
 
 def tabulate(data: list[tuple[str, str, str]]) -> str:
@@ -73,24 +99,47 @@ def tabulate(data: list[tuple[str, str, str]]) -> str:
 class Ide:
     cpu: Cpu
     max_register_hex: Final[int]
-    _cycle: int
-    _ram_access_count: list[int]
+    history: Final[History]
+    _first_reported: int
     _quit: bool
     _running: bool
-    _breakpoints: set[Cell]
-
-    def __init__(self, cpu: Cpu):
+    breakpoints: Final[Breakpoints]
+    # Rendered lines of memory pages, see memory_lines()
+    _page_lines: Final[dict[int, str]]
+    # Filled pages in order or None, if they should be found again
+    _pages: dict[int, None] | None
+    # Pages with highlighted cells at the last render
+    _decorated: set[int]
+
+    def __init__(
+        self,
+        cpu: Cpu,
+        *,
+        max_history_bytes: int = MAX_HISTORY_BYTES,
+        checkpoint_steps: int = CHECKPOINT_STEPS,
+        history: History | None = None,
+    ):
         self.cpu = cpu
-        self.cpu.registers.write_log = [{}]
-        self.cpu.ram.write_log = [{}]
+        self.history = (
+            History(
+                cpu,
+                max_bytes=max_history_bytes,
+                checkpoint_steps=checkpoint_steps,
+            )
+            if history is None
+            else history
+        )
         self.max_register_hex = (
             max(cpu.registers[reg].bits for reg in cpu.registers) // 4 + 2
         )
-        self._cycle = 0
-        self._ram_access_count = [0]
+        self._first_reported = 0
         self._quit = False
         self._running = False
-        self._breakpoints = set()
+        self.breakpoints = Breakpoints(cpu)
+        self._page_lines = {}
+        self._pages = None
+        self._decorated = set()
+        cpu.ram.write_listeners.append(self._on_write)
 
     @contextmanager
     def running(self) -> Iterator[None]:
@@ -102,29 +151,22 @@ class Ide:
 
     @property
     def is_breakpoint(self) -> bool:
-        current_cmd = self.current_cmd
-        assert self.cpu.ram.write_log is not None
-        for br in self._breakpoints:
-            if br.unsigned in current_cmd:
-                printf(f"{CYA}pause at breakpoint: operation at {br}{DEF}")
-                return True
-            for addr in self.cpu.ram.write_log[-1]:
-                if br.unsigned == addr:
-                    printf(
-                        f"{CYA}pause at data breakpoint: write to {br}{DEF}"
-                    )
-                    return True
-        return False
+        if not self.breakpoints:
+            return False
+        reason = self.breakpoints.hit(
+            pc=self.cpu.registers.get_int(RegisterName.PC),
+            current_cmd=lambda: self.current_cmd,
+            reads=self.history.last_reads,
+            writes=self.history.last_ram,
+        )
+        if reason is None:
+            return False
+        printf(f"{CYA}{reason}{DEF}")
+        return True
 
     def exec_step(self, *, breakp: bool) -> bool:
         """Returns if we should continue execution."""
-        self._cycle += 1
-        assert self.cpu.registers.write_log is not None
-        self.cpu.registers.write_log.append({})
-        assert self.cpu.ram.write_log is not None
-        self.cpu.ram.write_log.append({})
-        self.cpu.control_unit.step()
-        self._ram_access_count.append(self.cpu.ram.access_count)
+        self.history.step()
 
         if breakp and self.is_breakpoint:
             return False
@@ -133,8 +175,7 @@ class Ide:
 
     def step(self, count: int = 1) -> None:
         """Exec debug step command."""
-        if self.cpu.control_unit.status == Status.HALTED:
-            printf(f"{RED}cannot execute 'step': machine halted{DEF}")
+        if self.cannot_run("step"):
             return
 
         with self.running():
@@ -148,30 +189,43 @@ class Ide:
 
         self.dump_state()
 
-    def exec_reverse_step(self, *, breakp: bool) -> bool:
-        if self._cycle == 0:
+    @property
+    def stop_reason(self) -> str | None:
+        status = self.cpu.control_unit.status
+        if status is Status.HALTED:
+            return "machine halted"
+        if status is not Status.RUNNING:
+            return "end of trace"
+        return None
+
+    def cannot_run(self, cmd: str) -> bool:
+        reason = self.stop_reason
+        if reason is None:
             return False
+        printf(f"{RED}cannot execute '{cmd}': {reason}{DEF}")
+        return True
 
-        self._cycle -= 1
-        self._ram_access_count.pop()
-
-        assert self.cpu.registers.write_log is not None
-        for reg, (old, _) in self.cpu.registers.write_log.pop().items():
-            self.cpu.registers._table[reg] = old  # noqa: SLF001
-
-        assert self.cpu.ram.write_log is not None
-        for addr, (fill, oldr, _) in self.cpu.ram.write_log.pop().items():
-            self.cpu.ram._table[addr] = oldr  # noqa: SLF001
-            if fill:
-                self.cpu.ram._fill[addr] = 0  # noqa: SLF001
-
-        self.cpu.ram.access_count = self._ram_access_count[-1]
+    def exec_reverse_step(self, *, breakp: bool) -> bool:
+        if not self.history.back():
+            return False
 
         return not (breakp and self.is_breakpoint)
 
+    def cannot_reverse(self, cmd: str) -> bool:
+        history = self.history
+        if history.cycle > history.first:
+            return False
+        if history.first == 0:
+            printf(f"{RED}cannot execute '{cmd}': cycle=0{DEF}")
+        else:
+            printf(
+                f"{RED}cannot execute '{cmd}': history starts "
+                f"at cycle={history.first}{DEF}"
+            )
+        return True
+
     def reverse_step(self, count: int = 1) -> None:
-        if self._cycle == 0:
-            printf(f"{RED}cannot execute 'rstep': cycle=0{DEF}")
+        if self.cannot_reverse("rstep"):
             return
 
         with self.running():
@@ -186,8 +240,12 @@ class Ide:
         self.dump_state()
 
     def reverse_continue(self) -> None:
-        if self._cycle == 0:
-            printf(f"{RED}cannot execute 'rcontinue': cycle=0{DEF}")
+        if self.cannot_reverse("rcontinue"):
+            return
+
+        if not self.breakpoints:
+            self.history.rewind(self.history.first)
+            self.dump_state()
             return
 
         with self.running():
@@ -197,43 +255,97 @@ class Ide:
 
         self.dump_state()
 
+    def goto(self, cycle: int) -> None:
+        """Go to cycle from the nearest snapshot."""
+        history = self.history
+        if cycle < history.first:
+            printf(
+                f"{RED}cannot execute 'goto': history starts "
+                f"at cycle={history.first}{DEF}"
+            )
+            return
+        if cycle > history.cycle and self.cannot_run("goto"):
+            return
+
+        with self.running():
+            history.goto(cycle, lambda: not self._running)
+
+        self.dump_state()
+
     def continue_(self) -> None:
         """Exec debug continue command."""
 
-        if self.cpu.control_unit.status == Status.HALTED:
-            printf(f"{RED}cannot execute 'continue': machine halted{DEF}")
+        if self.cannot_run("continue"):
             return
 
         with self.running():
-            while self._running:
-                if not self.exec_step(breakp=True):
-                    break
+            if self.breakpoints.reads:
+                # Read watchpoints need read log of every step
+                while self._running:
+                    if not self.exec_step(breakp=True):
+                        break
+            else:
+                self.fast_continue()
 
         self.dump_state()
 
+    def fast_continue(self) -> None:
+        """Continue in chunks of steps without log.
+
+        Chunk stops after step, that could hit breakpoint; history
+        replays it with log to check breakpoint and show its changes.
+        """
+        breakpoints = self.breakpoints
+        registers = self.cpu.registers
+
+        def until() -> bool:
+            return not self._running or breakpoints.could_hit(
+                registers.get_int(RegisterName.PC)
+            )
+
+        with breakpoints.tracking_writes():
+            while self._running:
+                breakpoints.start_chunk()
+                if self.history.skip(until) == 0:
+                    if not self.exec_step(breakp=True):
+                        break
+                elif (
+                    self.is_breakpoint
+                    or self.cpu.control_unit.status != Status.RUNNING
+                ):
+                    break
+
     def dump_state(self) -> None:
         """Print contents of registers."""
+        lines = []
+        reason = self.stop_reason
+        if reason is not None:
+            lines.append(f"{CYA}{reason}{DEF}")
+
+        first = self.history.first
+        if first > self._first_reported:
+            mb = self.history.max_bytes / (1 << 20)
+            lines.append(
+                f"{CYA}history is limited to {mb:g} MB: "
+                f"reverse is possible down to cycle={first}{DEF}"
+            )
+        self._first_reported = first
 
-        if self.cpu.control_unit.status == Status.HALTED:
-            printf(f"{CYA}machine halted{DEF}")
-
-        printf(
-            f"Cycle: {self._cycle:>4} | "
+        lines.append(
+            f"Cycle: {self.history.cycle:>4} | "
             f"RAM access count: {self.cpu.ram.access_count:>4} words | "
             f"Next opcode: {self.opcode_str}\n"
         )
-        self.dump_full_memory()
-        printf("")
+        lines.extend(self.memory_lines())
+        lines.append("")
+        written = self.history.last_registers
         for reg, value in self.cpu.registers.state.items():
             color = ""
-            assert self.cpu.registers.write_log is not None
-            if (
-                reg in {RegisterName.PC, RegisterName.IR}
-                or reg in self.cpu.registers.write_log[-1]
-            ):
+            if reg in {RegisterName.PC, RegisterName.IR} or reg in written:
                 color = GRE
             hex_data = str(value).rjust(self.max_register_hex, " ")
-            printf(f"  {color}{reg.name:<5s}  {hex_data}{DEF}")
+            lines.append(f"  {color}{reg.name:<5s}  {hex_data}{DEF}")
+        printf("\n".join(lines))
 
     @property
     def opcode(self) -> Opcode | int:
@@ -275,34 +387,59 @@ class Ide:
             // self.cpu.ram.word_bits,
         )
 
-    def format_page(self, page: int, current_cmd: range) -> str:
-        page_addr = Cell(
-            page * self.cpu.control_unit.PAGE_SIZE,
-            bits=self.cpu.ram.address_bits,
-        )
-        line = f"{page_addr}:"
-        for col in range(self.cpu.control_unit.PAGE_SIZE):
-            cell_addr = page_addr + Cell(col, bits=self.cpu.ram.address_bits)
-            cell = self.cpu.ram.fetch(
-                address=cell_addr,
-                bits=self.cpu.ram.word_bits,
-                from_cpu=False,
-            )
-
-            cell_value = cell.hex() + DEF
+    def _on_write(self, start: int, stop: int) -> None:
+        """Drop rendered pages, that contain written words."""
+        size = self.cpu.control_unit.PAGE_SIZE
+        first, last = start // size, (stop - 1) // size + 1
+        if last - first > len(self._page_lines):
+            self._page_lines.clear()
+            self._pages = None
+            return
 
-            assert self.cpu.ram.write_log is not None
-            if cell_addr.unsigned in self.cpu.ram.write_log[-1]:
+        for page in range(first, last):
+            self._page_lines.pop(page, None)
+            # Revert and restore can unfill words
+            if self._pages is not None and (
+                page not in self._pages
+                or self.cpu.ram.first_fill(page * size, (page + 1) * size)
+                is None
+            ):
+                self._pages = None
+
+    def _drop_page(self, address: int) -> None:
+        self._page_lines.pop(address // self.cpu.control_unit.PAGE_SIZE, None)
+
+    def format_page(
+        self,
+        page: int,
+        current_cmd: range,
+        written: frozenset[int] | None = None,
+    ) -> str:
+        ram = self.cpu.ram
+        size = self.cpu.control_unit.PAGE_SIZE
+        if written is None:
+            written = self.history.last_ram
+        start = page * size
+        data = ram.dump(start, start + size)
+        word_bytes = len(data) // size
+        word_hex = ram.word_bits // 4
+        line = f"0x{start:0{ram.address_bits // 4}x}:"
+        for address in range(start, start + size):
+            i = (address - start) * word_bytes
+            word = int.from_bytes(data[i : i + word_bytes], "big")
+            cell_value = f"{word:0{word_hex}x}{DEF}"
+
+            if address in written:
                 cell_value = f"{GRE}{cell_value}"
-            elif not self.cpu.ram.is_fill(cell_addr):
+            elif not ram.is_fill_range(address, address + 1):
                 cell_value = f"{CYA}{cell_value}"
 
-            if cell_addr in self._breakpoints:
+            if address in self.breakpoints:
                 cell_value = f"{BLD}{cell_value}"
 
-            if cell_addr == current_cmd.start:
+            if address == current_cmd.start:
                 cell_value = f" {UND}{cell_value}"
-            elif cell_addr in current_cmd:
+            elif address in current_cmd:
                 cell_value = f"{UND} {cell_value}"
             else:
                 cell_value = f" {cell_value}"
@@ -311,21 +448,46 @@ class Ide:
 
         return line
 
-    def dump_full_memory(self) -> None:
-        page_set: set[int] = set()
-        for interval in self.cpu.ram.filled_intervals:
-            for i in range(
-                interval.start // self.cpu.control_unit.PAGE_SIZE,
-                (interval.stop - 1) // self.cpu.control_unit.PAGE_SIZE + 1,
-            ):
-                page_set.add(i)
+    def memory_lines(self) -> list[str]:
+        """Filled pages of memory; only changed pages are rendered.
+
+        Page is rendered again, if it was written, or it has
+        highlighted cells now or had them at the previous call.
+        """
+        size = self.cpu.control_unit.PAGE_SIZE
+        if self._pages is None:
+            pages: set[int] = set()
+            for interval in self.cpu.ram.filled_intervals:
+                pages.update(
+                    range(
+                        interval.start // size, (interval.stop - 1) // size + 1
+                    )
+                )
+            self._pages = {page: None for page in sorted(pages)}
 
-        page_list = sorted(page_set)
         current_cmd = self.current_cmd
-        for i, page in enumerate(page_list):
-            if i > 0 and page_list[i - 1] != page - 1:
-                printf("... dirty memory ...")
-            printf(self.format_page(page, current_cmd))
+        written = self.history.last_ram
+        decorated = {address // size for address in written}
+        decorated.update(address // size for address in current_cmd)
+        for page in decorated | self._decorated:
+            self._page_lines.pop(page, None)
+        self._decorated = decorated
+
+        lines = []
+        previous = None
+        for page in self._pages:
+            if previous is not None and previous != page - 1:
+                lines.append("... dirty memory ...")
+            previous = page
+            line = self._page_lines.get(page)
+            if line is None:
+                line = self.format_page(page, current_cmd, written)
+                self._page_lines[page] = line
+            lines.append(line)
+        return lines
+
+    def dump_full_memory(self) -> None:
+        printf("\n".join(self.memory_lines()))
 
     def memory(self, begin: int = -1, end: int = -1) -> None:
         """Print contents of RAM."""
@@ -335,31 +497,73 @@ class Ide:
         if begin == -1:
             assert end == -1
             self.dump_full_memory()
+            return
 
+        size = self.cpu.control_unit.PAGE_SIZE
+        end = min(end, self.cpu.ram.memory_size - 1)
         current_cmd = self.current_cmd
-        for page in range(
-            begin // self.cpu.control_unit.PAGE_SIZE,
-            end // self.cpu.control_unit.PAGE_SIZE + 1,
-        ):
-            printf(self.format_page(page, current_cmd))
+        printf(
+            "\n".join(
+                self.format_page(page, current_cmd)
+                for page in range(begin // size, end // size + 1)
+            )
+        )
+
+    def breakpoint(self, addr: int = -1, cond: str | None = None) -> None:
+        breakpoints = self.breakpoints
+        condition = None
+        if cond is not None:
+            try:
+                condition = breakpoints.condition(cond)
+            except ValueError as exc:
+                printf(f"{RED}{exc}{DEF}")
+                return
 
-    def breakpoint(self, addr: int = -1) -> None:
         if addr == -1:
-            if self._breakpoints:
-                breakpoints = ", ".join(str(x) for x in self._breakpoints)
-                printf(f"{CYA}Breakpoints: {breakpoints}{DEF}")
+            if condition is not None:
+                if condition.text in breakpoints.conditions:
+                    del breakpoints.conditions[condition.text]
+                    printf(f"{CYA}Unset condition {condition.text}{DEF}")
+                else:
+                    breakpoints.conditions[condition.text] = condition
+                    printf(f"{CYA}Set condition {condition.text}{DEF}")
+            elif breakpoints:
+                printf(f"{CYA}Breakpoints:{DEF}")
+                for line in breakpoints.describe():
+                    printf(f"{CYA}  {line}{DEF}")
             else:
                 printf(f"{CYA}No breakpoints set{DEF}")
             return
 
+        self._drop_page(addr)
         ram_addr = Cell(addr, bits=self.cpu.ram.address_bits)
-        if ram_addr in self._breakpoints:
-            self._breakpoints.remove(ram_addr)
+        if condition is not None:
+            breakpoints.set_code(addr, condition)
+            printf(
+                f"{CYA}Set breakpoint at {ram_addr} if {condition.text}{DEF}"
+            )
+        elif addr in breakpoints.code:
+            breakpoints.remove_code(addr)
             printf(f"{CYA}Unset breakpoint at {ram_addr}{DEF}")
         else:
-            self._breakpoints.add(ram_addr)
+            breakpoints.set_code(addr, None)
             printf(f"{CYA}Set breakpoint at {ram_addr}{DEF}")
 
+    def watch(self, addr: int, *, read: bool = False) -> None:
+        if read and not self.history.records_reads:
+            printf(f"{RED}read watchpoints need reads, trace has none{DEF}")
+            return
+        watched = self.breakpoints.reads if read else self.breakpoints.writes
+        kind = "read" if read else "write"
+        self._drop_page(addr)
+        ram_addr = Cell(addr, bits=self.cpu.ram.address_bits)
+        if addr in watched:
+            watched.remove(addr)
+            printf(f"{CYA}Unset {kind} watchpoint at {ram_addr}{DEF}")
+        else:
+            watched.add(addr)
+            printf(f"{CYA}Set {kind} watchpoint at {ram_addr}{DEF}")
+
     def cmd(self, command: str) -> bool:
         """Exec one command."""
 
@@ -383,7 +587,19 @@ class Ide:
         elif cmd_name == "quit":
             self._quit = True
         elif cmd_name == "breakpoint":
-            self.breakpoint(*parsed_cmd[0])
+            args = list(parsed_cmd[0])
+            cond = args.pop() if args and isinstance(args[-1], str) else None
+            self.breakpoint(args[0] if args else -1, cond)
+        elif cmd_name == "watch":
+            self.watch(*parsed_cmd[0])
+        elif cmd_name == "rwatch":
+            self.watch(*parsed_cmd[0], read=True)
+        elif cmd_name == "goto":
+            self.goto(*parsed_cmd[0])
+        elif cmd_name == "clear":
+            self.breakpoints.clear()
+            self._page_lines.clear()
+            printf(f"{CYA}All breakpoints removed{DEF}")
         else:
             return False
 
@@ -472,7 +688,18 @@ class Ide:
         return 0
 
 
-def debug(cpu: Cpu) -> int:
-    """Debug cycle."""
-    ide = Ide(cpu)
+def debug(
+    cpu: Cpu,
+    *,
+    max_history_bytes: int = MAX_HISTORY_BYTES,
+    checkpoint_steps: int = CHECKPOINT_STEPS,
+    history: History | None = None,
+) -> int:
+    """Debug cycle; history replaces execution of steps, if given."""
+    ide = Ide(
+        cpu,
+        max_history_bytes=max_history_bytes,
+        checkpoint_steps=checkpoint_steps,
+        history=history,
+    )
     return ide.run()
@@ -0,0 +1,437 @@
+"""Bounded history of execution for reverse debugging."""
+
+from __future__ import annotations
+
+import warnings
+from collections import deque
+from contextlib import contextmanager, redirect_stderr
+from io import StringIO
+from typing import TYPE_CHECKING, ClassVar, NamedTuple
+
+from ..cu.status import Status
+
+if TYPE_CHECKING:
+    from typing import Callable, Final, Iterator
+
+    from ..cpu.cpu import Cpu, Snapshot
+    from ..cpu.trace import Trace
+    from ..memory.register import RegisterName
+
+CHECKPOINT_STEPS = 1 << 12
+MAX_HISTORY_BYTES = 64 << 20
+
+# Rough size of python objects, used to keep history under the cap
+DELTA_BYTES = 120
+REGISTER_BYTES = 72
+WORD_BYTES = 88
+READ_BYTES = 64
+SNAPSHOT_BYTES = 1024
+# Snapshot is not taken, if it would take more than this part of max_bytes
+CHECKPOINT_SHARE = 8
+
+
+class Delta(NamedTuple):
+    """Old values, overwritten by one step."""
+
+    access_count: int
+    registers: tuple[tuple[RegisterName, int], ...]
+    ram: tuple[tuple[int, bool, int], ...]
+    reads: tuple[tuple[int, int], ...]
+    halt_state: tuple[bool, Status | None] | None
+
+    @property
+    def steps(self) -> int:
+        return 1
+
+    @property
+    def size(self) -> int:
+        return (
+            DELTA_BYTES
+            + REGISTER_BYTES * len(self.registers)
+            + WORD_BYTES * len(self.ram)
+            + READ_BYTES * len(self.reads)
+        )
+
+
+class Skip(NamedTuple):
+    """Steps, executed without log right after a snapshot."""
+
+    steps: int
+
+    @property
+    def size(self) -> int:
+        return DELTA_BYTES
+
+
+@contextmanager
+def _quiet() -> Iterator[None]:
+    """Replayed steps have already reported their errors."""
+    with redirect_stderr(StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        yield
+
+
+def _snapshot_size(snapshot: Snapshot) -> int:
+    return (
+        SNAPSHOT_BYTES
+        + len(snapshot.ram.memory)
+        + len(snapshot.ram.fill)
+        + 8 * len(snapshot.registers)
+    )
+
+
+class History:
+    """Steps of cpu, that can be undone.
+
+    Every step leaves a delta: old values of written registers and
+    memory words. Every checkpoint_steps cycles a snapshot of cpu is
+    taken, so rewind to a distant cycle replays at most
+    checkpoint_steps steps from the nearest snapshot instead of
+    undoing every step. When estimated size of history exceeds
+    max_bytes, the oldest deltas and snapshots are dropped and
+    cycles before first cannot be reached anymore. Snapshots are not
+    taken at all, if memory is too large for max_bytes.
+
+    skip() executes steps without deltas; undo through them restores
+    the snapshot, taken before them, and replays them with log.
+
+    Snapshots after the current cycle are kept, when steps are undone,
+    so goto() forward restores the nearest of them and replays at
+    most checkpoint_steps steps. They are dropped first, when history
+    exceeds max_bytes.
+    """
+
+    # Deltas have reads of ram
+    records_reads: ClassVar[bool] = True
+    cpu: Final[Cpu]
+    max_bytes: Final[int]
+    checkpoint_steps: Final[int]
+    cycle: int
+    _deltas: Final[deque[Delta | Skip]]
+    _checkpoints: Final[deque[tuple[int, Snapshot]]]
+    # Snapshots after current cycle, ordered by cycle
+    _future: Final[deque[tuple[int, Snapshot]]]
+    _size: int
+    # Steps in _deltas
+    _span: int
+
+    def __init__(
+        self,
+        cpu: Cpu,
+        *,
+        max_bytes: int = MAX_HISTORY_BYTES,
+        checkpoint_steps: int = CHECKPOINT_STEPS,
+    ):
+        """See help(type(x))."""
+        self.cpu = cpu
+        self.max_bytes = max_bytes
+        self.checkpoint_steps = checkpoint_steps
+        self.cycle = 0
+        self._deltas = deque()
+        self._checkpoints = deque()
+        self._future = deque()
+        self._size = 0
+        self._span = 0
+        self._checkpoint()
+
+    @property
+    def first(self) -> int:
+        """The earliest cycle, that can be reached."""
+        return self.cycle - self._span
+
+    @property
+    def size(self) -> int:
+        """Estimated size of history in bytes."""
+        return self._size
+
+    @property
+    def last_registers(self) -> frozenset[RegisterName]:
+        """Registers, written by the step, that led to current cycle."""
+        delta = self._last()
+        if delta is None:
+            return frozenset()
+        return frozenset(name for name, _ in delta.registers)
+
+    @property
+    def last_reads(self) -> tuple[tuple[int, int], ...]:
+        """(start, words) of reads by the step, that led to current cycle."""
+        delta = self._last()
+        if delta is None:
+            return ()
+        return delta.reads
+
+    @property
+    def last_ram(self) -> frozenset[int]:
+        """Addresses, written by the step, that led to current cycle."""
+        delta = self._last()
+        if delta is None:
+            return frozenset()
+        return frozenset(address for address, _, _ in delta.ram)
+
+    def _last(self) -> Delta | None:
+        if not self._deltas or isinstance(self._deltas[-1], Skip):
+            return None
+        return self._deltas[-1]
+
+    def _append(self, entry: Delta | Skip) -> None:
+        self._deltas.append(entry)
+        self._size += entry.size
+        self._span += entry.steps
+        self.cycle += entry.steps
+        future = self._future
+        while future and future[0][0] <= self.cycle:
+            checkpoint = future.popleft()
+            if checkpoint[0] == self.cycle:
+                self._checkpoints.append(checkpoint)
+            else:
+                self._size -= _snapshot_size(checkpoint[1])
+
+    def _pop(self) -> Delta | Skip:
+        entry = self._deltas.pop()
+        self._size -= entry.size
+        self._span -= entry.steps
+        self.cycle -= entry.steps
+        return entry
+
+    def _checkpoint(self) -> None:
+        if self._checkpoints and self._checkpoints[-1][0] == self.cycle:
+            return
+        snapshot = self.cpu.snapshot()
+        if _snapshot_size(snapshot) * CHECKPOINT_SHARE > self.max_bytes:
+            return
+        self._checkpoints.append((self.cycle, snapshot))
+        self._size += _snapshot_size(snapshot)
+
+    def _drop_old(self) -> None:
+        while self._size > self.max_bytes and self._future:
+            self._size -= _snapshot_size(self._future.pop()[1])
+        while self._size > self.max_bytes and self._deltas:
+            entry = self._deltas.popleft()
+            self._size -= entry.size
+            self._span -= entry.steps
+            first = self.first
+            while self._checkpoints and self._checkpoints[0][0] < first:
+                self._size -= _snapshot_size(self._checkpoints.popleft()[1])
+
+    def _execute(self, cycle: int) -> None:
+        """Make step from cycle to cycle + 1 without history."""
+        del cycle
+        self.cpu.control_unit.step()
+
+    def step(self) -> None:
+        """Execute one instruction and record its delta."""
+        cpu = self.cpu
+        access_count = cpu.ram.access_count
+        halt_state = cpu.control_unit.halt_state
+        cpu.registers.write_log = [{}]
+        cpu.ram.write_log = [{}]
+        reads: list[tuple[int, int]] = []
+        cpu.ram.read_log = reads
+        try:
+            self._execute(self.cycle)
+            registers = cpu.registers.write_log[0]
+            ram = cpu.ram.write_log[0]
+        finally:
+            cpu.registers.write_log = None
+            cpu.ram.write_log = None
+            cpu.ram.read_log = None
+
+        delta = Delta(
+            access_count=access_count,
+            registers=tuple(
+                (name, old) for name, (old, _) in registers.items()
+            ),
+            ram=tuple(
+                (address, fill, old) for address, (fill, old, _) in ram.items()
+            ),
+            reads=tuple(reads),
+            halt_state=(
+                None
+                if halt_state == cpu.control_unit.halt_state
+                else halt_state
+            ),
+        )
+        self._append(delta)
+        if self.cycle % self.checkpoint_steps == 0:
+            self._checkpoint()
+        self._drop_old()
+
+    def skip(
+        self, until: Callable[[], bool], *, max_steps: int | None = None
+    ) -> int:
+        """Execute steps without log up to the next checkpoint.
+
+        Stop earlier after halt or the step, when until() is true;
+        such step is replayed with log, so last_* describe it.
+        Stop without log after max_steps, if given.
+        Return number of executed steps; 0 if snapshot is too large
+        to be taken and only step() can be used.
+        """
+        self._checkpoint()
+        if not self._checkpoints or self._checkpoints[-1][0] != self.cycle:
+            return 0
+        snapshot = self._checkpoints[-1][1]
+
+        control_unit = self.cpu.control_unit
+        limit = self.checkpoint_steps - self.cycle % self.checkpoint_steps
+        if max_steps is not None:
+            limit = min(limit, max_steps)
+        steps = 0
+        while steps < limit:
+            self._execute(self.cycle + steps)
+            steps += 1
+            if control_unit.status is not Status.RUNNING or until():
+                break
+        else:
+            self._append(Skip(steps))
+            self._checkpoint()
+            self._drop_old()
+            return steps
+
+        self.cpu.restore(snapshot)
+        with _quiet():
+            for i in range(steps - 1):
+                self._execute(self.cycle + i)
+            if steps > 1:
+                self._append(Skip(steps - 1))
+            self.step()
+        return steps
+
+    def _expand(self) -> None:
+        """Replace the last skip with deltas of its steps."""
+        skip = self._pop()
+        assert isinstance(skip, Skip)
+        self._drop_checkpoints()
+        start, snapshot = self._checkpoints[-1]
+        assert start == self.cycle
+        self.cpu.restore(snapshot)
+        with _quiet():
+            for _ in range(skip.steps):
+                self.step()
+
+    def back(self) -> bool:
+        """Undo the last step; return False at the first cycle."""
+        if not self._deltas:
+            return False
+        if isinstance(self._deltas[-1], Skip):
+            self._expand()
+        delta = self._pop()
+        assert isinstance(delta, Delta)
+        cpu = self.cpu
+        cpu.registers.revert(
+            {name: (old, old) for name, old in delta.registers}
+        )
+        cpu.ram.revert(
+            {address: (fill, old, old) for address, fill, old in delta.ram}
+        )
+        cpu.ram.access_count = delta.access_count
+        if delta.halt_state is not None:
+            cpu.control_unit.restore(delta.halt_state)
+        self._drop_checkpoints()
+        return True
+
+    def _drop_checkpoints(self) -> None:
+        """Move snapshots after current cycle to the future ones."""
+        while self._checkpoints and self._checkpoints[-1][0] > self.cycle:
+            self._future.appendleft(self._checkpoints.pop())
+
+    def rewind(self, cycle: int) -> None:
+        """Return to cycle: first <= cycle <= self.cycle.
+
+        Replay from the nearest snapshot, if it is shorter than undo
+        or undo would replay skipped steps.
+        """
+        assert self.first <= cycle <= self.cycle
+        nearest = None
+        for checkpoint in reversed(self._checkpoints):
+            if checkpoint[0] <= cycle:
+                nearest = checkpoint
+                break
+
+        if nearest is None or (
+            cycle - nearest[0] >= self.cycle - cycle
+            and not self._skipped_after(cycle)
+        ):
+            while self.cycle > cycle:
+                self.back()
+            return
+
+        start, snapshot = nearest
+        cpu = self.cpu
+        cpu.restore(snapshot)
+        with _quiet():
+            for i in range(start, cycle):
+                self._execute(i)
+        while self.cycle > cycle:
+            self._pop()
+            if self.cycle < cycle:
+                self._append(Skip(cycle - self.cycle))
+        self._drop_checkpoints()
+
+    def goto(
+        self, cycle: int, until: Callable[[], bool] = lambda: False
+    ) -> None:
+        """Move to cycle, that is at least first.
+
+        Forward steps start from the latest future snapshot before
+        cycle and stop earlier, if machine halts or until() is true.
+        """
+        if cycle <= self.cycle:
+            self.rewind(cycle)
+            return
+
+        future = self._future
+        checkpoints = self._checkpoints
+        if future and future[0][0] <= cycle:
+            self._checkpoint()
+            # Every skip starts at snapshot, so undo can replay it
+            if checkpoints and checkpoints[-1][0] == self.cycle:
+                while future and future[0][0] <= cycle:
+                    self._append(Skip(future[0][0] - self.cycle))
+                self.cpu.restore(checkpoints[-1][1])
+
+        control_unit = self.cpu.control_unit
+        while (
+            self.cycle < cycle
+            and control_unit.status is Status.RUNNING
+            and not until()
+        ):
+            if self.skip(until, max_steps=cycle - self.cycle) == 0:
+                self.step()
+        self._drop_old()
+
+    def _skipped_after(self, cycle: int) -> bool:
+        position = self.cycle
+        for entry in reversed(self._deltas):
+            if position <= cycle:
+                return False
+            if isinstance(entry, Skip):
+                return True
+            position -= entry.steps
+        return False
+
+
+class TraceHistory(History):
+    """History of recorded run: steps are applied from trace.
+
+    Trace has no reads of ram, so last_reads are always empty.
+    """
+
+    records_reads: ClassVar[bool] = False
+    trace: Final[Trace]
+
+    def __init__(
+        self,
+        trace: Trace,
+        *,
+        max_bytes: int = MAX_HISTORY_BYTES,
+        checkpoint_steps: int = CHECKPOINT_STEPS,
+    ):
+        """See help(type(x))."""
+        self.trace = trace
+        super().__init__(
+            trace.cpu, max_bytes=max_bytes, checkpoint_steps=checkpoint_steps
+        )
+
+    def _execute(self, cycle: int) -> None:
+        self.trace.apply(cycle)
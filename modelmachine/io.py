@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import re
 import sys
 from traceback import print_exc
 from typing import TYPE_CHECKING
@@ -14,7 +15,7 @@ if TYPE_CHECKING:
 
     from .memory.ram import RandomAccessMemory
 
-ACCEPTED_CHARS = set("0123456789abcdefABCDEF")
+HEX_CODE = re.compile("[0-9a-fA-F]*")
 
 
 class InputOutputUnit:
@@ -128,14 +129,14 @@ class InputOutputUnit:
 
     def load_source(self, source_list: list[tuple[int, str]]) -> None:
         """Source code loader."""
+        word_hex = self.ram.word_bits // 4
+        # Every word is padded to whole bytes for bytes.fromhex
+        pad = "0" * (-word_hex % 2)
 
         for load_address, source in source_list:
-            for c in source:
-                if c not in ACCEPTED_CHARS:
-                    msg = f"Unexpected source: {source}, expected hex code"
-                    raise ValueError(msg)
-
-            word_hex = self.ram.word_bits // 4
+            if HEX_CODE.fullmatch(source) is None:
+                msg = f"Unexpected source: {source}, expected hex code"
+                raise ValueError(msg)
 
             if len(source) % word_hex != 0:
                 msg = (
@@ -144,24 +145,35 @@ class InputOutputUnit:
                 )
                 raise ValueError(msg)
 
-            if len(source) // word_hex > self.ram.memory_size:
+            words = len(source) // word_hex
+            if words > self.ram.memory_size:
                 msg = (
                     f"Too long source code: {len(source)}"
                     f" hex should be less than ram words={self.ram.memory_size}"
                 )
                 raise ValueError(msg)
 
-            for i in range(0, len(source), word_hex):
-                address = Cell(
-                    load_address + i // word_hex, bits=self.ram.address_bits
+            code = source
+            if pad:
+                code = "".join(
+                    pad + source[i : i + word_hex]
+                    for i in range(0, len(source), word_hex)
                 )
-
-                if self.ram.is_fill(address):
-                    msg = f".code directives overlaps at address {address}"
+            data = bytes.fromhex(code)
+
+            # Code is wrapped around the end of memory
+            start = load_address % self.ram.memory_size
+            head = min(words, self.ram.memory_size - start)
+            chunks = [(start, head), (0, words - head)]
+            for address, size in chunks:
+                overlap = self.ram.first_fill(address, address + size)
+                if overlap is not None:
+                    addr = Cell(overlap, bits=self.ram.address_bits)
+                    msg = f".code directives overlaps at address {addr}"
                     raise ValueError(msg)
 
-                self.ram.put(
-                    address=address,
-                    value=Cell.from_hex(source[i : i + word_hex]),
-                    from_cpu=False,
-                )
+            word_bytes = len(data) // words if words else 0
+            for address, size in chunks:
+                if size:
+                    self.ram.load(address, data[: size * word_bytes])
+                    data = data[size * word_bytes :]
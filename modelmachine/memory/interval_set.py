@@ -0,0 +1,91 @@
+"""Set of integers, stored as sorted disjoint intervals."""
+
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+class IntervalSet:
+    """Sorted set of half-open intervals [start, stop).
+
+    Intervals never overlap or touch: adjacent intervals are merged
+    on insert, so lookup is a binary search over starts.
+    """
+
+    _starts: list[int]
+    _stops: list[int]
+
+    def __init__(self) -> None:
+        self._starts = []
+        self._stops = []
+
+    def add(self, start: int, stop: int) -> None:
+        """Add all integers from start to stop (exclusive)."""
+        if start >= stop:
+            return
+        # Intervals from i to j (exclusive) overlap or touch [start, stop)
+        i = bisect_left(self._stops, start)
+        j = bisect_right(self._starts, stop)
+        if i < j:
+            start = min(start, self._starts[i])
+            stop = max(stop, self._stops[j - 1])
+        self._starts[i:j] = [start]
+        self._stops[i:j] = [stop]
+
+    def discard(self, start: int, stop: int) -> None:
+        """Remove all integers from start to stop (exclusive)."""
+        if start >= stop:
+            return
+        # Intervals from i to j (exclusive) overlap [start, stop)
+        i = bisect_right(self._stops, start)
+        j = bisect_left(self._starts, stop)
+        if i >= j:
+            return
+        starts = []
+        stops = []
+        if self._starts[i] < start:
+            starts.append(self._starts[i])
+            stops.append(start)
+        if stop < self._stops[j - 1]:
+            starts.append(stop)
+            stops.append(self._stops[j - 1])
+        self._starts[i:j] = starts
+        self._stops[i:j] = stops
+
+    def covers(self, start: int, stop: int) -> bool:
+        """Test if all integers from start to stop are in the set."""
+        i = bisect_right(self._starts, start) - 1
+        return i >= 0 and stop <= self._stops[i]
+
+    def first(self, start: int, stop: int) -> int | None:
+        """Return minimal integer of the set from start to stop or None."""
+        i = bisect_right(self._stops, start)
+        if i < len(self._starts) and self._starts[i] < stop:
+            return max(start, self._starts[i])
+        return None
+
+    def copy(self) -> IntervalSet:
+        """Return independent copy of the set."""
+        result = IntervalSet()
+        result._starts = self._starts.copy()
+        result._stops = self._stops.copy()
+        return result
+
+    def __contains__(self, x: object) -> bool:
+        """Test if integer is in the set."""
+        if not isinstance(x, int):
+            return False
+        return self.covers(x, x + 1)
+
+    def __iter__(self) -> Iterator[range]:
+        """Iterate over intervals in ascending order."""
+        for start, stop in zip(self._starts, self._stops):
+            yield range(start, stop)
+
+    def __len__(self) -> int:
+        """Return number of intervals."""
+        return len(self._starts)
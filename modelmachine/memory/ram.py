@@ -1,15 +1,15 @@
 from __future__ import annotations
 
 import warnings
-from array import array
+from dataclasses import dataclass
 from typing import TYPE_CHECKING
 
 from ..cell import Cell, Endianess
-from .insort import insort
+from .interval_set import IntervalSet
 
 if TYPE_CHECKING:
     from collections.abc import Collection
-    from typing import Final
+    from typing import Callable, Final, Literal
 
 MAX_ADDRESS_BITS = 16
 MAX_WORD_BITS = 8 * 8
@@ -19,12 +19,53 @@ class RamAccessError(Exception):
     pass
 
 
+@dataclass(frozen=True)
+class RamSnapshot:
+    """Copy of memory content, made by RandomAccessMemory.snapshot."""
+
+    memory: bytes
+    fill: bytes
+    filled: IntervalSet
+    access_count: int
+
+
+def _first_difference(a: bytes | bytearray, b: bytes) -> int:
+    """Index of first different byte of buffers with the same length.
+
+    Binary search with comparison of slices, so it is memcmp-fast.
+    """
+    lo, hi = 0, len(a)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+def _last_difference(a: bytes | bytearray, b: bytes) -> int:
+    """Index of last different byte of buffers with the same length."""
+    lo, hi = 0, len(a)
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if a[mid:hi] == b[mid:hi]:
+            hi = mid
+        else:
+            lo = mid
+    return lo
+
+
 class RandomAccessMemory:
     """Random access memory.
 
     Addresses is x: 0 <= x < memory_size.
     If is_protected == True, you cannot read unassigned memory
     (useful for debug).
+
+    Every function from write_listeners is called with (start, stop)
+    of written address range after each write.
+    If read_log is a list, every read by cpu appends (start, words) to it.
     """
 
     word_bits: Final[int]
@@ -32,15 +73,22 @@ class RandomAccessMemory:
     memory_size: Final[int]
     endianess: Final[Endianess]
     is_protected: Final[bool]
-    _table: array[int]
-    _fill: array[int]
-    _filled_intervals: list[range]
+    _word_bytes: Final[int]
+    _byteorder: Final[Literal["big", "little"]]
+    _packed: Final[bool]
+    _memory: Final[bytearray]
+    _view: Final[memoryview]
+    _fill: bytearray
+    _filled: IntervalSet
     access_count: int
     write_log: list[dict[int, tuple[bool, int, int]]] | None
+    read_log: list[tuple[int, int]] | None
+    write_listeners: list[Callable[[int, int], None]]
 
     @property
     def filled_intervals(self) -> Collection[range]:
-        return self._filled_intervals
+        """Sorted disjoint intervals of filled addresses."""
+        return self._filled
 
     def __init__(
         self,
@@ -58,97 +106,129 @@ class RandomAccessMemory:
         self.memory_size = 1 << address_bits
         self.endianess = endianess
         self.is_protected = is_protected
-        shape = [0] * self.memory_size
-        if word_bits <= 8:  # noqa: PLR2004
-            self._table = array("B", shape)
-        elif word_bits <= 16:  # noqa: PLR2004
-            self._table = array("H", shape)
-        elif word_bits <= 32:  # noqa: PLR2004
-            self._table = array("L", shape)
-        else:
-            self._table = array("Q", shape)
-        self._fill = array("B", shape)
+
+        # Every word takes _word_bytes bytes in order of endianess,
+        # so for whole-byte words operand is one slice of memory
+        self._word_bytes = -(-word_bits // 8)
+        self._byteorder = "big" if endianess is Endianess.BIG else "little"
+        self._packed = word_bits == 8 * self._word_bytes
+        self._memory = bytearray(self.memory_size * self._word_bytes)
+        self._view = memoryview(self._memory)
+        self._fill = bytearray(self.memory_size)
         self.access_count = 0
-        self._filled_intervals = []
+        self._filled = IntervalSet()
         self.write_log = None
+        self.read_log = None
+        self.write_listeners = []
 
     def __len__(self) -> int:
         """Return size of memory in unified form."""
         return self.memory_size
 
-    def _fill_cell(self, address: int) -> None:
-        if self._fill[address]:
-            return
-        self._fill[address] = 1
+    def _notify(self, start: int, stop: int) -> None:
+        for listener in self.write_listeners:
+            listener(start, stop)
 
-        if self.write_log is not None:
-            prev = self.write_log[-1][address][1:]
-            self.write_log[-1][address] = (True, *prev)
-
-        for i, ee in enumerate(self._filled_intervals):
-            e = ee
-            if address == e.start - 1:
-                self._filled_intervals[i] = e = range(address, e.stop)
-                break
-
-            if address == e.stop:
-                self._filled_intervals[i] = e = range(e.start, e.stop + 1)
-                if i + 1 < len(self._filled_intervals):
-                    next_interval = self._filled_intervals[i + 1]
-                    if e.stop == next_interval.start:
-                        self._filled_intervals[i] = range(
-                            e.start, next_interval.stop
-                        )
-                        del self._filled_intervals[i + 1]
-                break
-        else:
-            insort(
-                self._filled_intervals,
-                range(address, address + 1),
+    def _word(self, address: int) -> int:
+        wb = self._word_bytes
+        return int.from_bytes(
+            self._view[address * wb : (address + 1) * wb], self._byteorder
+        )
+
+    def _read(self, address: int, words: int) -> int:
+        """Read words as one unsigned integer, no checks."""
+        wb = self._word_bytes
+        data = self._view[address * wb : (address + words) * wb]
+        if self._packed:
+            return int.from_bytes(data, self._byteorder)
+
+        addresses = range(address, address + words)
+        if self.endianess is Endianess.LITTLE:
+            addresses = addresses[::-1]
+        value = 0
+        for i in addresses:
+            value = (value << self.word_bits) | self._word(i)
+        return value
+
+    def _write(self, address: int, words: int, value: int) -> None:
+        """Write unsigned integer to words, fill them and notify."""
+        stop = address + words
+        log = None if self.write_log is None else self.write_log[-1]
+        if log is not None:
+            prev = {
+                i: log[i][:2] if i in log else (False, self._word(i))
+                for i in range(address, stop)
+            }
+
+        wb = self._word_bytes
+        if self._packed:
+            self._view[address * wb : stop * wb] = value.to_bytes(
+                words * wb, self._byteorder
             )
+        else:
+            mask = (1 << self.word_bits) - 1
+            for i in range(words):
+                shift = (
+                    i if self.endianess is Endianess.LITTLE else words - 1 - i
+                ) * self.word_bits
+                self._view[(address + i) * wb : (address + i + 1) * wb] = (
+                    (value >> shift) & mask
+                ).to_bytes(wb, self._byteorder)
+
+        if log is not None:
+            for i, (fill, old) in prev.items():
+                log[i] = (fill, old, self._word(i))
+
+        if self._fill.find(0, address, stop) != -1:
+            if log is not None:
+                for i in range(address, stop):
+                    if not self._fill[i]:
+                        log[i] = (True, *log[i][1:])
+            self._fill[address:stop] = b"\x01" * words
+            self._filled.add(address, stop)
+        self._notify(address, stop)
 
     def __setitem__(self, address: Cell, word: Cell) -> None:
         """Raise an error, if word has wrong format."""
         assert address.bits == self.address_bits
         assert word.bits == self.word_bits
-        if self.write_log is not None:
-            current = self._table[address.unsigned]
-            prev = self.write_log[-1].get(
-                address.unsigned,
-                (
-                    False,
-                    current,
-                ),
-            )[:2]
-            self.write_log[-1][address.unsigned] = (*prev, word.unsigned)
-        self._table[address.unsigned] = word.unsigned
-        self._fill_cell(address.unsigned)
-
-    def _missing(self, address: Cell, *, from_cpu: bool = True) -> None:
+        self._write(address.unsigned, 1, word.unsigned)
+
+    def revert(self, changes: dict[int, tuple[bool, int, int]]) -> None:
+        """Undo one step of write_log."""
+        wb = self._word_bytes
+        for address, (fill, old, _) in changes.items():
+            self._view[address * wb : (address + 1) * wb] = old.to_bytes(
+                wb, self._byteorder
+            )
+            if fill:
+                self._fill[address] = 0
+                self._filled.discard(address, address + 1)
+            self._notify(address, address + 1)
+
+    def _missing(self, address: int, *, from_cpu: bool = True) -> None:
         """If addressed memory not defined."""
         if from_cpu:
             if self.is_protected:
                 msg = (
-                    f"Cannot read memory by address: 0x{address.unsigned:x}, "
+                    f"Cannot read memory by address: 0x{address:x}, "
                     "it is dirty memory, clean it first"
                 )
                 raise RamAccessError(msg)
 
             warnings.warn(
-                f"Read memory by address: 0x{address.unsigned:x}, "
+                f"Read memory by address: 0x{address:x}, "
                 "it is dirty memory, clean it first",
-                stacklevel=4,
+                stacklevel=3,
             )
 
     def _get(self, address: Cell, *, from_cpu: bool = True) -> Cell:
         """Return word."""
         assert address.bits == self.address_bits
 
-        if self._fill[address.unsigned]:
-            return Cell(self._table[address.unsigned], bits=self.word_bits)
-
-        self._missing(address, from_cpu=from_cpu)
-        return Cell(0, bits=self.word_bits)
+        if not self._fill[address.unsigned]:
+            self._missing(address.unsigned, from_cpu=from_cpu)
+        return Cell(self._word(address.unsigned), bits=self.word_bits)
 
     def fetch(
         self, address: Cell, *, bits: int, from_cpu: bool = True
@@ -159,7 +239,8 @@ class RandomAccessMemory:
         """
         assert bits % self.word_bits == 0
         words = bits // self.word_bits
-        if words + address.unsigned > self.memory_size:
+        start = address.unsigned
+        if words + start > self.memory_size:
             msg = (
                 f"Try to read {words} words from address 0x{address}"
                 f" over memory size {self.memory_size:x}"
@@ -168,21 +249,126 @@ class RandomAccessMemory:
 
         if from_cpu:
             self.access_count += words
+            if self.read_log is not None:
+                self.read_log.append((start, words))
 
-        return Cell.decode(
-            [
-                self._get(
-                    address + Cell(i, bits=self.address_bits),
-                    from_cpu=from_cpu,
-                )
-                for i in range(words)
-            ],
-            endianess=self.endianess,
-        )
+        if self._fill.find(0, start, start + words) != -1:
+            for i in range(start, start + words):
+                if not self._fill[i]:
+                    self._missing(i, from_cpu=from_cpu)
+
+        return Cell(self._read(start, words), bits=bits)
 
     def is_fill(self, address: Cell) -> bool:
         return bool(self._fill[address.unsigned])
 
+    def is_fill_range(self, start: int, stop: int) -> bool:
+        """Test if all words from start to stop (exclusive) are filled."""
+        return self._filled.covers(start, stop)
+
+    def first_fill(self, start: int, stop: int) -> int | None:
+        """Return first filled address from start to stop or None."""
+        return self._filled.first(start, stop)
+
+    def load(self, address: int, data: bytes | memoryview) -> None:
+        """Write words from data, every word is big endian bytes.
+
+        Bulk loader of program, doesn't count access.
+        """
+        wb = self._word_bytes
+        words = len(data) // wb
+        stop = address + words
+        assert words * wb == len(data)
+        assert stop <= self.memory_size
+
+        if self.write_log is not None:
+            for i in range(words):
+                word = int.from_bytes(data[i * wb : (i + 1) * wb], "big")
+                self._write(address + i, 1, word)
+            return
+
+        if self.endianess is Endianess.BIG:
+            self._memory[address * wb : stop * wb] = data
+        else:
+            for k in range(wb):
+                self._memory[address * wb + k : stop * wb : wb] = data[
+                    wb - 1 - k :: wb
+                ]
+        self._fill[address:stop] = b"\x01" * words
+        self._filled.add(address, stop)
+        self._notify(address, stop)
+
+    def dump(self, start: int, stop: int) -> bytes:
+        """Read words as big endian bytes, inverse of load."""
+        wb = self._word_bytes
+        assert 0 <= start <= stop <= self.memory_size
+        if self.endianess is Endianess.BIG:
+            return bytes(self._memory[start * wb : stop * wb])
+        data = bytearray((stop - start) * wb)
+        for k in range(wb):
+            data[wb - 1 - k :: wb] = self._memory[
+                start * wb + k : stop * wb : wb
+            ]
+        return bytes(data)
+
+    def snapshot(self) -> RamSnapshot:
+        """Copy content, fill map and access counter."""
+        return RamSnapshot(
+            memory=bytes(self._memory),
+            fill=bytes(self._fill),
+            filled=self._filled.copy(),
+            access_count=self.access_count,
+        )
+
+    def _changed(self, snapshot: RamSnapshot) -> tuple[int, int] | None:
+        """Range of words, that differ from snapshot, or None."""
+        starts = []
+        stops = []
+        wb = self._word_bytes
+        if self._memory != snapshot.memory:
+            starts.append(_first_difference(self._memory, snapshot.memory))
+            stops.append(_last_difference(self._memory, snapshot.memory))
+        if self._fill != snapshot.fill:
+            starts.append(wb * _first_difference(self._fill, snapshot.fill))
+            stops.append(wb * _last_difference(self._fill, snapshot.fill))
+        if not starts:
+            return None
+        return min(starts) // wb, max(stops) // wb + 1
+
+    def restore(self, snapshot: RamSnapshot) -> None:
+        """Return to snapshot state; write_log isn't updated.
+
+        Content is copied as whole buffers, listeners are notified
+        once about range of changed words.
+        """
+        assert len(snapshot.memory) == len(self._memory)
+        changed = self._changed(snapshot)
+        self._memory[:] = snapshot.memory
+        self._fill[:] = snapshot.fill
+        self._filled = snapshot.filled.copy()
+        self.access_count = snapshot.access_count
+        if changed is not None:
+            self._notify(*changed)
+
+    def read_raw(self, address: int, words: int) -> int | None:
+        """Read words as unsigned integer.
+
+        Return None, if some of words are dirty or out of memory.
+        Doesn't count access, intended for compiled code.
+        """
+        stop = address + words
+        if stop > self.memory_size or self._fill.find(0, address, stop) != -1:
+            return None
+        return self._read(address, words)
+
+    def write_raw(self, address: int, words: int, value: int) -> None:
+        """Write unsigned integer to words.
+
+        Doesn't count access, intended for compiled code.
+        """
+        assert address + words <= self.memory_size
+        self._write(address, words, value)
+
     def put(
         self, *, address: Cell, value: Cell, from_cpu: bool = True
     ) -> None:
@@ -202,6 +388,4 @@ class RandomAccessMemory:
         if from_cpu:
             self.access_count += words
 
-        enc_value = value.encode(bits=self.word_bits, endianess=self.endianess)
-        for i, v in enumerate(enc_value):
-            self[address + Cell(i, bits=self.address_bits)] = v
+        self._write(address.unsigned, words, value.unsigned)
@@ -43,13 +43,22 @@ class RegisterName(IntEnum):
 
 
 class RegisterMemory:
-    """Registers."""
+    """Registers.
 
-    _table: list[Cell | None]
-    write_log: list[dict[RegisterName, tuple[Cell, Cell]]] | None
+    Values are kept as unsigned integers in flat lists with per-register
+    widths; Cell is created only by __getitem__ and state.
+    Control unit and ALU use get_int and set_int to avoid allocations.
+    """
+
+    _values: list[int]
+    _bits: list[int]
+    _masks: list[int]
+    write_log: list[dict[RegisterName, tuple[int, int]]] | None
 
     def __init__(self) -> None:
-        self._table = [None] * len(RegisterName)
+        self._values = [0] * len(RegisterName)
+        self._bits = [0] * len(RegisterName)
+        self._masks = [0] * len(RegisterName)
         self.write_log = None
 
     def add_register(self, name: RegisterName, *, bits: int) -> None:
@@ -60,38 +69,63 @@ class RegisterMemory:
         """
         assert 0 < bits <= MAX_WORD_BITS
 
-        reg = self._table[name.value]
-        if reg is None:
-            self._table[name.value] = Cell(0, bits=bits)
+        current_bits = self._bits[name]
+        if current_bits == 0:
+            self._bits[name] = bits
+            self._masks[name] = (1 << bits) - 1
+            self._values[name] = 0
             return
 
-        if reg.bits != bits:
+        if current_bits != bits:
             msg = (
                 f"Cannot add register with name `{name}` and"
                 f" `{bits}` bits, register with this name and"
-                f" `{reg.bits}` bits already exists"
+                f" `{current_bits}` bits already exists"
             )
             raise KeyError(msg)
 
+    def _missing(self, name: RegisterName) -> KeyError:
+        return KeyError(f"{name} not found in register file")
+
+    def get_int(self, name: RegisterName) -> int:
+        """Return unsigned value of register."""
+        if self._bits[name] == 0:
+            raise self._missing(name)
+        return self._values[name]
+
+    def set_int(self, name: RegisterName, value: int) -> None:
+        """Set unsigned value, it should fit into the register."""
+        mask = self._masks[name]
+        if mask == 0:
+            raise self._missing(name)
+        assert 0 <= value <= mask
+        if self.write_log is not None:
+            old = self.write_log[-1].get(name, (self._values[name],))[0]
+            self.write_log[-1][name] = (old, value)
+        self._values[name] = value
+
     def __getitem__(self, name: RegisterName) -> Cell:
         """Return word."""
-        res = self._table[name.value]
-        if res is None:
-            msg = f"{name} not found in register file"
-            raise KeyError(msg)
-        return res
+        bits = self._bits[name]
+        if bits == 0:
+            raise self._missing(name)
+        return Cell(self._values[name], bits=bits)
 
     def __setitem__(self, name: RegisterName, word: Cell) -> None:
         """Raise an error, if word has wrong format."""
-        current = self[name]
-        assert current.bits == word.bits
-        if self.write_log is not None:
-            current = self.write_log[-1].get(name, (current,))[0]
-            self.write_log[-1][name] = (current, word)
-        self._table[name] = word
+        bits = self._bits[name]
+        if bits == 0:
+            raise self._missing(name)
+        assert bits == word.bits
+        self.set_int(name, word.unsigned)
+
+    def revert(self, changes: dict[RegisterName, tuple[int, int]]) -> None:
+        """Undo one step of write_log."""
+        for name, (old, _) in changes.items():
+            self._values[name] = old
 
     def __contains__(self, name: RegisterName) -> bool:
-        return self._table[name] is not None
+        return self._bits[name] != 0
 
     def __iter__(self) -> Iterator[RegisterName]:
         for reg in RegisterName:
@@ -100,9 +134,14 @@ class RegisterMemory:
 
     @property
     def state(self) -> dict[RegisterName, Cell]:
-        res: dict[RegisterName, Cell] = {}
-        for reg in RegisterName:
-            val = self._table[reg]
-            if val is not None:
-                res[reg] = val
-        return res
+        return {reg: self[reg] for reg in self}
+
+    @property
+    def int_state(self) -> tuple[int, ...]:
+        """Values of all registers, absent registers are zero."""
+        return tuple(self._values)
+
+    def restore(self, int_state: tuple[int, ...]) -> None:
+        """Set values of all registers from int_state; write_log is ignored."""
+        assert len(int_state) == len(self._values)
+        self._values[:] = int_state
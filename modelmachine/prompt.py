@@ -3,9 +3,6 @@ from __future__ import annotations
 import sys
 from typing import TYPE_CHECKING
 
-from prompt_toolkit import ANSI, print_formatted_text
-from prompt_toolkit import prompt as pprompt
-
 if TYPE_CHECKING:
     from typing import TextIO
 
@@ -23,6 +20,9 @@ CYA = "\x1b[36m" if sys.stdout.isatty() else ""
 
 def printf(out: str, *, file: TextIO = sys.stdout) -> None:
     if file.isatty():
+        # prompt_toolkit is slow to import, only terminal needs it
+        from prompt_toolkit import ANSI, print_formatted_text
+
         print_formatted_text(ANSI(out), file=file)
     else:
         print(out, file=file)
@@ -50,6 +50,9 @@ def read_word(file: TextIO) -> str:
 
 def prompt(inp: str, *, file: TextIO = sys.stdin) -> str:
     if file.isatty() and file is sys.stdin:
+        from prompt_toolkit import ANSI
+        from prompt_toolkit import prompt as pprompt
+
         return pprompt(ANSI(inp))
 
     return read_word(file)
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+from pyparsing import ParseException
+
+from modelmachine.cpu import cache
+from modelmachine.cpu.cache import ProgramCache, source_key
+from modelmachine.cpu.cpu import IOReq
+from modelmachine.cpu.source import parse
+
+from .test_source import example
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from modelmachine.cpu.cpu import Program
+
+
+class CountingParser:
+    calls: int
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self, inp: str) -> Program:
+        self.calls += 1
+        return parse(inp)
+
+
+def test_parse() -> None:
+    program = parse(example)
+    assert program.cpu == "mm-1"
+    assert program.input_req == (
+        IOReq(0x100, "argument a"),
+        IOReq(0x105, "argument b"),
+    )
+    assert program.output_req == (IOReq(0x110, "x"),)
+    assert program.enter.split() == ["-123", "64"]
+    assert len(program.code) == 1
+    assert program.code[0][0] == 0
+
+
+def test_memory() -> None:
+    parser = CountingParser()
+    programs = ProgramCache(maxsize=2)
+    first = programs.get(example, parser)
+    assert programs.get(example, parser) is first
+    assert parser.calls == 1
+
+    programs.get(example + "\n", parser)
+    programs.get(example, parser)
+    programs.get(example + ";\n", parser)
+    assert len(programs) == 2
+    assert parser.calls == 3
+
+    # Least recently used one is evicted
+    programs.get(example + "\n", parser)
+    assert parser.calls == 4
+
+
+def test_disk(tmp_path: Path) -> None:
+    parser = CountingParser()
+    program = ProgramCache().get(example, parser, directory=str(tmp_path))
+    path = tmp_path / f"{source_key(example)}.json"
+    assert path.is_file()
+
+    other = ProgramCache().get(example, parser, directory=str(tmp_path))
+    assert other == program
+    assert parser.calls == 1
+
+    path.write_text("{broken")
+    assert ProgramCache().get(example, parser, directory=str(tmp_path)) == (
+        program
+    )
+    assert parser.calls == 2
+    assert json.loads(path.read_text())["cpu"] == "mm-1"
+
+
+def test_version(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    parser = CountingParser()
+    ProgramCache().get(example, parser, directory=str(tmp_path))
+    old_key = source_key(example)
+
+    monkeypatch.setattr(cache, "__version__", "999")
+    assert source_key(example) != old_key
+    ProgramCache().get(example, parser, directory=str(tmp_path))
+    assert parser.calls == 2
+
+    # File from another version is ignored
+    (tmp_path / f"{old_key}.json").rename(
+        tmp_path / f"{source_key(example)}.json"
+    )
+    ProgramCache().get(example, parser, directory=str(tmp_path))
+    assert parser.calls == 3
+
+
+def test_parse_error(tmp_path: Path) -> None:
+    programs = ProgramCache()
+    with pytest.raises(ParseException):
+        programs.get(".cpu mm-1\n", parse, directory=str(tmp_path))
+    assert len(programs) == 0
+    assert not list(tmp_path.iterdir())
@@ -1,12 +1,21 @@
 """Test case for complex CPU."""
 
+from __future__ import annotations
+
 from io import StringIO
+from typing import TYPE_CHECKING
 
 import pytest
 
 from modelmachine.cpu.source import source
+from modelmachine.cu.budget import Budget
 from modelmachine.cu.status import Status
 
+from ..cu.test_blocks import MM1_SELF_MODIFYING
+
+if TYPE_CHECKING:
+    from modelmachine.cpu.cpu import Cpu
+
 
 @pytest.mark.parametrize(
     "code",
@@ -154,3 +163,59 @@ def test_smoke(code: str) -> None:
         fout.isatty = lambda: True  # type: ignore[method-assign]
         cpu.print_result(file=fout)
         assert "x = 178929" in fout.getvalue()
+
+
+MM3_DIVIDE = """
+.cpu mm-3
+.input 0x100 a
+.input 0x101 b
+.output 0x102 x
+.code
+04 0100 0101 0102 ; x := a / b
+99 0000 0000 0000 ; halt
+"""
+
+
+def output(cpu: Cpu) -> str:
+    with StringIO() as fout:
+        cpu.print_result(file=fout)
+        return fout.getvalue()
+
+
+def test_rerun() -> None:
+    cpu = source(MM3_DIVIDE, enter=StringIO("10 2"))
+    assert cpu.control_unit.run() == 2
+    assert output(cpu) == "5\n"
+    access_count = cpu.ram.access_count
+
+    assert cpu.rerun(StringIO("-9 3")) == 2
+    assert output(cpu) == "-3\n"
+    assert cpu.ram.access_count == access_count
+
+    with pytest.warns(UserWarning, match="cpu halted"):
+        cpu.rerun(StringIO("1 0"))
+    assert cpu.control_unit.failed
+
+    assert cpu.rerun(StringIO("7 7")) == 2
+    assert not cpu.control_unit.failed
+    assert output(cpu) == "1\n"
+
+
+def test_snapshot() -> None:
+    cpu = source(MM1_SELF_MODIFYING)
+    cpu.control_unit.run(Budget(steps=5))
+    snapshot = cpu.snapshot()
+
+    cpu.control_unit.run()
+    assert output(cpu) == "150\n"
+
+    # Modified code is restored, so decoded instructions are dropped
+    cpu.restore(snapshot)
+    assert cpu.control_unit.halt_state == (False, Status.STOPPED)
+    cpu.control_unit.run()
+    assert cpu.control_unit.status is Status.HALTED
+    assert output(cpu) == "150\n"
+
+    cpu.restore(snapshot)
+    cpu.control_unit.run(Budget(steps=1))
+    assert cpu.snapshot().registers != snapshot.registers
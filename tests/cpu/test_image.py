@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import json
+import struct
+from io import StringIO
+from typing import TYPE_CHECKING
+
+import pytest
+
+from modelmachine.batch import Runner, Task
+from modelmachine.cpu.image import (
+    FORMAT_VERSION,
+    MAGIC,
+    PREFIX,
+    load_image,
+    pack,
+)
+from modelmachine.cpu.source import parse, source
+from modelmachine.cu.budget import Budget
+
+from ..test_sample import samples
+
+if TYPE_CHECKING:
+    from pathlib import Path
+    from typing import Any, Callable
+
+    from modelmachine.cpu.cpu import Cpu
+
+MM3_TWO_BLOCKS = """
+.cpu mm-3
+.input 0x100 a
+.output 0x101 x
+.enter 20
+.code 0x10
+01 0100 0012 0101 ; x := a + [12]
+99 0000 0000 0000 ; halt
+.code 0x12
+00000000000016
+.code
+80 0000 0000 0010 ; jump 10
+"""
+
+
+def output(cpu: Cpu) -> str:
+    with StringIO() as fout:
+        cpu.print_result(fout)
+        return fout.getvalue()
+
+
+def write_image(tmp_path: Path, code: str) -> str:
+    filename = tmp_path / "program.mmimg"
+    filename.write_bytes(pack(parse(code)))
+    return str(filename)
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        "mm-1_sample",
+        "mm-2_sample",
+        "mm-3_sample",
+        "mm-v_sample",
+        "mm-s_sample",
+        "mm-r_sample",
+        "mm-m_sample",
+        "mm-m_array_sum",
+    ],
+)
+def test_sample(tmp_path: Path, name: str) -> None:
+    code = (samples / f"{name}.mmach").read_text()
+    expected = source(code)
+    cpu = load_image(write_image(tmp_path, code))
+    assert cpu.name == expected.name
+    assert cpu.ram.dump(0, len(cpu.ram)) == expected.ram.dump(0, len(cpu.ram))
+    assert list(cpu.ram.filled_intervals) == list(
+        expected.ram.filled_intervals
+    )
+
+    cpu.control_unit.run()
+    expected.control_unit.run()
+    assert output(cpu) == output(expected)
+
+
+def test_segments(tmp_path: Path) -> None:
+    filename = write_image(tmp_path, MM3_TWO_BLOCKS)
+    cpu = load_image(filename, protect_memory=True)
+    assert list(cpu.ram.filled_intervals) == [
+        range(1),
+        range(0x10, 0x13),
+        range(0x100, 0x101),
+    ]
+    cpu.control_unit.run()
+    assert output(cpu) == "42\n"
+
+    cpu = load_image(filename, enter=StringIO("-22"))
+    cpu.control_unit.run()
+    assert output(cpu) == "0\n"
+
+
+def test_batch(tmp_path: Path) -> None:
+    filename = write_image(tmp_path, MM3_TWO_BLOCKS)
+    result = Runner(budget=Budget())(Task(filename))
+    assert result.status == "halted"
+    assert result.output == "42\n"
+
+
+def test_bad_image(tmp_path: Path) -> None:
+    filename = write_image(tmp_path, MM3_TWO_BLOCKS)
+    data = (tmp_path / "program.mmimg").read_bytes()
+
+    (tmp_path / "program.mmimg").write_bytes(data[:-1])
+    with pytest.raises(ValueError, match="differs from header"):
+        load_image(filename)
+
+    (tmp_path / "program.mmimg").write_bytes(b"MM")
+    with pytest.raises(ValueError, match="Too short"):
+        load_image(filename)
+
+    (tmp_path / "program.mmimg").write_bytes(b"#" + data[1:])
+    with pytest.raises(ValueError, match="not a modelmachine image"):
+        load_image(filename)
+
+    version = struct.pack("<6sH", MAGIC, FORMAT_VERSION + 1)
+    (tmp_path / "program.mmimg").write_bytes(version + data[len(version) :])
+    with pytest.raises(ValueError, match="format version"):
+        load_image(filename)
+
+
+def corrupt_segments(header: dict[str, Any]) -> object:
+    header["segments"][0][1] = "2"
+    return header
+
+
+def drop_input(header: dict[str, Any]) -> object:
+    del header["input"]
+    return header
+
+
+def fractional_words(header: dict[str, Any]) -> object:
+    header["segments"][-1][1] = 1.5
+    return header
+
+
+def not_object(header: dict[str, Any]) -> object:
+    return list(header)
+
+
+def segments(*pairs: tuple[int, int]) -> Callable[[dict[str, Any]], object]:
+    def corrupt(header: dict[str, Any]) -> object:
+        assert header["segments"] == [[0, 1], [0x10, 3]]
+        header["segments"] = pairs
+        return header
+
+    return corrupt
+
+
+@pytest.mark.parametrize(
+    "corrupt",
+    [
+        corrupt_segments,
+        drop_input,
+        fractional_words,
+        not_object,
+        segments((0, 1), (0xFFFF, 3)),
+        segments((-1, 1), (0x10, 3)),
+        segments((0, 1), (0, 3)),
+        segments((0x10, 3), (0, 1)),
+        segments((0, 0), (0, 4)),
+    ],
+)
+def test_corrupted_header(
+    tmp_path: Path, corrupt: Callable[[dict[str, Any]], object]
+) -> None:
+    filename = write_image(tmp_path, MM3_TWO_BLOCKS)
+    data = (tmp_path / "program.mmimg").read_bytes()
+    _, _, size = PREFIX.unpack(data[: PREFIX.size])
+    offset = PREFIX.size + size
+    packed = json.dumps(corrupt(json.loads(data[PREFIX.size : offset])))
+    (tmp_path / "program.mmimg").write_bytes(
+        PREFIX.pack(MAGIC, FORMAT_VERSION, len(packed))
+        + packed.encode()
+        + data[offset:]
+    )
+    with pytest.raises(ValueError, match="Corrupted header"):
+        load_image(filename)
+
+
+@pytest.mark.parametrize("size", [PREFIX.size + 10, -20])
+def test_truncated_image(tmp_path: Path, size: int) -> None:
+    filename = write_image(tmp_path, MM3_TWO_BLOCKS)
+    data = (tmp_path / "program.mmimg").read_bytes()
+    (tmp_path / "program.mmimg").write_bytes(data[:size])
+    with pytest.raises(ValueError, match="than header|differs from header"):
+        load_image(filename)
@@ -0,0 +1,108 @@
+"""Scanner and pyparsing grammar agree on every input."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from modelmachine.bench import WORKLOADS
+from modelmachine.cpu.grammar import parse_grammar
+from modelmachine.cpu.scanner import scan
+from modelmachine.cpu.source import parse
+
+from ..test_sample import samples
+from .test_source import example
+
+if TYPE_CHECKING:
+    from modelmachine.cpu.cpu import Program
+
+GOOD = [
+    example,
+    ".cpu mm-1\n.code\n99 0000",
+    ".CPU MM-3\n.Code 0x10\n99 0000 0000 0000\n",
+    ".cpu\tmm-r ; comment\n\n  .code 16 ; data\n\t00 1 0 0009\t; x\n",
+    ".cpu mm-1\n.input 0x100,0x101 , 0x102\n.output 1_0\n.code\n990000",
+    ".cpu mm-1\n.input 100abc\n.output 0x1g\n.code\n99 0000",
+    ".cpu mm-1\n.input 1 , x\n.input 1, 2,\n.enter 1\t2\n.code\n99 0000",
+    ".cpu mm-1\n.code 0x0\nab cd\nEF\n.code 0x100\n01 1234\n.enter 5",
+    ".cpu mm-1\n.input 0x100 a ; b ; c\n.code\n99 0000\r\n",
+]
+
+# Valid programs, which scanner leaves to pyparsing
+DECLINED = [
+    ".cpu mm-1\n.code\n99 0000 .enter 5",
+    ".cpu mm-1\n.code\nab .input 0x100\n.enter 5",
+]
+
+BAD = [
+    "",
+    "\n; comment only\n",
+    ".code\n99 0000",
+    ".cpu mm-1",
+    ".cpu mm-1\n.cpu mm-1\n.code\n99 0000",
+    ".cpu mm-9\n.code\n99 0000",
+    ".cpu mm-1x\n.code\n99 0000",
+    ".cpumm-1\n.code\n99 0000",
+    ".cpu mm-1 .code\n99 0000",
+    ".cpu mm-1\n.code 99 0000",
+    ".cpu mm-1\n.code\n.input 0x100\n99 0000",
+    ".cpu mm-1\n.code\n",
+    ".cpu mm-1\n.code x\n99 0000",
+    ".cpu mm-1\n.code 0x\n99 0000",
+    ".cpu mm-1\n.code\n99 00zz",
+    ".cpu mm-1\n.code\n0x99",
+    ".cpu mm-1\n99 0000\n.code\n99 0000",
+    ".cpu mm-1\n.input\n.code\n99 0000",
+    ".cpu mm-1\n.input a\n.code\n99 0000",
+    ".cpu mm-1\n.input0x100\n.code\n99 0000",
+    ".cpu mm-1\n.inputs 0x100\n.code\n99 0000",
+    ".cpu mm-1\n.input ,1\n.code\n99 0000",
+    ".cpu mm-1\n.input 0x100 Введите a\n.code\n99 0000",
+    ".cpu mm-1\n.enter\n.code\n99 0000",
+    ".cpu mm-1\n.enter\x0b5\n.code\n99 0000",
+    ".cpu mm-1\n.halt\n.code\n99 0000",
+    ".cpu mm-1\n.code\n99 0000\nhello",
+    ".cpu mm-1\n.code 0x1__0\n99 0000",
+    ".cpu mm-1\n.input 1_\n.code\n99 0000",
+    ".cpu mm-1\n.input 010\n.code\n99 0000",
+    ".\u0131nput mm-1\n.code\n99 0000",
+]
+
+
+def corpus() -> list[str]:
+    files = sorted(samples.glob("*.mmach")) + sorted(
+        (samples / "bad").glob("*.mmach")
+    )
+    return [f.read_text() for f in files] + [w.source()[0] for w in WORKLOADS]
+
+
+def outcome(inp: str, *, fast: bool) -> Program | tuple[str, str]:
+    try:
+        return parse(inp, fast=fast)
+    except Exception as exc:  # noqa: BLE001 errors are compared
+        return type(exc).__name__, str(exc)
+
+
+@pytest.mark.parametrize("inp", corpus() + GOOD)
+def test_good(inp: str) -> None:
+    program = scan(inp)
+    assert program is not None
+    assert program == parse_grammar(inp)
+
+
+@pytest.mark.parametrize("inp", DECLINED)
+def test_declined(inp: str) -> None:
+    assert scan(inp) is None
+    assert parse(inp) == parse_grammar(inp)
+
+
+@pytest.mark.parametrize("inp", corpus() + GOOD + DECLINED + BAD)
+def test_agree(inp: str) -> None:
+    assert outcome(inp, fast=True) == outcome(inp, fast=False)
+
+
+@pytest.mark.parametrize("inp", BAD)
+def test_bad(inp: str) -> None:
+    assert scan(inp) is None or not scan(inp).code  # type: ignore[union-attr]
+    assert isinstance(outcome(inp, fast=False), tuple)
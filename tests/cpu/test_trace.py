@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import warnings
+from contextlib import redirect_stderr
+from io import BytesIO, StringIO
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from modelmachine.cpu.source import source
+from modelmachine.cpu.trace import Trace, TraceRecorder
+from modelmachine.cu.budget import Budget
+from modelmachine.cu.status import Status
+from modelmachine.ide.debug import Ide
+from modelmachine.ide.history import History, TraceHistory
+
+from ..cu.test_blocks import MM1_SELF_MODIFYING
+
+if TYPE_CHECKING:
+    from modelmachine.cpu.cpu import Cpu
+
+    State = tuple[object, ...]
+
+samples = Path(__file__).parent.parent.parent.resolve() / "samples"
+
+MM3_DIVISION_BY_ZERO = """
+.cpu mm-3
+.code
+14 0002 0003 0004 ; [4] := [2] / [3]
+99 0000 0000 0000 ; halt
+00000000000002
+00000000000000
+"""
+
+
+def state(cpu: Cpu) -> State:
+    snapshot = cpu.snapshot()
+    return (
+        snapshot.registers,
+        snapshot.halt_state,
+        snapshot.ram.memory,
+        snapshot.ram.fill,
+        list(snapshot.ram.filled),
+        snapshot.ram.access_count,
+    )
+
+
+def record(
+    code: str, budget: Budget | None = None
+) -> tuple[bytes, list[State]]:
+    """Return trace and states of live run after every step."""
+    cpu = source(code, protect_memory=False)
+    live = History(source(code, protect_memory=False))
+    states = [state(live.cpu)]
+    with BytesIO() as fout, redirect_stderr(
+        StringIO()
+    ), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        steps = TraceRecorder(cpu, fout).run(budget)
+        for _ in range(steps):
+            live.step()
+            states.append(state(live.cpu))
+        data = fout.getvalue()
+    assert state(cpu)[:1] == states[-1][:1]
+    return data, states
+
+
+def replay(data: bytes, states: list[State]) -> TraceHistory:
+    history = TraceHistory(Trace(data), checkpoint_steps=8)
+    assert history.trace.steps == len(states) - 1
+    assert state(history.cpu) == states[0]
+    for expected in states[1:]:
+        assert history.cpu.control_unit.status is Status.RUNNING
+        history.step()
+        assert state(history.cpu)[0] == expected[0]
+        assert state(history.cpu)[2:] == expected[2:]
+    assert history.cpu.control_unit.status is not Status.RUNNING
+    return history
+
+
+@pytest.mark.parametrize(
+    "sample", sorted(samples.glob("*.mmach")), ids=lambda p: p.name
+)
+def test_samples(sample: Path) -> None:
+    with open(sample) as fin:
+        code = fin.read()
+    data, states = record(code)
+    history = replay(data, states)
+    for cycle in range(len(states) - 1, -1, -1):
+        assert state(history.cpu)[2:] == states[cycle][2:]
+        history.back()
+
+
+def test_failure() -> None:
+    data, states = record(MM3_DIVISION_BY_ZERO)
+    history = replay(data, states)
+    assert history.cpu.control_unit.failed
+    assert history.cpu.control_unit.status is Status.HALTED
+    history.back()
+    assert not history.cpu.control_unit.failed
+
+
+def test_self_modifying_code() -> None:
+    data, states = record(MM1_SELF_MODIFYING)
+    history = replay(data, states)
+    with StringIO() as fout:
+        history.cpu.print_result(fout)
+        assert fout.getvalue() == "150\n"
+    for cycle in (40, 17, 3, 0):
+        history.rewind(cycle)
+        assert state(history.cpu)[2:] == states[cycle][2:]
+
+
+def test_skip() -> None:
+    data, states = record(MM1_SELF_MODIFYING)
+    history = TraceHistory(Trace(data), checkpoint_steps=8)
+    while history.cpu.control_unit.status is Status.RUNNING:
+        assert history.skip(lambda: False) > 0
+    assert history.cycle == len(states) - 1
+    assert state(history.cpu)[2:] == states[-1][2:]
+    history.back()
+    assert state(history.cpu)[2:] == states[-2][2:]
+
+
+def test_budget() -> None:
+    data, states = record(MM1_SELF_MODIFYING, Budget(steps=10))
+    assert len(states) == 11
+    history = replay(data, states)
+    assert history.cpu.control_unit.status is Status.STOPPED
+    history.back()
+    assert history.cpu.control_unit.halt_state == (False, None)
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", b"MMIMG\0" + bytes(30), b"MMTRC\0\x02\0" + bytes(30)],
+)
+def test_wrong_file(data: bytes) -> None:
+    with pytest.raises(ValueError, match="trace"):
+        Trace(data)
+
+
+def test_ide(monkeypatch: pytest.MonkeyPatch) -> None:
+    output: list[str] = []
+    monkeypatch.setattr("modelmachine.ide.debug.printf", output.append)
+
+    def run(*commands: str) -> str:
+        output.clear()
+        for command in commands:
+            assert ide.cmd(command)
+        return "\n".join(output)
+
+    data, states = record(MM1_SELF_MODIFYING)
+    history = TraceHistory(Trace(data))
+    ide = Ide(history.cpu, history=history)
+    assert "operation at 0x000b" in run("b 0xb", "c")
+    assert history.cycle == len(states) - 2
+    assert "machine halted" in run("c")
+    assert "cannot execute 'step': machine halted" in run("s")
+    assert "trace has none" in run("rwatch 1")
+    assert "write to 0x000f" in run("clear", "w 0xf", "rc")
+    assert state(history.cpu)[2:] == states[history.cycle][2:]
+    assert run("rs 5")
+
+    data, states = record(MM1_SELF_MODIFYING, Budget(steps=10))
+    history = TraceHistory(Trace(data))
+    ide = Ide(history.cpu, history=history)
+    assert "end of trace" in run("c")
+    assert history.cycle == 10
+    assert "cannot execute 'continue': end of trace" in run("c")
+
+
+def test_goto(monkeypatch: pytest.MonkeyPatch) -> None:
+    output: list[str] = []
+    monkeypatch.setattr("modelmachine.ide.debug.printf", output.append)
+    data, states = record(MM1_SELF_MODIFYING)
+    history = TraceHistory(Trace(data), checkpoint_steps=8)
+    ide = Ide(history.cpu, history=history)
+    for cycle in (40, 3, 27, len(states) - 1, 11):
+        assert ide.cmd(f"goto {cycle}")
+        assert history.cycle == cycle
+        assert state(history.cpu)[2:] == states[cycle][2:]
+
+    assert ide.cmd("g 1000")
+    assert history.cycle == len(states) - 1
+    assert "machine halted" in output[-1]
+    assert ide.cmd("g 1001")
+    assert "cannot execute 'goto': machine halted" in output[-1]
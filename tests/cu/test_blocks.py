@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import warnings
+from io import StringIO
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from modelmachine.bench import mm1_self_modifying
+from modelmachine.cpu.source import source
+from modelmachine.cu.blocks import MAX_INVALIDATIONS, BlockEngine
+from modelmachine.cu.status import Status
+
+if TYPE_CHECKING:
+    from modelmachine.cpu.cpu import Cpu
+
+samples = Path(__file__).parent.parent.parent.resolve() / "samples"
+
+MM1_SELF_MODIFYING = mm1_self_modifying([10, 20, 30, 40, 50])
+
+MMS_SQUARES = """
+.cpu mm-s
+.output 0x23
+.code
+5A 001A ; push n
+5C ; dup
+5C ; dup
+03 ; n, n * n
+5A 0023 ; push sum
+01 ; n, n * n + sum
+5B 0023 ; pop sum
+5A 001D ; push 1
+02 ; n - 1
+5C ; dup
+5A 0020 ; push 0
+05 ; comp
+82 0003 ; jneq 3
+99 ; halt
+000064 ; n
+000001 ; 1
+000000 ; 0
+000000 ; sum
+"""
+
+MM3_DIVISION_BY_ZERO = """
+.cpu mm-3
+.code
+01 0004 0005 0006 ; [6] := [4] + [5]
+14 0004 0006 0007 ; [7] := [4] / [6]
+99 0000 0000 0000 ; halt
+00000000000000 ; never reached
+00000000000002
+FFFFFFFFFFFFFE
+"""
+
+MMR_DIRTY = """
+.cpu mm-r
+.output 0x8
+.code
+0010 0008 ; load R1, [8]
+0110 0100 ; add R1, [100], dirty
+1010 0008 ; store R1, [8]
+9900 ; halt
+00000001
+"""
+
+
+def run_both(code: str, *, protect_memory: bool) -> tuple[Cpu, Cpu]:
+    interpreter = source(code, protect_memory=protect_memory)
+    compiled = source(code, protect_memory=protect_memory)
+
+    with warnings.catch_warnings(record=True) as interpreter_warnings:
+        warnings.simplefilter("always")
+        interpreter.control_unit.run()
+
+    listeners = list(compiled.ram.write_listeners)
+    with warnings.catch_warnings(record=True) as compiled_warnings:
+        warnings.simplefilter("always")
+        with BlockEngine(
+            control_unit=compiled.control_unit,
+            registers=compiled.registers,
+            ram=compiled.ram,
+        ) as engine:
+            engine.run()
+    assert compiled.ram.write_listeners == listeners
+
+    assert [str(w.message) for w in compiled_warnings] == [
+        str(w.message) for w in interpreter_warnings
+    ]
+    assert compiled.registers.state == interpreter.registers.state
+    assert compiled.ram._memory == interpreter.ram._memory
+    assert compiled.ram._fill == interpreter.ram._fill
+    assert compiled.ram.access_count == interpreter.ram.access_count
+    assert compiled.control_unit.status == interpreter.control_unit.status
+    return interpreter, compiled
+
+
+def output(cpu: Cpu) -> str:
+    with StringIO() as fout:
+        cpu.print_result(fout)
+        return fout.getvalue()
+
+
+@pytest.mark.parametrize(
+    "sample", sorted(samples.glob("*.mmach")), ids=lambda p: p.name
+)
+def test_samples(sample: Path) -> None:
+    with open(sample) as fin:
+        code = fin.read()
+    run_both(code, protect_memory=False)
+
+
+def test_loop() -> None:
+    interpreter, compiled = run_both(MMS_SQUARES, protect_memory=True)
+    assert output(compiled) == output(interpreter) == "338350\n"
+
+
+def test_self_modifying_code() -> None:
+    interpreter, compiled = run_both(MM1_SELF_MODIFYING, protect_memory=True)
+    assert output(compiled) == output(interpreter) == "150\n"
+
+
+def test_division_by_zero() -> None:
+    _, compiled = run_both(MM3_DIVISION_BY_ZERO, protect_memory=True)
+    assert compiled.control_unit.status is Status.HALTED
+    assert compiled.control_unit.failed
+
+
+@pytest.mark.parametrize("protect_memory", [False, True])
+def test_dirty_memory(*, protect_memory: bool) -> None:
+    _, compiled = run_both(MMR_DIRTY, protect_memory=protect_memory)
+    assert compiled.control_unit.failed is protect_memory
+
+
+def test_invalidate() -> None:
+    cpu = source(MMS_SQUARES, protect_memory=True)
+    listeners = list(cpu.ram.write_listeners)
+    engine = BlockEngine(
+        control_unit=cpu.control_unit, registers=cpu.registers, ram=cpu.ram
+    )
+    block = engine.compile(3)
+    assert block.function is not None
+    assert block.stop == 0x19
+    assert 3 in engine.blocks
+
+    cpu.ram.write_raw(0x23, 3, 0)
+    assert 3 in engine.blocks
+
+    cpu.ram.write_raw(0x10, 1, 0x5C)
+    assert 3 not in engine.blocks
+
+    for _ in range(MAX_INVALIDATIONS - 1):
+        assert engine.compile(3).function is not None
+        cpu.ram.write_raw(0x10, 1, 0x5C)
+    # Often modified block is left to interpreter
+    block = engine.compile(3)
+    assert block.function is None
+    assert block.instructions == 0
+    cpu.ram.write_raw(0x10, 1, 0x5C)
+    assert engine.blocks[3] is block
+
+    engine.close()
+    assert cpu.ram.write_listeners == listeners
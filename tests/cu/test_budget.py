@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from modelmachine.cpu.source import source
+from modelmachine.cu.blocks import BlockEngine
+from modelmachine.cu.budget import Budget
+from modelmachine.cu.status import Status
+
+if TYPE_CHECKING:
+    from modelmachine.cpu.cpu import Cpu
+
+samples = Path(__file__).parent.parent.parent.resolve() / "samples"
+
+MMV_COUNTER = """
+.cpu mm-v
+.code
+01 000D 0008 ; [D] := [D] + 1
+80 0000      ; jump 0
+00 0000 0001
+00 0000 0000
+"""
+
+
+def run(
+    cpu: Cpu, engine: str, budget: Budget | None, *, detect_loops: bool = False
+) -> None:
+    if engine == "blocks":
+        with BlockEngine(
+            control_unit=cpu.control_unit,
+            registers=cpu.registers,
+            ram=cpu.ram,
+        ) as block_engine:
+            block_engine.run(budget, detect_loops=detect_loops)
+    else:
+        cpu.control_unit.run(budget, detect_loops=detect_loops)
+
+
+def counter(cpu: Cpu) -> int:
+    return cpu.ram.read_raw(0xD, 5) or 0
+
+
+@pytest.mark.parametrize("engine", ["interpreter", "blocks"])
+def test_steps(engine: str) -> None:
+    cpu = source(MMV_COUNTER, protect_memory=True)
+    run(cpu, engine, Budget(steps=10001))
+    assert cpu.control_unit.status is Status.STOPPED
+    assert not cpu.control_unit.failed
+    assert counter(cpu) == 5001
+
+    run(cpu, engine, Budget(steps=2))
+    assert cpu.control_unit.status is Status.STOPPED
+    assert counter(cpu) == 5002
+
+
+@pytest.mark.parametrize("engine", ["interpreter", "blocks"])
+def test_ram_accesses(engine: str) -> None:
+    cpu = source(MMV_COUNTER, protect_memory=True)
+    run(cpu, engine, Budget(ram_accesses=1000))
+    assert cpu.control_unit.status is Status.STOPPED
+    assert cpu.ram.access_count >= 1000
+
+
+@pytest.mark.parametrize("engine", ["interpreter", "blocks"])
+def test_timeout(engine: str) -> None:
+    with open(samples / "bad" / "mm-v_infinite_loop.mmach") as fin:
+        cpu = source(fin.read(), protect_memory=False)
+    run(cpu, engine, Budget(seconds=0.05))
+    assert cpu.control_unit.status is Status.STOPPED
+
+
+@pytest.mark.parametrize("engine", ["interpreter", "blocks"])
+def test_halt_within_budget(engine: str) -> None:
+    with open(samples / "mm-v_sample.mmach") as fin:
+        cpu = source(fin.read(), protect_memory=True)
+    run(cpu, engine, Budget(steps=1000, ram_accesses=1000, seconds=60))
+    assert cpu.control_unit.status is Status.HALTED
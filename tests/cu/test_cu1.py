@@ -324,3 +324,33 @@ class TestControlUnit1:
         )
         assert self.registers[RegisterName.PC] == 7
         assert self.control_unit.status is Status.HALTED
+
+    def test_decode_warnings_repeat(self) -> None:
+        self.ram.put(
+            address=Cell(0, bits=AB),  # swap with garbage address
+            value=Cell(0x200001, bits=self.OPERAND_BITS),
+        )
+        for _ in range(2):
+            self.registers[RegisterName.PC] = Cell(0, bits=AB)
+            with warnings.catch_warnings(record=True) as warns:
+                warnings.simplefilter("always")
+                self.control_unit.step()
+            assert len(warns) == 1
+            assert "Expected zero bits" in str(warns[0].message)
+        assert 0 in self.control_unit._decoded
+
+
+def test_dispatch_table() -> None:
+    assert set(ControlUnit1.DISPATCH) == ControlUnit1.KNOWN_OPCODES
+    assert ControlUnit1.DISPATCH[Opcode.add] == (
+        ControlUnit1._load_r,
+        ControlUnit1._exec_add,
+    )
+    assert ControlUnit1.DISPATCH[Opcode.store] == (ControlUnit1._write_s,)
+
+
+def test_dispatch_missing_rule() -> None:
+    with pytest.raises(NotImplementedError, match="No execute rule"):
+
+        class BadControlUnit(ControlUnit1):
+            KNOWN_OPCODES = ControlUnit1.KNOWN_OPCODES | {Opcode.sswap}
@@ -7,6 +7,7 @@ import pytest
 from modelmachine.alu import ArithmeticLogicUnit, Flags
 from modelmachine.cell import Cell
 from modelmachine.cu.control_unit_m import ControlUnitM
+from modelmachine.cu.control_unit_r import ControlUnitR
 from modelmachine.cu.opcode import OPCODE_BITS, Opcode
 from modelmachine.cu.status import Status
 from modelmachine.memory.ram import RandomAccessMemory
@@ -459,3 +460,15 @@ class TestControlUnitM:
         )
         assert self.registers[RegisterName.PC] == 0x56
         assert self.control_unit.status is Status.HALTED
+
+
+def test_write_back_rules() -> None:
+    """Mm-m executes opcodes of mm-r alike and writes result of addr."""
+    for opcode in ControlUnitR.KNOWN_OPCODES:
+        assert [f.__name__ for f in ControlUnitM.DISPATCH[opcode]] == [
+            f.__name__ for f in ControlUnitR.DISPATCH[opcode]
+        ]
+    assert ControlUnitM.DISPATCH[Opcode.addr] == (
+        ControlUnitM._load_address,
+        ControlUnitM._write_rx,
+    )
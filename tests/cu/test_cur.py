@@ -420,6 +420,24 @@ class TestControlUnitR:
         self.control_unit.step()
         assert self.registers[RegisterName.R0] == 0x40
 
+    def test_register_step_without_cells(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        self.run_opcode(opcode=Opcode.radd, o=1, a=0x41, b=0x10)
+        assert self.registers[RegisterName.R4] == 0x41 + 2
+        self.registers.set_int(RegisterName.PC, 0x10)
+
+        def forbid(*_args: object, **_kwargs: object) -> None:
+            msg = "Cell is allocated"
+            raise AssertionError(msg)
+
+        monkeypatch.setattr(Cell, "__init__", forbid)
+        self.control_unit.step()
+        monkeypatch.undo()
+
+        assert self.registers[RegisterName.R4] == 0x41 + 2 * 2
+        assert self.registers[RegisterName.PC] == 0x11
+
     def test_smoke(self) -> None:
         """Simple program."""
         self.ram.put(
@@ -365,3 +365,29 @@ class TestControlUnitV:
         )
         assert self.registers[RegisterName.PC] == 0x56
         assert self.control_unit.status is Status.HALTED
+
+    def test_decoded_cache(self) -> None:
+        self.run_opcode(opcode=Opcode.add, o=5, a=1, b=2)
+        assert 0x10 in self.control_unit._decoded
+        access_count = self.ram.access_count
+
+        self.registers[RegisterName.PC] = Cell(0x10, bits=AB)
+        self.control_unit.step()
+        assert self.ram.access_count - access_count == 5 + 3 * 5
+        assert self.ram.fetch(Cell(0x20, bits=AB), bits=self.OPERAND_BITS) == 5
+        assert self.registers[RegisterName.PC] == 0x15
+
+    def test_self_modifying_code(self) -> None:
+        self.run_opcode(opcode=Opcode.add, o=5, a=1, b=2)
+        assert 0x10 in self.control_unit._decoded
+
+        # Last byte of instruction: address2 := 0x25
+        self.ram.put(address=Cell(0x14, bits=AB), value=Cell(0x25, bits=BYTE))
+        assert 0x10 not in self.control_unit._decoded
+
+        self.registers[RegisterName.PC] = Cell(0x10, bits=AB)
+        self.control_unit.step()
+        assert (
+            self.ram.fetch(Cell(0x20, bits=AB), bits=self.OPERAND_BITS)
+            == 3 + 0x88
+        )
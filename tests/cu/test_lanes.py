@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import warnings
+from contextlib import redirect_stderr
+from io import StringIO
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import pytest
+
+from modelmachine.cpu.source import source
+from modelmachine.cu.budget import Budget
+from modelmachine.cu.status import Status
+
+from .test_blocks import MM1_SELF_MODIFYING
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from modelmachine.cpu.cpu import Cpu
+
+pytest.importorskip("numpy")
+
+from modelmachine.cu.lanes import LaneResult, LockstepEngine
+
+samples = Path(__file__).parent.parent.parent.resolve() / "samples"
+
+MM3_SUM = """
+.cpu mm-3
+.input 0x4 n
+.output 0x7
+.code
+01 0007 0004 0007 ; sum := sum + i
+02 0004 0005 0004 ; i := i - 1
+86 0004 0006 0000 ; sjg i, 0, 0
+99 0000 0000 0000 ; halt
+00000000000000 ; i
+00000000000001 ; one
+00000000000000 ; zero
+00000000000000 ; sum
+"""
+
+MM1_DIVISION = """
+.cpu mm-1
+.input 0x8 a
+.input 0x9 b
+.output 0xa
+.code
+00 0008 ; S := a
+04 0009 ; S := S / b
+10 000a ; q := S
+05 000b ; comp S, 10
+86 0007 ; sjg 7
+00 000b ; S := 10
+10 000a ; q := S
+99 0000 ; halt
+000000 ; a
+000000 ; b
+000000 ; q
+00000a ; ten
+"""
+
+MMS_MAX = """
+.cpu mm-s
+.input 0x18 a
+.input 0x1b b
+.output 0x1e
+.code
+5A 0018 ; push a
+5A 001B ; push b
+05 ; comp
+94 0011 ; ujgeq 0x11
+5A 001B ; push b
+5B 001E ; pop max
+99 ; halt
+5A 0018 ; push a
+5B 001E ; pop max
+99 ; halt
+000000 ; a
+000000 ; b
+000000 ; max
+"""
+
+
+def key(result: LaneResult) -> tuple[object, ...]:
+    snapshot = result.snapshot
+    ram = snapshot.ram
+    return (
+        result.status,
+        result.failed,
+        result.steps,
+        snapshot.registers,
+        snapshot.halt_state,
+        ram.memory,
+        ram.fill,
+        list(ram.filled),
+        ram.access_count,
+    )
+
+
+def run_lanes(
+    code: str,
+    enters: Sequence[str],
+    budget: Budget | None = None,
+    *,
+    protect_memory: bool = True,
+) -> tuple[Cpu, list[LaneResult]]:
+    cpu = source(
+        code, protect_memory=protect_memory, enter=StringIO(enters[0])
+    )
+    scalar = source(
+        code, protect_memory=protect_memory, enter=StringIO(enters[0])
+    )
+    with redirect_stderr(StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        results = LockstepEngine(cpu).run(
+            [StringIO(enter) for enter in enters], budget
+        )
+        for enter, result in zip(enters, results):
+            steps = scalar.rerun(StringIO(enter), budget)
+            assert key(result) == key(
+                LaneResult(
+                    status=scalar.control_unit.status,
+                    failed=scalar.control_unit.failed,
+                    steps=steps,
+                    snapshot=scalar.snapshot(),
+                )
+            )
+    return cpu, results
+
+
+def output(cpu: Cpu, result: LaneResult) -> str:
+    cpu.restore(result.snapshot)
+    with StringIO() as fout:
+        cpu.print_result(fout)
+        return fout.getvalue()
+
+
+@pytest.mark.parametrize(
+    "sample", sorted(samples.glob("*.mmach")), ids=lambda p: p.name
+)
+def test_samples(sample: Path) -> None:
+    with open(sample) as fin:
+        code = fin.read()
+    cpu = source(code, protect_memory=False)
+    inputs = len(cpu._input_req)
+    enters = [
+        " ".join(str((i * 7 + j * 3) % 23 - 11) for j in range(inputs))
+        for i in range(5)
+    ]
+    run_lanes(code, enters, protect_memory=False)
+
+
+def test_divergent_loops() -> None:
+    enters = [str(n) for n in (5, 1, 100, 0, 5, 37, -3)]
+    cpu, results = run_lanes(MM3_SUM, enters)
+    assert [output(cpu, r) for r in results] == [
+        "15\n",
+        "1\n",
+        "5050\n",
+        "0\n",
+        "15\n",
+        "703\n",
+        "-3\n",
+    ]
+
+
+def test_division_by_zero() -> None:
+    cpu, results = run_lanes(MM1_DIVISION, ["100 7", "5 0", "-100 7", "7 -2"])
+    assert [r.failed for r in results] == [False, True, False, False]
+    assert all(r.status is Status.HALTED for r in results)
+    assert output(cpu, results[0]) == "14\n"
+    assert output(cpu, results[2]) == "10\n"
+    assert output(cpu, results[3]) == "10\n"
+
+
+def test_self_modifying_code() -> None:
+    cpu, results = run_lanes(MM1_SELF_MODIFYING, ["5", "2", "5", "1"])
+    assert [output(cpu, r) for r in results] == [
+        "150\n",
+        "30\n",
+        "150\n",
+        "10\n",
+    ]
+
+
+def test_unsigned_compare() -> None:
+    cpu, results = run_lanes(MMS_MAX, ["1 2", "2 1", "-1 1", "3 3"])
+    assert [output(cpu, r) for r in results] == [
+        "2\n",
+        "2\n",
+        "-1\n",
+        "3\n",
+    ]
+
+
+@pytest.mark.parametrize("steps", [0, 1, 7, 8, 50])
+def test_budget(steps: int) -> None:
+    _, results = run_lanes(MM3_SUM, ["2", "20", "1"], Budget(steps=steps))
+    assert all(r.steps <= steps for r in results)
+
+
+def test_dirty_memory() -> None:
+    _, results = run_lanes(MM3_SUM.replace("00000000000000 ; sum", ""), ["3"])
+    assert results[0].failed
+
+
+def test_no_files() -> None:
+    assert LockstepEngine(source(MM3_SUM, enter=StringIO("1"))).run([]) == []
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import pytest
+
+from modelmachine.cpu.source import source
+from modelmachine.cu.budget import Budget
+from modelmachine.cu.status import Status
+
+from .test_blocks import MMS_SQUARES
+from .test_budget import MMV_COUNTER, run
+
+MMV_JUMP = """
+.cpu mm-v
+.code
+80 0000 ; jump 0
+"""
+
+MMR_REGISTER_LOOP = """
+.cpu mm-r
+.code
+00 1 0 0009 ; load R1, [9]
+00 2 0 0009 ; load R2, [9]
+21 1 2 ; radd R1, R2
+22 1 2 ; rsub R1, R2
+80 0 0 0004 ; jump 4
+99 0 0 ; halt
+00000007
+"""
+
+MMR_COUNTDOWN = """
+.cpu mm-r
+.code
+00 1 0 0009 ; load R1, [9]
+00 2 0 000B ; load R2, [B]
+22 1 2 ; rsub R1, R2
+25 1 0 ; rcomp R1, R0
+82 0 0 0004 ; jneq 4
+99 0 0 ; halt
+00001000
+00000001
+"""
+
+
+MM3_COPY = """
+.cpu mm-3
+.code
+00 0003 0000 0004 ; [4] := [3]
+80 0000 0000 0000 ; jump 0
+99 0000 0000 0000 ; halt
+00000000000005
+"""
+
+
+@pytest.mark.parametrize("engine", ["interpreter", "blocks"])
+@pytest.mark.parametrize("code", [MMV_JUMP, MMR_REGISTER_LOOP])
+def test_loop(code: str, engine: str) -> None:
+    cpu = source(code, protect_memory=True)
+    run(cpu, engine, Budget(steps=10000), detect_loops=True)
+    assert cpu.control_unit.status is Status.LOOPED
+    # Loop detector and block engine stop listening after run
+    assert len(cpu.ram.write_listeners) == 1
+
+
+@pytest.mark.parametrize("engine", ["interpreter", "blocks"])
+@pytest.mark.parametrize("code", [MMS_SQUARES, MMR_COUNTDOWN])
+def test_halt(code: str, engine: str) -> None:
+    cpu = source(code, protect_memory=True)
+    run(cpu, engine, None, detect_loops=True)
+    assert cpu.control_unit.status is Status.HALTED
+    assert not cpu.control_unit.failed
+
+
+@pytest.mark.parametrize("engine", ["interpreter", "blocks"])
+@pytest.mark.parametrize("code", [MMV_COUNTER, MM3_COPY])
+def test_writes(code: str, engine: str) -> None:
+    """Every ram write restarts search of cycle."""
+    cpu = source(code, protect_memory=True)
+    run(cpu, engine, Budget(steps=1000), detect_loops=True)
+    assert cpu.control_unit.status is Status.STOPPED
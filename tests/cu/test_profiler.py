@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from modelmachine.cpu.source import source
+from modelmachine.cu.budget import Budget
+from modelmachine.cu.profiler import Profiler
+from modelmachine.cu.status import Status
+
+from .test_blocks import MM1_SELF_MODIFYING
+from .test_budget import MMV_COUNTER
+
+
+def test_profile() -> None:
+    cpu = source(MM1_SELF_MODIFYING, protect_memory=True)
+    profiler = Profiler(
+        control_unit=cpu.control_unit, registers=cpu.registers, ram=cpu.ram
+    )
+    assert profiler.run() == 56
+    assert cpu.control_unit.status is Status.HALTED
+    assert profiler.instructions == 56
+    assert not cpu.ram.write_listeners[1:]
+
+    # Instruction at 1 is modified every iteration
+    assert {h.address for h in profiler.hotspots.values()} == set(range(12))
+    load = profiler.hotspots[0, "move"]
+    assert (load.count, load.reads, load.writes) == (5, 10, 0)
+    store = profiler.hotspots[2, "store"]
+    assert (store.count, store.reads, store.writes) == (5, 5, 5)
+    assert profiler.hotspots[11, "halt"].count == 1
+
+    opcodes = profiler.opcodes()
+    assert opcodes["move"].count == 15
+    assert opcodes["store"].writes == 15
+    reads = sum(h.reads for h in opcodes.values())
+    writes = sum(h.writes for h in opcodes.values())
+    assert reads + writes == cpu.ram.access_count
+
+    data = profiler.to_json()
+    assert data["instructions"] == 56
+    assert data["opcodes"]["add"] == {"count": 10, "reads": 20, "writes": 0}
+    assert data["addresses"][0]["count"] == 5
+
+    lines = list(profiler.report(top=3))
+    assert lines[0].split() == [
+        "address",
+        "opcode",
+        "count",
+        "%",
+        "reads",
+        "writes",
+    ]
+    assert lines[1].split()[:3] == ["0x0000", "move", "5"]
+    assert lines[4] == ""
+
+
+def test_profile_budget() -> None:
+    cpu = source(MMV_COUNTER, protect_memory=True)
+    profiler = Profiler(
+        control_unit=cpu.control_unit, registers=cpu.registers, ram=cpu.ram
+    )
+    assert profiler.run(Budget(steps=11)) == 11
+    assert cpu.control_unit.status is Status.STOPPED
+    assert profiler.hotspots[0, "add"].count == 6
+    assert profiler.hotspots[5, "jump"].count == 5
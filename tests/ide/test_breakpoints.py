@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+
+from modelmachine.cell import Cell
+from modelmachine.cpu.source import source
+from modelmachine.ide.breakpoints import Breakpoints, compile_condition
+from modelmachine.ide.debug import Ide
+from modelmachine.memory.register import RegisterName
+
+if TYPE_CHECKING:
+    from typing import Callable
+
+MM3_LOOP = """
+.cpu mm-3
+.output 0x7
+.code
+01 0007 0004 0007 ; sum := sum + i
+02 0004 0005 0004 ; i := i - 1
+82 0004 0006 0000 ; jneq i, 0, 0
+99 0000 0000 0000 ; halt
+00000000000064 ; i
+00000000000001 ; one
+00000000000000 ; zero
+00000000000000 ; sum
+"""
+
+
+@pytest.mark.parametrize(
+    ("text", "value", "expected"),
+    [
+        ("S > 10", 11, 1),
+        ("S > 10", 10, 0),
+        ("s<=0x0a", 10, 1),
+        ("S == -1", -1, 1),
+        ("-1 != S", -1, 0),
+        ("R1 >= S", 5, 0),
+    ],
+)
+def test_compile_condition(text: str, value: int, expected: int) -> None:
+    registers = source(MM3_LOOP).registers
+    registers[RegisterName.S] = Cell(
+        value, bits=registers[RegisterName.S].bits
+    )
+    condition = compile_condition(text, registers)
+    assert condition.predicate(registers) == bool(expected)
+
+
+@pytest.mark.parametrize("text", ["S", "S >", "S = 1", "A > 1", "X1 < 1"])
+def test_compile_condition_error(text: str) -> None:
+    with pytest.raises(ValueError, match="condition|register"):
+        compile_condition(text, source(MM3_LOOP).registers)
+
+
+def test_hit() -> None:
+    cpu = source(MM3_LOOP)
+    breakpoints = Breakpoints(cpu)
+    assert not breakpoints
+
+    def fail() -> range:
+        raise AssertionError
+
+    breakpoints.set_code(0x10, None)
+    assert breakpoints
+    assert 0x10 in breakpoints
+    assert breakpoints.hit(pc=1, current_cmd=fail, reads=(), writes=()) is None
+    assert breakpoints.hit(
+        pc=0x10, current_cmd=lambda: range(0x10, 0x11), reads=(), writes=()
+    ) == ("pause at breakpoint: operation at 0x0010")
+    assert breakpoints.hit(
+        pc=0, current_cmd=fail, reads=(), writes=(0x10,)
+    ) == ("pause at data breakpoint: write to 0x0010")
+
+    breakpoints.reads.add(5)
+    assert breakpoints.hit(
+        pc=0, current_cmd=fail, reads=((4, 2),), writes=()
+    ) == ("pause at data breakpoint: read from 0x0005")
+
+    breakpoints.remove_code(0x10)
+    breakpoints.set_code(0x10, breakpoints.condition("S > 0"))
+    assert (
+        breakpoints.hit(
+            pc=0x10, current_cmd=lambda: range(0x10, 0x11), reads=(), writes=()
+        )
+        is None
+    )
+    assert (
+        breakpoints.hit(pc=0, current_cmd=fail, reads=(), writes=(0x10,))
+        is None
+    )
+
+    breakpoints.clear()
+    assert not breakpoints
+    assert breakpoints.hit(pc=0x10, current_cmd=fail, reads=(), writes=()) is (
+        None
+    )
+
+
+def run(ide: Ide, *commands: str) -> str:
+    for command in commands:
+        assert ide.cmd(command)
+    out = "\n".join(ide_output)
+    ide_output.clear()
+    return out
+
+
+ide_output: list[str] = []
+
+
+@pytest.fixture(autouse=True)
+def _capture_printf(monkeypatch: pytest.MonkeyPatch) -> None:
+    ide_output.clear()
+    monkeypatch.setattr(
+        "modelmachine.ide.debug.printf", lambda out: ide_output.append(out)
+    )
+
+
+def test_ide_watchpoints() -> None:
+    ide = Ide(source(MM3_LOOP))
+    assert "read from 0x0005" in run(ide, "rwatch 5", "c")
+    assert ide.history.cycle == 2
+
+    assert "write to 0x0007" in run(ide, "rwatch 5", "watch 3", "w 7", "c")
+    assert ide.history.cycle == 4
+
+    out = run(ide, "clear", "b 2 if R1 < 98", "c")
+    assert "operation at 0x0002 if R1 < 98" in out
+    assert ide.cpu.registers.get_int(RegisterName.R1) == 97
+
+    assert "pause at condition: S == 3" in run(
+        ide, "clear", "b if S == 3", "c"
+    )
+    assert ide.cpu.registers.get_int(RegisterName.S) == 3
+
+    out = run(ide, "b if S ==", "b")
+    assert "Expected condition" in out
+    assert "condition S == 3" in out
+
+    assert "read from 0x0005" in run(ide, "clear", "rwatch 5", "rc")
+    assert ide.history.cycle == 287
+
+
+def test_fast_continue() -> None:
+    ide = Ide(source(MM3_LOOP))
+    assert "operation at 0x0001" in run(ide, "b 1", "c")
+    assert ide.history.cycle == 1
+    assert "operation at 0x0001" in run(ide, "c")
+    assert ide.history.cycle == 4
+
+    assert "write to 0x0004" in run(ide, "clear", "b 4", "c")
+    assert ide.history.cycle == 5
+    assert ide.history.last_ram == {4}
+
+    assert "machine halted" in run(ide, "clear", "c")
+    assert ide.history.cycle == 301
+    run(ide, "rs 9")
+    assert ide.history.cycle == 292
+    assert ide.history.last_ram == {7}
+    i = ide.cpu.ram.fetch(Cell(4, bits=16), bits=56, from_cpu=False)
+    assert i.unsigned == 3
+
+
+# Loops write cells around out, so restore of snapshot reports it
+MM3_TWO_LOOPS = """
+.cpu mm-3
+.output 0x13
+.code
+02 0010 0011 0010 ; i := i - 1
+01 0014 0011 0014 ; k := k + 1
+82 0010 0015 0000 ; jneq i, zero, 0
+00 0011 0000 0013 ; out := one
+02 0012 0011 0012 ; m := m - 1
+01 0014 0011 0014 ; k := k + 1
+82 0012 0015 0004 ; jneq m, zero, 4
+99 0000 0000 0000 ; halt
+.code 0x10
+00000000000005 ; i
+00000000000001 ; one
+00000000000005 ; m
+00000000000000 ; out
+00000000000000 ; k
+00000000000000 ; zero
+"""
+
+
+def test_watch_continue_twice(monkeypatch: pytest.MonkeyPatch) -> None:
+    ide = Ide(source(MM3_TWO_LOOPS))
+    history = ide.history
+    chunks: list[int] = []
+    skip = history.skip
+
+    def counting_skip(until: Callable[[], bool]) -> int:
+        steps = skip(until)
+        chunks.append(steps)
+        return steps
+
+    monkeypatch.setattr(history, "skip", counting_skip)
+    # Conditions are never true, they only end chunks at loop starts
+    run(ide, "w 0x13", "b 0 if S == 100", "b 4 if S == 100")
+    assert "write to 0x0013" in run(ide, "c")
+    assert history.cycle == 16
+    assert chunks == [3, 3, 3, 3, 4]
+
+    chunks.clear()
+    assert "machine halted" in run(ide, "c")
+    assert history.cycle == 32
+    assert chunks == [3, 3, 3, 3, 4]
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+from pathlib import Path
+
 import pytest
 from pyparsing import ParseException
 
-from modelmachine.ide.debug import debug_cmd
+from modelmachine.cpu.source import source
+from modelmachine.ide.debug import Ide, debug_cmd
+
+samples = Path(__file__).parent.parent.parent.resolve() / "samples"
 
 
 @pytest.mark.parametrize(
@@ -21,9 +26,20 @@ from modelmachine.ide.debug import debug_cmd
         ("memory", "m", []),
         ("quit", "quit", []),
         ("quit", "q", []),
+        ("breakpoint", "b", []),
+        ("breakpoint", "break 0x10", [16]),
+        ("breakpoint", "b 0x10 if R5 > 10", [16, "R5 > 10"]),
+        ("breakpoint", "b if S == -1", ["S == -1"]),
+        ("watch", "watch 0x10", [16]),
+        ("watch", "w 16", [16]),
+        ("rwatch", "rwatch 0x10", [16]),
+        ("rwatch", "rw 16", [16]),
+        ("clear", "clear", []),
+        ("goto", "goto 200", [200]),
+        ("goto", "g 0x10", [16]),
     ],
 )
-def test_debug_cmd(cmd: str, cmd_str: str, res: list[int]) -> None:
+def test_debug_cmd(cmd: str, cmd_str: str, res: list[object]) -> None:
     result = debug_cmd.parse_string(cmd_str, parse_all=True)
     assert result.get_name() == cmd
     assert list(result[0]) == res
@@ -43,8 +59,48 @@ def test_debug_cmd(cmd: str, cmd_str: str, res: list[int]) -> None:
         "m 10",
         "quit 10",
         "q 10",
+        "b 10 20",
+        "b 10 if",
+        "watch",
+        "rw 10 20",
+        "clear 10",
+        "goto",
+        "g 1 2",
     ],
 )
 def test_debug_error(cmd_str: str) -> None:
     with pytest.raises(ParseException):
         debug_cmd.parse_string(cmd_str, parse_all=True)
+
+
+def full_render(ide: Ide) -> list[str]:
+    size = ide.cpu.control_unit.PAGE_SIZE
+    pages = sorted(
+        {
+            page
+            for interval in ide.cpu.ram.filled_intervals
+            for page in range(
+                interval.start // size, (interval.stop - 1) // size + 1
+            )
+        }
+    )
+    lines = []
+    for i, page in enumerate(pages):
+        if i > 0 and pages[i - 1] != page - 1:
+            lines.append("... dirty memory ...")
+        lines.append(ide.format_page(page, ide.current_cmd))
+    return lines
+
+
+@pytest.mark.parametrize(
+    "sample",
+    ["mm-3_sample.mmach", "mm-s_sample.mmach", "mm-v_sample.mmach"],
+)
+def test_memory_lines(sample: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("modelmachine.ide.debug.printf", lambda _: None)
+    with open(samples / sample) as fin:
+        ide = Ide(source(fin.read()))
+    assert ide.memory_lines() == full_render(ide)
+    for command in ("s", "b 2", "s 2", "w 0x103", "rs", "c", "rs 2", "clear"):
+        assert ide.cmd(command)
+        assert ide.memory_lines() == full_render(ide)
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import warnings
+from contextlib import redirect_stderr
+from io import StringIO
+
+import pytest
+
+from modelmachine.cpu.source import source
+from modelmachine.cu.status import Status
+from modelmachine.ide.history import History
+
+MM3_LOOP = """
+.cpu mm-3
+.output 0x7
+.code
+01 0007 0004 0007 ; sum := sum + i
+02 0004 0005 0004 ; i := i - 1
+82 0004 0006 0000 ; jneq i, 0, 0
+99 0000 0000 0000 ; halt
+00000000000064 ; i
+00000000000001 ; one
+00000000000000 ; zero
+00000000000000 ; sum
+"""
+
+MM3_DIVISION_BY_ZERO = """
+.cpu mm-3
+.code
+14 0002 0003 0004 ; [4] := [2] / [3]
+99 0000 0000 0000 ; halt
+00000000000002
+00000000000000
+"""
+
+
+def state(history: History) -> tuple[object, ...]:
+    snapshot = history.cpu.snapshot()
+    return (
+        snapshot.registers,
+        snapshot.halt_state,
+        snapshot.ram.memory,
+        snapshot.ram.fill,
+        list(snapshot.ram.filled),
+        snapshot.ram.access_count,
+    )
+
+
+def run(history: History, steps: int) -> list[tuple[object, ...]]:
+    states = [state(history)]
+    for _ in range(steps):
+        history.step()
+        states.append(state(history))
+    return states
+
+
+def test_back() -> None:
+    history = History(source(MM3_LOOP))
+    states = run(history, 20)
+    assert history.last_ram == {4}
+    for cycle in range(20, 0, -1):
+        assert history.cycle == cycle
+        assert state(history) == states[cycle]
+        assert history.back()
+    assert state(history) == states[0]
+    assert not history.back()
+    assert history.last_registers == frozenset()
+
+
+@pytest.mark.parametrize("cycle", [0, 1, 7, 8, 9, 15, 30])
+def test_rewind(cycle: int) -> None:
+    history = History(source(MM3_LOOP), checkpoint_steps=8)
+    states = run(history, 31)
+    history.rewind(cycle)
+    assert history.cycle == cycle
+    assert state(history) == states[cycle]
+
+    history.step()
+    assert state(history) == states[cycle + 1]
+    history.back()
+    assert state(history) == states[cycle]
+
+
+def test_max_bytes() -> None:
+    history = History(source(MM3_LOOP), max_bytes=40 << 20)
+    run(history, 200)
+    assert history.size <= history.max_bytes
+    assert history.first == 0
+
+    history = History(source(MM3_LOOP), max_bytes=20000, checkpoint_steps=16)
+    states = run(history, 200)
+    assert history.size <= history.max_bytes
+    assert 0 < history.first < history.cycle
+
+    history.rewind(history.first)
+    assert state(history) == states[history.first]
+    assert not history.back()
+
+
+def test_failure() -> None:
+    history = History(source(MM3_DIVISION_BY_ZERO))
+    with redirect_stderr(StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        states = run(history, 1)
+    assert history.cpu.control_unit.failed
+    history.back()
+    assert state(history) == states[0]
+    assert not history.cpu.control_unit.failed
+
+
+def skip_all(history: History, until: int = -1) -> None:
+    cycle = history.cycle
+
+    def stop() -> bool:
+        nonlocal cycle
+        cycle += 1
+        return cycle == until
+
+    while history.skip(stop) > 0 and cycle != until:
+        if history.cpu.control_unit.status is not Status.RUNNING:
+            break
+
+
+def test_skip() -> None:
+    states = run(History(source(MM3_LOOP)), 301)
+    history = History(source(MM3_LOOP), checkpoint_steps=8)
+    skip_all(history)
+    assert history.cycle == 301
+    assert state(history) == states[301]
+    assert history.last_registers
+    assert history.cpu.control_unit.status is Status.HALTED
+
+    for cycle in range(300, 280, -1):
+        assert history.back()
+        assert state(history) == states[cycle]
+    assert history.last_ram
+
+    for cycle in (270, 265, 0):
+        history.rewind(cycle)
+        assert state(history) == states[cycle]
+    skip_all(history, until=100)
+    assert history.cycle == 100
+    assert state(history) == states[100]
+    assert history.last_ram == {7}
+
+
+def test_skip_max_bytes() -> None:
+    history = History(source(MM3_LOOP), max_bytes=1024)
+    assert history.skip(lambda: False) == 0
+    history = History(source(MM3_LOOP), max_bytes=6 << 20, checkpoint_steps=16)
+    skip_all(history)
+    assert history.cycle == 301
+    assert history.size <= history.max_bytes
+    assert 0 < history.first < history.cycle
+    history.rewind(history.first + 3)
+    assert history.cycle == history.first + 3
+
+
+class CountingHistory(History):
+    executed = 0
+
+    def _execute(self, cycle: int) -> None:
+        self.executed += 1
+        super()._execute(cycle)
+
+
+@pytest.mark.parametrize("steps", [4, 8, 100])
+def test_goto(steps: int) -> None:
+    states = run(History(source(MM3_LOOP)), 301)
+    history = CountingHistory(source(MM3_LOOP), checkpoint_steps=steps)
+    history.goto(1000)
+    assert history.cycle == 301
+    assert history.cpu.control_unit.status is Status.HALTED
+    assert state(history) == states[301]
+
+    # Every cycle was reached, so goto replays from the nearest snapshot
+    for cycle in (17, 240, 16, 251, 0, 299, 300):
+        history.executed = 0
+        history.goto(cycle)
+        assert history.cycle == cycle
+        assert state(history) == states[cycle]
+        assert history.executed <= steps
+        history.step()
+        assert state(history) == states[cycle + 1]
+        history.back()
+
+    for cycle in range(299, 280, -1):
+        assert history.back()
+        assert state(history) == states[cycle]
+
+    history.goto(301)
+    assert state(history) == states[301]
+    history.goto(0)
+    assert state(history) == states[0]
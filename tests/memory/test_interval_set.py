@@ -0,0 +1,68 @@
+import random
+
+from modelmachine.memory.interval_set import IntervalSet
+
+
+def test_add() -> None:
+    s = IntervalSet()
+    s.add(5, 7)
+    s.add(1, 2)
+    s.add(9, 9)
+    assert list(s) == [range(1, 2), range(5, 7)]
+
+    s.add(2, 3)
+    s.add(7, 8)
+    assert list(s) == [range(1, 3), range(5, 8)]
+
+    s.add(0, 10)
+    assert list(s) == [range(10)]
+    assert len(s) == 1
+
+
+def test_discard() -> None:
+    s = IntervalSet()
+    s.add(0, 10)
+    s.add(20, 30)
+    s.discard(5, 6)
+    assert list(s) == [range(5), range(6, 10), range(20, 30)]
+
+    s.discard(8, 25)
+    assert list(s) == [range(5), range(6, 8), range(25, 30)]
+
+    s.discard(10, 20)
+    s.discard(0, 5)
+    assert list(s) == [range(6, 8), range(25, 30)]
+
+
+def test_query() -> None:
+    s = IntervalSet()
+    s.add(3, 6)
+    assert 3 in s
+    assert 5 in s
+    assert 6 not in s
+    assert 2 not in s
+    assert "3" not in s
+    assert s.covers(3, 6)
+    assert s.covers(4, 5)
+    assert not s.covers(2, 4)
+    assert not s.covers(5, 7)
+
+
+def test_random() -> None:
+    rnd = random.Random(42)  # noqa: S311
+    s = IntervalSet()
+    expected: set[int] = set()
+    for _ in range(1000):
+        start = rnd.randrange(200)
+        stop = start + rnd.randrange(10)
+        if rnd.random() < 0.7:
+            s.add(start, stop)
+            expected.update(range(start, stop))
+        else:
+            s.discard(start, stop)
+            expected.difference_update(range(start, stop))
+
+        intervals = list(s)
+        assert {x for r in intervals for x in r} == expected
+        for a, b in zip(intervals, intervals[1:]):
+            assert a.stop < b.start
@@ -145,7 +145,84 @@ class TestRandomAccessMemory:
         for b, e in ((1, 3), (4, 5), (3, 4), (8, 10)):
             for i in range(b, e):
                 self._set(i, i + 1)
-        assert self.ram.filled_intervals == [
+        assert list(self.ram.filled_intervals) == [
             range(1, 5),
             range(8, 10),
         ]
+        assert self.ram.is_fill_range(1, 5)
+        assert not self.ram.is_fill_range(4, 9)
+
+    def test_write_listeners(self) -> None:
+        writes: list[tuple[int, int]] = []
+        self.ram.write_listeners.append(lambda a, b: writes.append((a, b)))
+        self._set(3, 1)
+        self.ram.put(address=Cell(5, bits=AB), value=Cell(0, bits=3 * WB))
+        assert writes == [(3, 4), (5, 8)]
+
+    def test_write_log(self) -> None:
+        self._set(5, 1)
+        self.ram.write_log = [{}]
+        self.ram.put(
+            address=Cell(5, bits=AB), value=Cell(0x20003, bits=2 * WB)
+        )
+        self._set(6, 4)
+        assert self.ram.write_log == [{5: (False, 1, 2), 6: (True, 0, 4)}]
+
+        self.ram.revert(self.ram.write_log.pop())
+        assert self._get(5) == 1
+        assert not self.ram.is_fill(Cell(6, bits=AB))
+        assert list(self.ram.filled_intervals) == [range(5, 6)]
+        assert self.ram.read_raw(5, 2) is None
+
+    def test_snapshot(self) -> None:
+        self._set(5, 1)
+        self._get(5)
+        snapshot = self.ram.snapshot()
+        writes: list[tuple[int, int]] = []
+        self.ram.write_listeners.append(lambda *r: writes.append(r))
+
+        self.ram.restore(snapshot)
+        assert writes == []
+
+        self._set(5, 2)
+        self._set(9, 3)
+        self._set(7, 3)
+        writes.clear()
+        self.ram.restore(snapshot)
+        assert writes == [(5, 10)]
+        assert self._get(5) == 1
+        assert not self.ram.is_fill(Cell(7, bits=AB))
+        assert list(self.ram.filled_intervals) == [range(5, 6)]
+        assert self.ram.access_count == snapshot.access_count
+
+        # Snapshot is not changed by restored memory
+        self._set(255, 4)
+        writes.clear()
+        self.ram.restore(snapshot)
+        assert writes == [(255, 256)]
+        assert list(self.ram.filled_intervals) == [range(5, 6)]
+
+
+@pytest.mark.parametrize("endianess", [Endianess.BIG, Endianess.LITTLE])
+@pytest.mark.parametrize("word_bits", [8, 12, 24, 56])
+def test_word_layout(word_bits: int, endianess: Endianess) -> None:
+    ram = RandomAccessMemory(
+        word_bits=word_bits, address_bits=AB, endianess=endianess
+    )
+    words = [(0xABCDEF0123456 * (i + 1)) % (1 << word_bits) for i in range(3)]
+    value = Cell.decode(
+        [Cell(w, bits=word_bits) for w in words], endianess=endianess
+    )
+    ram.put(address=Cell(10, bits=AB), value=value)
+    for i, w in enumerate(words):
+        assert ram.fetch(Cell(10 + i, bits=AB), bits=word_bits) == w
+    assert ram.fetch(Cell(10, bits=AB), bits=3 * word_bits) == value
+    assert ram.read_raw(10, 3) == value.unsigned
+    assert ram.dump(10, 13) == b"".join(
+        w.to_bytes(-(-word_bits // 8), "big") for w in words
+    )
+
+    ram.write_raw(11, 2, value.unsigned >> word_bits)
+    assert ram.fetch(Cell(11, bits=AB), bits=2 * word_bits) == (
+        value.unsigned >> word_bits
+    )
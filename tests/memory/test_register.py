@@ -75,3 +75,30 @@ class TestRegisterMemory:
             RegisterName.R1: Cell(1, bits=WB),
             RegisterName.R2: Cell(0, bits=WB),
         }
+
+    def test_int(self) -> None:
+        """Int access doesn't need Cell."""
+        self.registers.set_int(RegisterName.R1, 0xFFFF)
+        assert self.registers.get_int(RegisterName.R1) == 0xFFFF
+        assert self.registers[RegisterName.R1] == Cell(-1, bits=WB)
+
+        with pytest.raises(KeyError):
+            self.registers.get_int(RegisterName.R3)
+        with pytest.raises(KeyError):
+            self.registers.set_int(RegisterName.R3, 1)
+        with pytest.raises(AssertionError):
+            self.registers.set_int(RegisterName.R1, 0x10000)
+
+    def test_revert(self) -> None:
+        """write_log keeps first and last value for the step."""
+        self.registers.write_log = [{}]
+        self.registers.set_int(RegisterName.R1, 1)
+        self.registers[RegisterName.R1] = Cell(2, bits=WB)
+        self.registers.set_int(RegisterName.S, 3)
+        assert self.registers.write_log == [
+            {RegisterName.R1: (0, 2), RegisterName.S: (0, 3)}
+        ]
+
+        self.registers.revert(self.registers.write_log.pop())
+        assert self.registers.get_int(RegisterName.R1) == 0
+        assert self.registers.get_int(RegisterName.S) == 0
@@ -0,0 +1,126 @@
+"""Test case for batch runner."""
+
+from __future__ import annotations
+
+import json
+import shutil
+import subprocess
+import sys
+from io import StringIO
+from typing import TYPE_CHECKING
+
+import pytest
+
+from modelmachine.batch import (
+    Runner,
+    Task,
+    collect_tasks,
+    run_batch,
+    write_results,
+)
+from modelmachine.cu.budget import Budget
+
+from .cu.test_budget import MMV_COUNTER, samples
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+MM3_INPUT = """
+.cpu mm-3
+.input 0x100
+.output 0x101
+.code
+01 0100 0100 0101
+99 0000 0000 0000
+"""
+
+
+@pytest.fixture
+def programs(tmp_path: Path) -> Path:
+    shutil.copy(samples / "mm-3_sample.mmach", tmp_path)
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "double.mmach").write_text(MM3_INPUT)
+    (tmp_path / "sub" / "double.in").write_text("21\n")
+    (tmp_path / "sub" / "loop.mmach").write_text(MMV_COUNTER)
+    (tmp_path / "sub" / "bad.mmach").write_text(".cpu mm-3\n")
+    return tmp_path
+
+
+def test_collect_tasks(programs: Path) -> None:
+    assert collect_tasks(str(programs)) == [
+        Task(str(programs / "mm-3_sample.mmach")),
+        Task(str(programs / "sub" / "bad.mmach")),
+        Task(
+            str(programs / "sub" / "double.mmach"),
+            str(programs / "sub" / "double.in"),
+        ),
+        Task(str(programs / "sub" / "loop.mmach")),
+    ]
+
+    manifest = programs / "manifest.txt"
+    manifest.write_text(
+        "# program input\n\nsub/double.mmach sub/double.in\nsub/loop.mmach\n"
+    )
+    assert collect_tasks(str(manifest)) == [
+        Task(
+            str(programs / "sub" / "double.mmach"),
+            str(programs / "sub" / "double.in"),
+        ),
+        Task(str(programs / "sub" / "loop.mmach")),
+    ]
+
+    manifest.write_text("a b c\n")
+    with pytest.raises(ValueError, match="Expected program and input file"):
+        collect_tasks(str(manifest))
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+@pytest.mark.parametrize("engine", ["interpreter", "blocks"])
+def test_run_batch(programs: Path, jobs: int, engine: str) -> None:
+    runner = Runner(budget=Budget(steps=100), engine=engine)
+    with StringIO() as fout:
+        summary = write_results(
+            run_batch(collect_tasks(str(programs)), runner, jobs=jobs), fout
+        )
+        lines = [json.loads(line) for line in fout.getvalue().splitlines()]
+
+    assert summary == {"halted": 2, "stopped": 1, "error": 1}
+    results = {
+        result["program"].rsplit("/", 1)[-1]: result for result in lines
+    }
+    assert results["mm-3_sample.mmach"]["output"] == "178929\n"
+    assert results["double.mmach"]["output"] == "42\n"
+    assert results["double.mmach"]["steps"] == 2
+    assert results["loop.mmach"]["status"] == "stopped"
+    assert results["loop.mmach"]["steps"] == 100
+    assert results["loop.mmach"]["access_count"] > 0
+    assert "Missed required .code directive" in results["bad.mmach"]["error"]
+
+
+def test_rerun(programs: Path) -> None:
+    """Next input of the same program reuses loaded cpu."""
+    (programs / "sub" / "other.in").write_text("-5\n")
+    tasks = [
+        Task(str(programs / "sub" / "double.mmach"), str(programs / name))
+        for name in ("sub/double.in", "sub/other.in", "sub/double.in")
+    ]
+    runner = Runner(budget=Budget(steps=100))
+    results = list(run_batch(tasks, runner))
+    assert [r.output for r in results] == ["42\n", "-10\n", "42\n"]
+    assert [r.access_count for r in results] == [6, 6, 6]
+
+
+def test_warm_up() -> None:
+    """Workers are ready for sources, that scanner declines."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys; from modelmachine.batch import _warm_up;"
+            " _warm_up(); print('modelmachine.cpu.grammar' in sys.modules)",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout == "True\n"
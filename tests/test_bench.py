@@ -0,0 +1,62 @@
+"""Test case for benchmark suite."""
+
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+
+from modelmachine.bench import (
+    WORKLOADS,
+    Workload,
+    load,
+    measure,
+    report,
+    run_suite,
+    save,
+)
+from modelmachine.cpu.source import source
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+def test_every_control_unit() -> None:
+    names = {source(w.source(0.001)[0]).control_unit.NAME for w in WORKLOADS}
+    assert names == {"mm-1", "mm-2", "mm-3", "mm-v", "mm-s", "mm-r", "mm-m"}
+
+
+@pytest.mark.parametrize("engine", ["interpreter", "blocks"])
+@pytest.mark.parametrize("workload", WORKLOADS, ids=lambda w: w.name)
+def test_workload(workload: Workload, engine: str) -> None:
+    m = measure(workload, engine=engine, scale=0.01, repeat=1)
+    assert m.instructions > 0
+    assert m.ram_accesses > 0
+    assert m.peak_memory > 0
+    assert m.cached_load_seconds > 0
+
+
+def test_suite(tmp_path: Path) -> None:
+    suite = run_suite(scale=0.01, repeat=1, only="mm-3")
+    assert list(suite["workloads"]) == [
+        "mm-3 loop",
+        "mm-3 division",
+        "mm-3 self-modifying",
+    ]
+    filename = str(tmp_path / "bench.json")
+    save(suite, filename)
+    assert load(filename) == json.loads(json.dumps(suite))
+
+    lines = list(report(suite, load(filename)))
+    assert len(lines) == 4
+    assert lines[0].split() == [
+        "workload",
+        "instr/s",
+        "ram/s",
+        "load",
+        "ms",
+        "peak",
+        "KiB",
+        "speedup",
+    ]
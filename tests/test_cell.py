@@ -1,5 +1,8 @@
 """Test case for arithmetic logic unit."""
 
+import copy
+import pickle
+
 import pytest
 
 from modelmachine.cell import Cell, Endianess
@@ -220,3 +223,18 @@ class TestCell:
         x = Cell.from_hex("0a")
         assert x.bits == 8
         assert x == 10
+
+    def test_flyweight(self) -> None:
+        assert Cell(10, bits=16) is Cell(10, bits=16)
+        assert Cell(-1, bits=16) is Cell(0xFFFF, bits=16)
+        assert Cell(10, bits=16) is not Cell(10, bits=17)
+        assert Cell(1000, bits=16) is not Cell(1000, bits=16)
+        assert Cell(1000, bits=16) == Cell(1000, bits=16)
+        assert not hasattr(self.first, "__dict__")
+
+    def test_copy(self) -> None:
+        x = Cell(1000, bits=16)
+        y = pickle.loads(pickle.dumps(x))  # noqa: S301
+        assert y == x
+        assert y.bits == 16
+        assert copy.copy(self.first) is self.first
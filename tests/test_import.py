@@ -0,0 +1,52 @@
+"""Start-up of run command imports only what it needs."""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+from typing import TYPE_CHECKING
+
+import pytest
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+from .test_sample import samples
+
+HEAVY = ("pyparsing", "prompt_toolkit", "modelmachine.ide.debug")
+
+
+def imported(*args: str) -> tuple[set[str], str]:
+    """Run modelmachine with -X importtime, return modules and stdout."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "modelmachine", *args],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = {
+        line.rsplit("|", 1)[-1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith("import time:")
+    }
+    return modules, result.stdout
+
+
+@pytest.mark.parametrize("engine", ["interpreter", "blocks"])
+def test_run(engine: str) -> None:
+    modules, stdout = imported(
+        "run", "--engine", engine, str(samples / "mm-3_sample.mmach")
+    )
+    assert stdout == "178929\n"
+    assert "modelmachine.cpu.cpu" in modules
+    for name in HEAVY:
+        assert name not in modules
+
+
+def test_fallback(tmp_path: Path) -> None:
+    """Pyparsing is loaded for sources, that scanner declines."""
+    program = tmp_path / "program.mmach"
+    program.write_text(".cpu mm-1\n.code\n99 0000 .enter 5\n")
+    modules, _ = imported("run", str(program))
+    assert "pyparsing" in modules
+    assert "prompt_toolkit" not in modules
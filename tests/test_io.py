@@ -4,7 +4,7 @@ import io
 
 import pytest
 
-from modelmachine.cell import Cell
+from modelmachine.cell import Cell, Endianess
 from modelmachine.io import InputOutputUnit
 from modelmachine.memory.ram import RandomAccessMemory
 
@@ -70,6 +70,12 @@ class TestIODevice:
                 [(0, "01020A0a10153264"), (1, "01020A0a10153264")]
             )
 
+    def test_load_source_wrap(self) -> None:
+        self.io_unit.load_source([(31, "01020A0a")])
+        assert self.ram.fetch(Cell(31, bits=AB), bits=WB) == 0x0102
+        assert self.ram.fetch(Cell(0, bits=AB), bits=WB) == 0x0A0A
+        assert list(self.ram.filled_intervals) == [range(1), range(31, 32)]
+
     def test_store_source(self) -> None:
         """Test save to string method."""
         self.ram.put(address=Cell(20, bits=AB), value=Cell(0x1A10, bits=WB))
@@ -122,3 +128,29 @@ class TestIODevice:
 
         with pytest.raises(ValueError, match="Unexpected address"):
             self.io_unit.output(address=-1)
+
+
+@pytest.mark.parametrize("endianess", [Endianess.BIG, Endianess.LITTLE])
+@pytest.mark.parametrize("word_bits", [8, 12, 24, 56])
+def test_load_source_layout(word_bits: int, endianess: Endianess) -> None:
+    ram = RandomAccessMemory(
+        address_bits=AB, word_bits=word_bits, endianess=endianess
+    )
+    io_unit = InputOutputUnit(ram=ram, io_bits=word_bits)
+    words = [(0xABCDEF0123456 * (i + 1)) % (1 << word_bits) for i in range(3)]
+    io_unit.load_source(
+        [(10, "".join(f"{w:0{word_bits // 4}x}" for w in words))]
+    )
+    for i, w in enumerate(words):
+        assert ram.fetch(Cell(10 + i, bits=AB), bits=word_bits) == w
+    assert list(ram.filled_intervals) == [range(10, 13)]
+
+
+def test_load_source_image() -> None:
+    ram = RandomAccessMemory(address_bits=16, word_bits=24)
+    io_unit = InputOutputUnit(ram=ram, io_bits=24)
+    io_unit.load_source([(0, "".join(f"{i:06x}" for i in range(1 << 16)))])
+    assert ram.is_fill_range(0, 1 << 16)
+    assert ram.access_count == 0
+    for i in (0, 1, 0x1234, 0xFFFF):
+        assert ram.fetch(Cell(i, bits=16), bits=24) == i